@@ -1,17 +1,29 @@
 import logging
-from flask import Flask, request, render_template, Response, abort, redirect, url_for
+from flask import Flask, request, render_template, Response, abort, redirect, url_for, jsonify, g
 from rdflib import Graph, URIRef, ConjunctiveGraph, RDF, BNode
 from SPARQLWrapper import SPARQLWrapper, JSON
 import config
 import json
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from urllib.parse import urlparse, urlunparse, quote
+import os
 import sys
-from uri_utils import transform_uri, is_identity_uri, is_yasgui_uri, shorten_uri, page_uri_to_identity_uri, identity_uri_to_page_uri, matches_known_uri_patterns
+import time
+import contextvars
+import deadline
+from uri_utils import transform_uri, is_identity_uri, is_yasgui_uri, is_inverse_relations_api_uri, is_metrics_uri, shorten_uri, page_uri_to_identity_uri, identity_uri_to_page_uri, matches_known_uri_patterns
 from rdf_sources.rdf_source_factory import create_rdf_source
 from rdf_sources.rdf_source import ResourceNotFound
 from content_negotiation import ContentNegotiator
-from inverse_relations import prerender_inverse_relations
+from inverse_relations import build_page_url
+from view_model import build_view_model, GraphIndex
+from label_service import LabelService
+from metrics import MetricsStore, stage, server_timing, render_metrics, cache_samples, TRIPLE_COUNT_BUCKETS
+from output_cache import OutputCache
+from cooperative import pool_size
+from rdf_sources.cached_source import CachedRDFSource
+from conditional_get import graph_digest, graph_last_modified, representation_etag, files_fingerprint, config_fingerprint, is_not_modified, add_caching_headers, not_modified_response
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -43,6 +55,39 @@ logging.getLogger('app').setLevel(logging.WARNING)
 # Initialize RDF source based on configuration
 rdf_source = create_rdf_source()
 
+# Part of the ETags and cached serializations, so they are renewed after the prefixes or JSON-LD context change
+serialization_fingerprint = config_fingerprint([config.NAMESPACES],
+                                               [config.NAMESPACES_FILE, config.JSONLD_CONTEXT_FILE])
+
+# Serialized output is cached in the store of the graph cache, when there is one
+output_cache = None
+if config.GRAPH_CACHE_ENABLED and config.OUTPUT_CACHE_ENABLED:
+    output_cache = OutputCache(rdf_source.store, config.GRAPH_CACHE_TTL + config.GRAPH_CACHE_STALE_TTL,
+                               config.OUTPUT_CACHE_MAX_ENTRY_BYTES, config.OUTPUT_CACHE_ENCODINGS,
+                               serialization_fingerprint)
+
+# Labels of linked resources, cached per worker; looked up through the current rdf_source
+label_service = None
+if config.OBJECT_LABELS_ENABLED:
+    label_service = LabelService(lambda uris: rdf_source.get_labels(uris), config.LABEL_CACHE_SIZE,
+                                 config.LABEL_CACHE_TTL, config.LABEL_LOOKUP_MAX_URIS)
+
+# Request metrics, merged over all worker processes for /metrics
+metrics_store = MetricsStore(config.METRICS_PATH) if config.METRICS_ENABLED else None
+
+def count_upstream_error(operation):
+    if metrics_store is not None:
+        metrics_store.inc('ldview_upstream_errors_total', operation=operation)
+
+# Part of the HTML ETag, so pages are revalidated after the templates change
+templates_fingerprint = files_fingerprint(os.path.join(app.root_path, app.template_folder))
+
+# Thread pool for fetching inverse relations alongside the main graph (greenlets in a gevent worker)
+inverse_relations_executor = ThreadPoolExecutor(
+    max_workers=pool_size(config.INVERSE_RELATIONS_WORKERS),
+    thread_name_prefix='inverse-relations'
+)
+
 def find_matching_values(predicates, triples):
     """Find all matching values for a list of predicates, maintaining predicate order"""
     values = []
@@ -60,192 +105,6 @@ def get_types(triples):
             types.append(triple['object_short'])
     return types
 
-def group_predicates(predicates):
-    """Group predicates according to configuration"""
-    # Initialize result
-    result = []
-    used_predicates = []  # List to track all used predicates
-    
-    # Process configured groups
-    for group in config.PREDICATE_GROUPS:
-        group_predicates = []
-        for pred_uri in group:
-            # Find all predicates matching this URI
-            matching_predicates = [p for p in predicates if p['predicate'] == pred_uri]
-            if matching_predicates:
-                group_predicates.extend(matching_predicates)
-                used_predicates.extend(matching_predicates)
-        
-        # Only add group if it has predicates
-        if group_predicates:
-            result.append({'predicates': group_predicates})
-    
-    # Add remaining predicates
-    other_predicates = [p for p in predicates if p not in used_predicates]
-    if other_predicates:
-        result.append({'predicates': sorted(other_predicates, key=lambda x: x['predicate'])})
-    
-    return result
-
-def process_subject(subject_uri, graph, is_main_subject=False, id_uri=None):
-    """Process a subject URI and return its data"""
-    # Get all predicates and objects for this subject
-    predicates = []
-    types = []
-    images = []  # List for image URLs
-    main_label = None  # Single label for the header
-    main_description_predicate = None  # Track the first matching description predicate
-    main_descriptions = []  # Collect all values for the first matching description predicate
-    coordinates_list = []  # Store list of coordinate pairs
-    current_coordinates = {'latitude': None, 'longitude': None}  # Store coordinates for current subject
-
-    def find_label(node):
-        """Helper function to find the first matching label for a node"""
-        for label_predicate in config.LABEL_PREDICATES:
-            for s, p, o in graph.triples((node, URIRef(label_predicate), None)):
-                return str(o)
-        return None
-
-    is_blank = subject_uri.startswith('_:') or subject_uri.startswith('n')  # Also check for 'n' prefix
-
-    # Create the correct node based on whether it's a blank node or URI
-    if is_blank:
-        if subject_uri.startswith('_:'):
-            subject_node = BNode(subject_uri[2:])
-        else:
-            subject_node = BNode(subject_uri)
-    else:
-        subject_node = URIRef(subject_uri)
-
-    # First collect types
-    type_count = 0
-    for s, p, o in graph.triples((subject_node, RDF.type, None)):
-        type_uri = str(o)
-        types.append(shorten_uri(type_uri))  # Now returns dict with prefix and local
-        type_count += 1
-
-    # First find the main label if this is the main subject
-    if is_main_subject:
-        main_label = find_label(subject_node)
-
-    # Initialize blank_node_relations to ensure it's available for blank nodes
-    blank_node_relations = {}
-
-    # Collect all predicates linking from the main subject
-    if is_main_subject:
-        for s, p, o in graph.triples((subject_node, None, None)):
-            linked_subject = str(o)
-            predicate_str = shorten_uri(str(p))
-            blank_node_relations[linked_subject] = predicate_str
-
-    # Voor niet-main subjects, zoek naar inkomende relaties van het main subject
-    relation_to_main = None
-    relation_uri = None
-    if not is_main_subject:
-        for s, p, o in graph.triples((None, None, subject_node)):
-            if str(s) == id_uri:  # Als de relatie van het main subject komt
-                predicate_str = str(p)
-                relation_to_main = shorten_uri(predicate_str)
-                relation_uri = predicate_str
-
-    for s, p, o in graph.triples((subject_node, None, None)):
-        predicate = str(p)
-        obj = str(o)
-        
-        # Check if this is an image predicate
-        if predicate in config.IMAGE_PREDICATES:
-            images.append({
-                'url': obj,
-                'predicate': predicate,
-                'predicate_short': shorten_uri(predicate)
-            })
-            continue
-
-        # Check if this is a coordinate predicate
-        if predicate in config.COORDINATE_PREDICATES['latitude']:
-            try:
-                current_coordinates['latitude'] = float(obj)
-            except ValueError:
-                pass
-        elif predicate in config.COORDINATE_PREDICATES['longitude']:
-            try:
-                current_coordinates['longitude'] = float(obj)
-            except ValueError:
-                pass
-
-        # If we have a complete coordinate pair, add it to the list
-        if current_coordinates['latitude'] is not None and current_coordinates['longitude'] is not None:
-            if is_main_subject:
-                current_coordinates['label'] = main_label
-            coordinates_list.append(current_coordinates.copy())  # Make a copy to avoid reference issues
-            current_coordinates = {'latitude': None, 'longitude': None}  # Reset for next pair
-
-        # For blank nodes, check if they contain coordinates
-        if obj.startswith('_:') or obj.startswith('n'):
-            blank_node = BNode(obj[2:]) if obj.startswith('_:') else BNode(obj)
-            blank_coordinates = {'latitude': None, 'longitude': None}
-            
-            # Search for coordinates in the blank node
-            for s, p, o in graph.triples((blank_node, None, None)):
-                if str(p) in config.COORDINATE_PREDICATES['latitude']:
-                    try:
-                        blank_coordinates['latitude'] = float(o)
-                    except ValueError:
-                        pass
-                elif str(p) in config.COORDINATE_PREDICATES['longitude']:
-                    try:
-                        blank_coordinates['longitude'] = float(o)
-                    except ValueError:
-                        pass
-            
-            # If both coordinates are found in the blank node, add them to the list
-            if blank_coordinates['latitude'] is not None and blank_coordinates['longitude'] is not None:
-                # Find label for this blank node
-                label = find_label(blank_node)
-                blank_coordinates['label'] = label
-                coordinates_list.append(blank_coordinates)
-
-        # For main subject, check for the first label if we haven't found one yet
-        if is_main_subject and main_label is None and predicate in config.LABEL_PREDICATES:
-            main_label = obj
-
-        # For main subject, collect all values for the first matching description predicate
-        if is_main_subject and predicate in config.DESCRIPTION_PREDICATES:
-            if main_description_predicate is None:
-                main_description_predicate = predicate
-                main_descriptions.append(obj)
-            elif predicate == main_description_predicate:
-                main_descriptions.append(obj)
-
-        # For all predicates, include in the table
-        predicates.append({
-            'predicate': predicate,
-            'predicate_short': shorten_uri(predicate),
-            'object': obj,
-            'object_short': shorten_uri(obj),
-            'is_blank_object': obj.startswith('_:') or obj.startswith('n')
-        })
-
-    # Group predicates according to configuration
-    predicate_groups = group_predicates(predicates)
-
-    # Combine all descriptions for the first matching predicate into a single string
-    main_description = ' '.join(main_descriptions) if main_descriptions else None
-
-    return {
-        'subject': subject_uri,
-        'subject_short': shorten_uri(subject_uri),
-        'types': types,
-        'main_label': main_label if is_main_subject else None,
-        'main_description': main_description if is_main_subject else None,
-        'images': images if is_main_subject else [],  # Only include images for main subject
-        'predicate_groups': predicate_groups,
-        'is_blank': is_blank,
-        'relation_to_main': relation_to_main,
-        'relation_uri': relation_uri,
-        'coordinates_list': coordinates_list if coordinates_list else None
-    }
-
 def create_rdf_response(graph, request):
     """Create an RDF response based on content negotiation"""
     return ContentNegotiator.get_response(
@@ -254,10 +113,33 @@ def create_rdf_response(graph, request):
         accept_header=request.headers.get('Accept', 'text/html')
     )
 
+def cancel_inverse_relations(inverse_future):
+    """Drop a pending inverse relations lookup whose result is no longer needed"""
+    if inverse_future is not None and not inverse_future.cancel():
+        # Already running: the result is discarded and the query ends at its own timeout
+        logger.debug("Abandoning running inverse relations lookup")
+
+def wait_for_inverse_relations(inverse_future, id_uri, wait_until):
+    """
+    Wait for concurrently fetched inverse relations, but not past wait_until
+    (a time.monotonic() value), so a slow lookup can't hold back the page
+    """
+    try:
+        return inverse_future.result(timeout=max(0, wait_until - time.monotonic()))
+    except FuturesTimeoutError:
+        cancel_inverse_relations(inverse_future)
+        count_upstream_error('inverse-relations-timeout')
+        logger.warning(f"Inverse relations for {id_uri} not available in time, rendering without them")
+    except Exception as e:
+        count_upstream_error('inverse-relations')
+        logger.error(f"Error getting inverse relations for {id_uri}: {str(e)}")
+    return {}
+
 def resolve_uri(uri):
     """
     Resolve a URI and return its representation
     """
+    g.route = 'resource'
     if config.USE_SEMANTIC_REDIRECTS is True:
         page_uri = uri
         id_uri = page_uri_to_identity_uri(uri)
@@ -265,89 +147,200 @@ def resolve_uri(uri):
         page_uri = uri
         id_uri = uri
     
+    # Decide on the output format before fetching, so the inverse relations
+    # (only needed for HTML) can be fetched alongside the main graph
+    format_info = ContentNegotiator.select_format(
+        format_param=request.args.get('format'),
+        accept_header=request.headers.get('Accept', 'text/html')
+    )
+    wants_inverse_relations = format_info is None and id_uri != config.BASE_URI
+
+    inverse_future = None
+    # Known missing resources get their 404 without starting the inverse relations query
+    if wants_inverse_relations and config.CONCURRENT_INVERSE_RELATIONS and not rdf_source.is_missing(id_uri, page_uri):
+        # The lookup runs in the request's context, so it shares the request deadline
+        inverse_future = inverse_relations_executor.submit(contextvars.copy_context().run,
+                                                           rdf_source.get_inverse_relations, id_uri)
+        time_left = deadline.remaining()
+        inverse_timeout = config.INVERSE_RELATIONS_TIMEOUT if time_left is None else min(config.INVERSE_RELATIONS_TIMEOUT, time_left)
+        inverse_wait_until = time.monotonic() + inverse_timeout
+
+    # Set when the data source failed and the last cached graph is served instead
+    stale = False
     try:
-        rdf_graph = rdf_source.get_rdf_for_uri(id_uri, page_uri)
+        with stage('fetch'):
+            rdf_graph = rdf_source.get_rdf_for_uri(id_uri, page_uri)
     except ResourceNotFound as e:
+        cancel_inverse_relations(inverse_future)
         return render_template('error.html', 
             message=f"404 - Resource not found: {str(e)}",
             uri=uri,
             config=config), 404
     except Exception as e:
-        return render_template('error.html',
-            message=f"500 - Internal server error: {str(e)}",
-            uri=uri,
-            config=config), 500
+        cancel_inverse_relations(inverse_future)
+        count_upstream_error('resource')
+        rdf_graph = rdf_source.get_stale_rdf_for_uri(id_uri, page_uri)
+        if rdf_graph is None:
+            logger.error(f"Error getting {id_uri}: {str(e)}")
+            response = Response(render_template('error.html',
+                message=f"503 - Data source unavailable: {str(e)}",
+                uri=uri,
+                config=config), 503)
+            retry_after = getattr(e, 'retry_after', None)
+            if retry_after is not None:
+                response.headers['Retry-After'] = str(int(retry_after))
+            return response
+        logger.warning(f"Error getting {id_uri}, serving the last cached graph: {str(e)}")
+        if metrics_store is not None:
+            metrics_store.inc('ldview_stale_responses_total')
+        # The inverse relations would come from the same failing source
+        stale = True
+        inverse_future = None
+        wants_inverse_relations = False
+
+    if metrics_store is not None:
+        metrics_store.observe('ldview_graph_triples', len(rdf_graph), TRIPLE_COUNT_BUCKETS)
+    with stage('digest'):
+        digest = graph_digest(rdf_graph)
+        last_modified = graph_last_modified(rdf_graph, id_uri)
 
     # Handle content negotiation
-    response = ContentNegotiator.get_response(
-        rdf_graph,
-        format_param=request.args.get('format'),
-        accept_header=request.headers.get('Accept', 'text/html')
-    )
-    if response:
-        return response
+    if format_info:
+        etag = representation_etag(digest, format_info['format'], serialization_fingerprint)
+        policy = 'stale' if stale else format_info['format']
+        # The output cache picks a precompressed variant by Accept-Encoding
+        vary_encoding = output_cache is not None
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(policy, etag, last_modified, vary_accept=True, vary_encoding=vary_encoding)
+        # Streamed formats are mostly written after this, once the headers are sent
+        with stage('serialize'):
+            if output_cache is not None:
+                response = output_cache.response(rdf_graph, format_info, digest, request.accept_encodings,
+                                                 CachedRDFSource.graph_key(id_uri, page_uri))
+            else:
+                response = ContentNegotiator._create_response(rdf_graph, format_info)
+        return add_caching_headers(response, policy, etag, last_modified, vary_accept=True, vary_encoding=vary_encoding)
 
     # Build the HTML view
+    # Labels of linked resources are looked up while the inverse relations are still being fetched
+    with stage('labels'):
+        index = GraphIndex(rdf_graph)
+        object_labels = label_service.get_labels(index.linked_uris()) if label_service is not None else {}
+
     inverse_relations = {}
-    if rdf_graph and id_uri is not config.BASE_URI:
-        inverse_graph = rdf_source.get_inverse_relations_graph(id_uri)
-        inverse_relations = prerender_inverse_relations(inverse_graph, id_uri)
+    if rdf_graph and wants_inverse_relations:
+        with stage('inverse'):
+            if inverse_future is not None:
+                inverse_relations = wait_for_inverse_relations(inverse_future, id_uri, inverse_wait_until)
+            else:
+                try:
+                    inverse_relations = rdf_source.get_inverse_relations(id_uri)
+                except Exception as e:
+                    count_upstream_error('inverse-relations')
+                    logger.error(f"Error getting inverse relations for {id_uri}: {str(e)}")
+
+    # The page also shows the inverse relations and linked labels, so they are part of its ETag
+    etag = representation_etag(digest, 'html', templates_fingerprint, serialization_fingerprint,
+                               json.dumps(inverse_relations, sort_keys=True),
+                               json.dumps(object_labels, sort_keys=True), str(stale))
+    policy = 'stale' if stale else 'html'
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(policy, etag, last_modified, vary_accept=True)
    
-    subjects = defaultdict(list)
-    blank_nodes = []
-    main_subject = None
-
-    # Process each subject in the graph
-    for subject in set(rdf_graph.subjects()):
-        subject_uri = str(subject)
-        if isinstance(subject, BNode):
-            # Zoek de relatie tussen main subject en blank node
-            relation_to_main = None
-            relation_uri = None
-            for s, p, o in rdf_graph.triples((URIRef(id_uri), None, subject)):
-                relation_to_main = shorten_uri(str(p))
-                relation_uri = str(p)
-                break
-            
-            subject_data = process_subject(subject_uri, rdf_graph)
-            if subject_data:
-                subject_data['relation_to_main'] = relation_to_main
-                subject_data['relation_uri'] = relation_uri
-                blank_nodes.append(subject_data)
-            continue
-
-        subject_data = process_subject(subject_uri, rdf_graph, is_main_subject=(subject_uri == id_uri), id_uri=id_uri)
-        if not subject_data:
-            continue
-
-        if subject_uri == id_uri:
-            main_subject = subject_data
-        else:
-            subjects[subject_uri].append(subject_data)
-
-    # Convert subjects dict to list
-    other_subjects = []
-    for subject_uri, subject_list in subjects.items():
-        other_subjects.extend(subject_list)
-
-    # Sort subjects
-    sorted_subjects = []
-    if main_subject:
-        sorted_subjects.append(main_subject)
-    sorted_subjects.extend(sorted(other_subjects, key=lambda x: x['subject']))
-    sorted_subjects.extend(blank_nodes)
-
-    return render_template(
-        'view.html',
-        subjects=sorted_subjects,
-        inverse_relations=inverse_relations,
-        config=config,
-        shorten_uri=shorten_uri,
-        uri=uri,
-        query_uri=id_uri,
-        query_uri_short=shorten_uri(id_uri),
-        blank_nodes=blank_nodes
-    )
+    with stage('view'):
+        sorted_subjects, blank_nodes = build_view_model(rdf_graph, id_uri, object_labels, index)
+
+    with stage('render'):
+        response = Response(render_template(
+            'view.html',
+            subjects=sorted_subjects,
+            inverse_relations=inverse_relations,
+            config=config,
+            shorten_uri=shorten_uri,
+            uri=uri,
+            query_uri=id_uri,
+            query_uri_short=shorten_uri(id_uri),
+            blank_nodes=blank_nodes,
+            stale=stale
+        ))
+    return add_caching_headers(response, policy, etag, last_modified, vary_accept=True)
+
+def inverse_relations_page():
+    """
+    Return one page of the subjects linking to a URI with a given predicate, as JSON
+    """
+    id_uri = request.args.get('uri')
+    predicate = request.args.get('predicate')
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = min(max(1, int(request.args.get('limit', config.INVERSE_RELATIONS_PAGE_SIZE))), config.INVERSE_RELATIONS_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers'}), 400
+    if not id_uri or not predicate:
+        return jsonify({'error': 'uri and predicate are required'}), 400
+
+    try:
+        # Ask for one extra subject to find out if there is a next page
+        subjects = rdf_source.get_inverse_subjects(id_uri, predicate, offset, limit + 1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        count_upstream_error('inverse-subjects')
+        logger.error(f"Error getting inverse subjects for {id_uri}: {str(e)}")
+        response = jsonify({'error': 'Data source unavailable'})
+        retry_after = getattr(e, 'retry_after', None)
+        if retry_after is not None:
+            response.headers['Retry-After'] = str(int(retry_after))
+        return response, 503
+
+    response = jsonify({
+        'uri': id_uri,
+        'predicate': predicate,
+        'offset': offset,
+        'limit': limit,
+        'subjects': subjects[:limit],
+        'next': build_page_url(predicate, id_uri, offset + limit, limit) if len(subjects) > limit else None
+    })
+    # Small enough to validate by the body itself
+    response.add_etag()
+    add_caching_headers(response, 'inverse-relations')
+    return response.make_conditional(request)
+
+def metrics_page():
+    """
+    Return the request metrics of all worker processes in the Prometheus text format
+    """
+    samples = list(metrics_store.samples())
+    cache_stats = getattr(rdf_source, 'stats', None)
+    if cache_stats is not None:
+        samples.extend(cache_samples(cache_stats()))
+    response = Response(render_metrics(samples), content_type='text/plain; version=0.0.4; charset=utf-8')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.deadline_token = deadline.start(config.REQUEST_DEADLINE)
+
+@app.teardown_request
+def end_request_deadline(error):
+    if 'deadline_token' in g:
+        deadline.end(g.deadline_token)
+
+@app.after_request
+def record_request_timings(response):
+    """Send the stage durations as Server-Timing header and add them to the metrics"""
+    timings = g.get('stage_timings', [])
+    if config.SERVER_TIMING_ENABLED and timings:
+        response.headers['Server-Timing'] = server_timing(timings)
+    if metrics_store is not None and 'request_start' in g:
+        route = g.get('route', request.endpoint or 'other')
+        metrics_store.inc('ldview_requests_total', route=route, status=response.status_code)
+        metrics_store.observe('ldview_request_duration_seconds', time.perf_counter() - g.request_start, route=route)
+        for name, seconds in timings:
+            metrics_store.observe('ldview_stage_duration_seconds', seconds, stage=name)
+    return response
 
 # Register error handlers
 @app.errorhandler(404)
@@ -369,11 +362,21 @@ def handle_uri(request):
     uri = f"{config.BASE_URI}{request}"
 
     if config.USE_SEMANTIC_REDIRECTS is True and is_identity_uri(uri):
+        g.route = 'redirect'
         return redirect(identity_uri_to_page_uri(uri), 303) # see other
 
+    if is_inverse_relations_api_uri(uri):
+        g.route = 'inverse-relations'
+        return inverse_relations_page()
+
+    if metrics_store is not None and is_metrics_uri(uri):
+        g.route = 'metrics'
+        return metrics_page()
+
     if is_yasgui_uri(uri):
+        g.route = 'yasgui'
         if config.RDF_DATA_SOURCE_TYPE == 'sparql':
-            return render_template('yasgui.html', config=config)
+            return add_caching_headers(Response(render_template('yasgui.html', config=config)), 'yasgui')
         else:
             return render_template('error.html',
                 message="YASGUI interface is only available in SPARQL mode",
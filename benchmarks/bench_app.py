@@ -0,0 +1,35 @@
+"""
+The viewer as configured for the load benchmarks
+
+Points the configuration at the fake SPARQL endpoint and keeps the caches
+and metrics of a run in a directory of their own, from environment
+variables set by load_test.py, before the app is imported:
+
+    LDVIEW_BENCH_ENDPOINT     URL of the fake SPARQL endpoint
+    LDVIEW_BENCH_DIR          directory for the SQLite files of the run
+    LDVIEW_BENCH_GRAPH_CACHE  '1' to keep the graph cache enabled
+
+Runs under gunicorn as bench_app:app, or with the threaded Werkzeug server:
+
+    python benchmarks/bench_app.py PORT
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+
+config.RDF_DATA_SOURCE_TYPE = 'sparql'
+config.SPARQL_ENDPOINT = os.environ['LDVIEW_BENCH_ENDPOINT']
+config.GRAPH_CACHE_ENABLED = os.environ.get('LDVIEW_BENCH_GRAPH_CACHE') == '1'
+config.GRAPH_CACHE_PATH = os.path.join(os.environ['LDVIEW_BENCH_DIR'], 'graph-cache.sqlite')
+config.METRICS_PATH = os.path.join(os.environ['LDVIEW_BENCH_DIR'], 'metrics.sqlite')
+
+from app import app
+
+if __name__ == '__main__':
+    import logging
+    from werkzeug.serving import run_simple
+    # No line per request
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    run_simple('127.0.0.1', int(sys.argv[1]), app, threaded=True)
@@ -0,0 +1,85 @@
+"""
+Benchmark for view_model.group_predicates and the view model of a large subject
+
+Builds one subject with N triples (default 5000) spread over the configured
+predicate groups and over unconfigured predicates, checks that grouping
+gives the same result as the former implementation and compares their speed.
+
+Usage:
+    python benchmarks/bench_group_predicates.py [triples]
+"""
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rdflib import Graph, URIRef, Literal
+import config
+from uri_utils import shorten_uri
+from view_model import group_predicates, build_view_model
+
+SUBJECT = 'http://example.org/id/record'
+
+
+def legacy_group_predicates(predicates):
+    """The former implementation: a filter over all predicates per configured URI"""
+    result = []
+    used_predicates = []
+    for group in config.PREDICATE_GROUPS:
+        group_predicates = []
+        for pred_uri in group:
+            matching_predicates = [p for p in predicates if p['predicate'] == pred_uri]
+            if matching_predicates:
+                group_predicates.extend(matching_predicates)
+                used_predicates.extend(matching_predicates)
+        if group_predicates:
+            result.append({'predicates': group_predicates})
+    other_predicates = [p for p in predicates if p not in used_predicates]
+    if other_predicates:
+        result.append({'predicates': sorted(other_predicates, key=lambda x: x['predicate'])})
+    return result
+
+
+def build_graph(size: int) -> Graph:
+    """Build a graph with one subject of size triples; about half use configured predicates"""
+    configured = [pred for group in config.PREDICATE_GROUPS for pred in group]
+    unconfigured = [f'http://example.org/def/p{i}' for i in range(50)]
+    graph = Graph()
+    subject = URIRef(SUBJECT)
+    for i in range(size):
+        predicates = configured if i % 2 else unconfigured
+        graph.add((subject, URIRef(predicates[i % len(predicates)]), Literal(f'value {i}')))
+    return graph
+
+
+def best_of(function, argument, runs: int = 5) -> float:
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv):
+    size = int(argv[0]) if argv else 5000
+    graph = build_graph(size)
+    predicates = [{
+        'predicate': str(p),
+        'predicate_short': shorten_uri(str(p)),
+        'object': str(o),
+        'object_short': shorten_uri(str(o)),
+        'is_blank_object': False
+    } for s, p, o in graph]
+
+    assert group_predicates(predicates) == legacy_group_predicates(predicates), "grouping differs from the former implementation"
+
+    legacy = best_of(legacy_group_predicates, predicates)
+    current = best_of(group_predicates, predicates)
+    print(f"group_predicates, {size} triples: legacy {legacy * 1000:.1f} ms, current {current * 1000:.1f} ms ({legacy / current:.0f}x)")
+    print(f"build_view_model, {size} triples: {best_of(lambda g: build_view_model(g, SUBJECT), graph) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for inverse_relations.prerender_inverse_relations
+
+Builds synthetic inverse-relation graphs (N triples `?s ?p <hub>` spread over
+10 predicates, half of the subjects with a label) and reports the time per
+inverse triple, which stays flat when the implementation is linear.
+
+Usage:
+    python benchmarks/bench_inverse_relations.py [--legacy] [sizes...]
+
+    --legacy  also time the former two-pass implementation (slow above 100k)
+    sizes     numbers of inverse triples, default: 10000 100000 1000000
+"""
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rdflib import Graph, URIRef, Literal
+import config
+from inverse_relations import prerender_inverse_relations, summarize_inverse_relations
+
+HUB = 'http://example.org/id/hub'
+PREDICATE_COUNT = 10
+
+
+def build_graph(size: int) -> Graph:
+    """Build a graph with size inverse triples to HUB"""
+    graph = Graph()
+    hub = URIRef(HUB)
+    predicates = [URIRef(f'http://example.org/def/p{i}') for i in range(PREDICATE_COUNT)]
+    label_predicate = URIRef(config.LABEL_PREDICATES[-1])
+    for i in range(size):
+        subject = URIRef(f'http://example.org/id/s{i}')
+        graph.add((subject, predicates[i % PREDICATE_COUNT], hub))
+        if i % 2:
+            graph.add((subject, label_predicate, Literal(f'Subject {i}')))
+    return graph
+
+
+def legacy_prerender_inverse_relations(graph: Graph, id_uri: str) -> dict:
+    """The former implementation: a label lookup per triple and a full scan per predicate"""
+    inverse_relations = {}
+    for s, p, o in graph:
+        if str(o) != id_uri:
+            continue
+        pred = str(p)
+        if pred not in inverse_relations:
+            inverse_relations[pred] = []
+        label = ''
+        for label_pred in config.LABEL_PREDICATES:
+            for label_obj in graph.objects(s, URIRef(label_pred)):
+                label = str(label_obj)
+                break
+            if label:
+                break
+        if len(inverse_relations[pred]) < config.MAX_INVERSE_SUBJECTS:
+            inverse_relations[pred].append({'uri': str(s), 'label': label})
+    counts = {}
+    for pred in inverse_relations:
+        counts[pred] = sum(1 for s, p, o in graph if str(p) == pred and str(o) == id_uri)
+    return summarize_inverse_relations(inverse_relations, counts, id_uri)
+
+
+def timed(function, graph: Graph) -> float:
+    start = time.perf_counter()
+    function(graph, HUB)
+    return time.perf_counter() - start
+
+
+def main(argv):
+    run_legacy = '--legacy' in argv
+    sizes = [int(arg) for arg in argv if not arg.startswith('--')] or [10_000, 100_000, 1_000_000]
+
+    print(f"{'inverse triples':>16} {'graph triples':>14} {'seconds':>9} {'us/triple':>10}" + (f" {'legacy s':>9}" if run_legacy else ''))
+    for size in sizes:
+        graph = build_graph(size)
+        seconds = timed(prerender_inverse_relations, graph)
+        line = f"{size:>16} {len(graph):>14} {seconds:>9.3f} {seconds / size * 1e6:>10.2f}"
+        if run_legacy:
+            line += f" {timed(legacy_prerender_inverse_relations, graph):>9.3f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
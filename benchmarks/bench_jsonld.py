@@ -0,0 +1,62 @@
+"""
+Benchmark for the JSON-LD output of content negotiation
+
+Serializes synthetic graphs of 1000, 10000 and 100000 triples with rdflib's
+json-ld serializer (the former output path) and with the compacting writer
+in streaming_serializers, and reports the throughput of both.
+
+Usage:
+    python benchmarks/bench_jsonld.py [repeat]
+"""
+import sys
+import os
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rdflib import Graph, URIRef, BNode, Literal, RDF, XSD
+from streaming_serializers import jsonld
+
+SCHEMA = 'http://schema.org/'
+
+
+def synthetic_graph(size):
+    """A graph of resources with types, labels, dates, links and blank nodes"""
+    graph = Graph()
+    i = 0
+    while len(graph) < size:
+        subject = URIRef(f'https://example.org/id/{i}')
+        address = BNode()
+        graph.add((subject, RDF.type, URIRef(SCHEMA + 'Person')))
+        graph.add((subject, URIRef(SCHEMA + 'name'), Literal(f'Person {i}')))
+        graph.add((subject, URIRef(SCHEMA + 'name'), Literal(f'Persoon {i}', lang='nl')))
+        graph.add((subject, URIRef(SCHEMA + 'birthDate'), Literal('1900-01-01', datatype=XSD.date)))
+        graph.add((subject, URIRef(SCHEMA + 'knows'), URIRef(f'https://example.org/id/{i // 2}')))
+        graph.add((subject, URIRef(SCHEMA + 'address'), address))
+        graph.add((address, URIRef(SCHEMA + 'streetAddress'), Literal(f'Main street {i}')))
+        graph.add((address, URIRef('https://example.org/def/number'), Literal(i)))
+        i += 1
+    return graph
+
+
+def run(fn, graph, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(graph)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for size in (1000, 10000, 100000):
+        graph = synthetic_graph(size)
+        rdflib_time = run(lambda g: g.serialize(format='json-ld'), graph, repeat)
+        writer_time = run(lambda g: ''.join(jsonld(g)), graph, repeat)
+        print(f"{len(graph):>7} triples: rdflib {len(graph) / rdflib_time:>9.0f} triples/s   "
+              f"writer {len(graph) / writer_time:>9.0f} triples/s   ({rdflib_time / writer_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
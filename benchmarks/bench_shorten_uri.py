@@ -0,0 +1,51 @@
+"""
+Benchmark for uri_utils.shorten_uri with large prefix maps
+
+Shortens a stream of URIs (default 200000, drawn from 20000 distinct URIs)
+against prefix maps of increasing size, comparing the prefix index with the
+former linear scan over the namespaces.
+
+Usage:
+    python benchmarks/bench_shorten_uri.py [calls]
+"""
+import sys
+import os
+import time
+import random
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+from uri_utils import shorten_uri
+
+
+def legacy_shorten_uri(uri):
+    """The former implementation: the first configured namespace that matches"""
+    for prefix, namespace in config.NAMESPACES.items():
+        if uri.startswith(namespace):
+            return {'prefix': prefix + ':', 'local': uri[len(namespace):]}
+    return {'prefix': '', 'local': uri}
+
+
+def run(fn, uris):
+    start = time.perf_counter()
+    for uri in uris:
+        fn(uri)
+    return time.perf_counter() - start
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    random.seed(1)
+    for size in (10, 100, 1000, 5000):
+        config.NAMESPACES = {f'p{i}': f'http://example{i % 97}.org/ns/{i}/' for i in range(size)}
+        distinct = [f'http://example{i % 97}.org/ns/{i}/term{j}' for j in range(20000 // size + 1) for i in range(size)][:20000]
+        uris = [random.choice(distinct) for _ in range(calls)]
+        # The linear scan is timed on a sample and scaled up
+        sample = max(calls // 100, 1)
+        legacy = run(legacy_shorten_uri, uris[:sample]) * calls / sample
+        indexed = run(shorten_uri, uris)
+        print(f"{size:>5} namespaces: legacy {legacy * 1000:9.1f} ms   indexed {indexed * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Local stand-in for the SPARQL endpoint, for the load benchmarks
+
+Answers the queries the viewer sends (SPARQL_CONSTRUCT_QUERY, the inverse
+relation queries, the label lookups and HOME_PAGE_SPARQL_QUERY) from the
+synthetic dataset of fixtures.py, evaluated by rdflib.
+
+rdflib evaluates the UNION branches of SPARQL_CONSTRUCT_QUERY before
+joining them with the VALUES block, which takes minutes on the whole
+dataset. So a query is evaluated against the triples around the IRIs in its
+text instead: their own triples, and those of the resources linking to
+them where they are the object of a triple pattern, with the blank nodes
+below them as far as SPARQL_CONSTRUCT_QUERY follows them.
+That is all these anchored queries can match; a query without IRIs gets
+the whole dataset.
+
+Results are kept per query text and format, so after a warm-up round the
+endpoint answers in constant time and the measurements are of the viewer,
+plus the configured latency. Result sizes follow from the sizes of the
+generated resources.
+
+Usage:
+    python benchmarks/fake_sparql_endpoint.py [--port 8890] [--latency 0.02] [--hub-size 100000] ...
+"""
+import sys
+import os
+import re
+import time
+import threading
+import argparse
+from urllib.parse import parse_qs, urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rdflib import Graph, URIRef, BNode
+from fixtures import build_dataset
+
+IRI_PATTERN = re.compile(r'<([^<>"{}|^`\\\s]*)>')
+DECLARATION_PATTERN = re.compile(r'(?i)\b(?:PREFIX\s+[^\s:]*:|BASE)\s*<[^>]*>')
+# IRIs in the object position of a triple pattern, like <hub> in ?s ?p <hub>
+OBJECT_IRI_PATTERN = re.compile(r'\?\w+\s+(?:\?\w+|<[^<>\s]*>)\s+<([^<>\s]*)>')
+
+# Levels of blank nodes below a resource that SPARQL_CONSTRUCT_QUERY follows
+BLANK_NODE_LEVELS = 2
+
+
+class SPARQLHandler(BaseHTTPRequestHandler):
+    """Answers SPARQL protocol requests over GET and POST from the server's graph"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get('query')
+        self._answer(query[0] if query else None)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+        if self.headers.get('Content-Type', '').startswith('application/sparql-query'):
+            self._answer(body)
+        else:
+            query = parse_qs(body).get('query')
+            self._answer(query[0] if query else None)
+
+    def _answer(self, query: str):
+        if query is None:
+            self._send(400, 'text/plain', b'query is required')
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        try:
+            content_type, body = self.server.result(query, self.headers.get('Accept', ''))
+        except Exception as e:
+            self._send(400, 'text/plain', str(e).encode('utf-8'))
+            return
+        self._send(200, content_type, body)
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSPARQLEndpoint(ThreadingHTTPServer):
+    """
+    SPARQL endpoint over an rdflib graph, with added latency and cached results
+
+    Args:
+        graph: The graph to query
+        latency: Seconds to wait before every answer, like the round-trip to a remote endpoint
+        host, port: Address to listen on; port 0 picks a free port
+    """
+    daemon_threads = True
+    # Room in the listen backlog for the connections of many concurrent requests
+    request_queue_size = 1024
+
+    def __init__(self, graph, latency: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), SPARQLHandler)
+        self.graph = graph
+        self.latency = latency
+        self.queries = 0
+        self._results = {}
+        self._lock = threading.Lock()
+        self._evaluation_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/sparql"
+
+    def result(self, query: str, accept: str) -> tuple:
+        """Get the (content type, body) of a query result, evaluating the query once per format"""
+        ntriples = 'application/n-triples' in accept
+        key = (query, ntriples)
+        with self._lock:
+            self.queries += 1
+            cached = self._results.get(key)
+        if cached is not None:
+            return cached
+
+        # rdflib's SPARQL parser and evaluation can't be used by several threads at once
+        with self._evaluation_lock:
+            result = self._relevant_triples(query).query(query)
+            if result.type in ('CONSTRUCT', 'DESCRIBE'):
+                if ntriples:
+                    answer = ('application/n-triples; charset=utf-8', result.serialize(format='nt', encoding='utf-8'))
+                else:
+                    answer = ('text/turtle; charset=utf-8', result.serialize(format='turtle', encoding='utf-8'))
+            else:
+                # rdflib answers a grouped aggregate over no matches with one empty row, SPARQL engines with none
+                result.bindings = [binding for binding in result.bindings if binding]
+                answer = ('application/sparql-results+json', result.serialize(format='json'))
+        with self._lock:
+            self._results[key] = answer
+        return answer
+
+    def _relevant_triples(self, query: str) -> Graph:
+        """The triples a query anchored on the IRIs in its text can match"""
+        query = DECLARATION_PATTERN.sub('', query)
+        subjects = {URIRef(iri) for iri in IRI_PATTERN.findall(query)}
+        if not subjects:
+            return self.graph
+        graph = self.graph
+        for iri in set(OBJECT_IRI_PATTERN.findall(query)):
+            subjects.update(graph.subjects(None, URIRef(iri), unique=True))
+        subgraph = Graph()
+        level = subjects
+        for _ in range(BLANK_NODE_LEVELS + 1):
+            below = set()
+            for subject in level:
+                for triple in graph.triples((subject, None, None)):
+                    subgraph.add(triple)
+                    obj = triple[2]
+                    if isinstance(obj, BNode) or '/.well-known/genid/' in obj:
+                        below.add(obj)
+            level = below - subjects
+            subjects |= below
+        return subgraph
+
+    def start(self) -> 'FakeSPARQLEndpoint':
+        """Serve in a background thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def add_dataset_arguments(parser: argparse.ArgumentParser):
+    """Add the options of fixtures.build_dataset to a command line parser"""
+    parser.add_argument('--small', type=int, default=200, help='number of small records')
+    parser.add_argument('--large', type=int, default=2, help='number of large records')
+    parser.add_argument('--record-triples', type=int, default=5000, help='triples per large record')
+    parser.add_argument('--trees', type=int, default=2, help='number of blank-node trees')
+    parser.add_argument('--tree-depth', type=int, default=6, help='levels of blank nodes per tree')
+    parser.add_argument('--hubs', type=int, default=1, help='number of hubs')
+    parser.add_argument('--hub-size', type=int, default=100000, help='resources linking to each hub')
+
+
+def dataset_options(args) -> dict:
+    """The build_dataset() arguments from parsed command line options"""
+    return {
+        'small': args.small,
+        'large': args.large,
+        'record_triples': args.record_triples,
+        'trees': args.trees,
+        'tree_depth': args.tree_depth,
+        'hubs': args.hubs,
+        'hub_size': args.hub_size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8890)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every answer')
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph, resources = build_dataset(**dataset_options(args))
+    server = FakeSPARQLEndpoint(graph, args.latency, args.host, args.port)
+    print(f"{len(graph)} triples generated in {time.perf_counter() - start:.1f}s, serving at {server.url}", flush=True)
+    for kind, uris in resources.items():
+        if uris:
+            print(f"  {kind}: {uris[0]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
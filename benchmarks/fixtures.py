@@ -0,0 +1,138 @@
+"""
+Synthetic resources for the load benchmarks
+
+Generators for the kinds of resources that stress different paths of the
+viewer, all under config.BASE_URI so the app resolves them like real data:
+
+- small records: a dozen triples, like most resources
+- large records: thousands of triples on one subject
+- blank-node trees: nested blank nodes, of which the CONSTRUCT query follows two levels
+- hubs: resources that many other resources link to (inverse relations)
+
+build_dataset() combines them into one graph for the fake SPARQL endpoint,
+together with the identity URIs of each kind.
+"""
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from rdflib import Graph, URIRef, BNode, Literal, RDF, XSD
+import config
+
+SCHEMA = 'http://schema.org/'
+NAME = URIRef(SCHEMA + 'name')
+DESCRIPTION = URIRef(SCHEMA + 'description')
+DATE_MODIFIED = URIRef(SCHEMA + 'dateModified')
+
+
+def identity_uri(kind: str, i: int) -> str:
+    """The identity URI of the i-th generated resource of a kind"""
+    return f"{config.BASE_URI}id/bench/{kind}/{i}"
+
+
+def small_record(graph: Graph, uri: str, i: int):
+    """Add a resource of about a dozen triples, linking to other small records"""
+    subject = URIRef(uri)
+    graph.add((subject, RDF.type, URIRef(SCHEMA + 'Book')))
+    graph.add((subject, NAME, Literal(f'Book {i}')))
+    graph.add((subject, NAME, Literal(f'Boek {i}', lang='nl')))
+    graph.add((subject, DESCRIPTION, Literal(f'A generated book, number {i}, for the benchmarks')))
+    graph.add((subject, URIRef(SCHEMA + 'datePublished'), Literal(f'{1900 + i % 120}-01-01', datatype=XSD.date)))
+    graph.add((subject, DATE_MODIFIED, Literal('2024-01-01T00:00:00', datatype=XSD.dateTime)))
+    graph.add((subject, URIRef(SCHEMA + 'numberOfPages'), Literal(100 + i)))
+    graph.add((subject, URIRef(SCHEMA + 'isbn'), Literal(f'978{i:010d}')))
+    graph.add((subject, URIRef(SCHEMA + 'author'), URIRef(identity_uri('small', i // 2))))
+    graph.add((subject, URIRef(SCHEMA + 'about'), URIRef(identity_uri('small', (i * 7) % (i + 1)))))
+    graph.add((subject, URIRef(SCHEMA + 'sameAs'), URIRef(f'http://www.wikidata.org/entity/Q{i + 1}')))
+
+
+def large_record(graph: Graph, uri: str, triples: int):
+    """Add a resource with about the given number of triples, spread over a few dozen predicates"""
+    subject = URIRef(uri)
+    graph.add((subject, RDF.type, URIRef(SCHEMA + 'Collection')))
+    graph.add((subject, NAME, Literal(f'Collection {uri.rsplit("/", 1)[-1]}')))
+    for i in range(triples - 2):
+        predicate = URIRef(f'https://example.org/def/property{i % 40}')
+        if i % 2:
+            graph.add((subject, predicate, Literal(f'Value {i}')))
+        else:
+            graph.add((subject, predicate, URIRef(identity_uri('member', i))))
+
+
+def blank_node_tree(graph: Graph, uri: str, depth: int, fanout: int):
+    """Add a resource with a tree of blank nodes, depth levels deep and fanout children per node"""
+    subject = URIRef(uri)
+    graph.add((subject, RDF.type, URIRef(SCHEMA + 'CreativeWork')))
+    graph.add((subject, NAME, Literal(f'Tree {uri.rsplit("/", 1)[-1]}')))
+    parents = [subject]
+    for level in range(depth):
+        children = []
+        for parent in parents:
+            for i in range(fanout):
+                child = BNode()
+                graph.add((parent, URIRef(SCHEMA + 'hasPart'), child))
+                graph.add((child, NAME, Literal(f'Part {level}.{i}')))
+                graph.add((child, URIRef(SCHEMA + 'position'), Literal(i)))
+                children.append(child)
+        parents = children
+
+
+def hub(graph: Graph, uri: str, size: int, predicates: int = 5):
+    """Add a resource that size labelled resources link to, with a few different predicates"""
+    subject = URIRef(uri)
+    graph.add((subject, RDF.type, URIRef(SCHEMA + 'Place')))
+    graph.add((subject, NAME, Literal(f'Hub {uri.rsplit("/", 1)[-1]}')))
+    linking = [URIRef(f'https://example.org/def/link{i}') for i in range(predicates)]
+    for i in range(size):
+        member = URIRef(f'{uri}/member/{i}')
+        graph.add((member, linking[i % predicates], subject))
+        graph.add((member, NAME, Literal(f'Member {i}')))
+
+
+def datasets(graph: Graph, count: int):
+    """Add the schema:Dataset resources listed on the home page"""
+    for i in range(count):
+        subject = URIRef(identity_uri('dataset', i))
+        graph.add((subject, RDF.type, URIRef(SCHEMA + 'Dataset')))
+        graph.add((subject, NAME, Literal(f'Dataset {i}')))
+        graph.add((subject, DESCRIPTION, Literal(f'Generated dataset {i}')))
+        graph.add((subject, DATE_MODIFIED, Literal('2024-01-01', datatype=XSD.date)))
+
+
+def build_dataset(small: int = 200, large: int = 2, record_triples: int = 5000, trees: int = 2,
+                  tree_depth: int = 6, tree_fanout: int = 3, hubs: int = 1, hub_size: int = 100000) -> tuple:
+    """
+    Build the benchmark dataset
+
+    Args:
+        small: Number of small records
+        large: Number of large records
+        record_triples: Triples per large record
+        trees: Number of blank-node trees
+        tree_depth, tree_fanout: Shape of each tree
+        hubs: Number of hubs
+        hub_size: Resources linking to each hub
+
+    Returns:
+        tuple: (graph, resources), resources mapping each kind to its identity URIs
+    """
+    graph = Graph()
+    resources = {'small': [], 'large': [], 'tree': [], 'hub': []}
+    for i in range(small):
+        uri = identity_uri('small', i)
+        small_record(graph, uri, i)
+        resources['small'].append(uri)
+    for i in range(large):
+        uri = identity_uri('large', i)
+        large_record(graph, uri, record_triples)
+        resources['large'].append(uri)
+    for i in range(trees):
+        uri = identity_uri('tree', i)
+        blank_node_tree(graph, uri, tree_depth, tree_fanout)
+        resources['tree'].append(uri)
+    for i in range(hubs):
+        uri = identity_uri('hub', i)
+        hub(graph, uri, hub_size)
+        resources['hub'].append(uri)
+    datasets(graph, 10)
+    return graph, resources
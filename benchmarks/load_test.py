@@ -0,0 +1,324 @@
+"""
+Load benchmark of the viewer against a local fake SPARQL endpoint
+
+Starts fake_sparql_endpoint.py with the synthetic dataset and the viewer
+(bench_app.py, under the threaded Werkzeug server or gunicorn) as separate
+processes, warms them up, and then sends a fixed number of requests per
+scenario: every kind of generated resource in every output format, the
+home page, semantic redirects, conditional requests and the inverse
+relations JSON endpoint. Reports the throughput and the p50/p95/p99
+response times (up to the last byte of the body) per scenario, and stores
+them with the settings of the run as JSON, so runs of different releases
+can be compared with --compare.
+
+Usage:
+    python benchmarks/load_test.py [--server flask|gunicorn] [--workers 3] [--worker-class gevent] [--concurrency 8]
+                                   [--requests 200] [--latency 0.02] [--graph-cache]
+                                   [--output results.json] [--compare previous.json] [dataset options]
+"""
+import sys
+import os
+import json
+import math
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import urllib3
+import config
+from uri_utils import identity_uri_to_page_uri
+from rdf_sources.sparql_endpoint import SPARQLEndpoint
+from fixtures import identity_uri
+from fake_sparql_endpoint import add_dataset_arguments, dataset_options
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+
+# Accept headers of the output formats
+FORMATS = {
+    'html': 'text/html',
+    'turtle': 'text/turtle',
+    'json-ld': 'application/ld+json',
+    'nt': 'application/n-triples',
+    'xml': 'application/rdf+xml',
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, process: subprocess.Popen, timeout: float):
+    """Wait until a server answers, or fail when its process exits or the timeout passes"""
+    http = urllib3.PoolManager(retries=False)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with code {process.returncode}")
+        try:
+            http.request('GET', url, timeout=1.0, redirect=False)
+            return
+        except urllib3.exceptions.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} not answering after {timeout}s")
+
+
+def start_endpoint(args) -> tuple:
+    """Start the fake SPARQL endpoint, returning its process and URL"""
+    port = free_port()
+    command = [sys.executable, os.path.join(BENCHMARKS, 'fake_sparql_endpoint.py'),
+               '--port', str(port), '--latency', str(args.latency)]
+    for option, value in dataset_options(args).items():
+        command += [f"--{option.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(command)
+    url = f"http://127.0.0.1:{port}/sparql"
+    # Generating a large dataset takes a while
+    wait_for(url, process, timeout=600)
+    return process, url
+
+
+def start_app(args, endpoint_url: str, work_dir: str) -> tuple:
+    """Start the viewer, returning its process and base URL"""
+    port = free_port()
+    env = dict(os.environ,
+               LDVIEW_BENCH_ENDPOINT=endpoint_url,
+               LDVIEW_BENCH_DIR=work_dir,
+               LDVIEW_BENCH_GRAPH_CACHE='1' if args.graph_cache else '0')
+    if args.server == 'gunicorn':
+        # Run from the benchmarks directory, so the gunicorn.conf.py of the deployment isn't picked up
+        command = ['gunicorn', '--workers', str(args.workers), '--threads', str(args.threads),
+                   '--worker-class', args.worker_class, '--worker-connections', str(args.worker_connections),
+                   '--bind', f"127.0.0.1:{port}", '--log-level', 'warning', 'bench_app:app']
+    else:
+        command = [sys.executable, 'bench_app.py', str(port)]
+    process = subprocess.Popen(command, cwd=BENCHMARKS, env=env)
+    url = f"http://127.0.0.1:{port}/"
+    wait_for(url, process, timeout=60)
+    return process, url
+
+
+def scenarios(args) -> list:
+    """The (name, route, format, paths, headers, expected status) of every scenario"""
+    def page_paths(kind: str, count: int) -> list:
+        return [identity_uri_to_page_uri(identity_uri(kind, i))[len(config.BASE_URI):] for i in range(count)]
+
+    kinds = {
+        'small': page_paths('small', args.small),
+        'large': page_paths('large', args.large),
+        'tree': page_paths('tree', args.trees),
+        'hub': page_paths('hub', args.hubs),
+    }
+    result = []
+    for kind, paths in kinds.items():
+        if not paths:
+            continue
+        for name, mime_type in FORMATS.items():
+            result.append((f"{kind} {name}", 'resource', name, paths, {'Accept': mime_type}, 200))
+    result.append(('home html', 'home', 'html', [''], {'Accept': 'text/html'}, 200))
+    if args.small:
+        redirects = [identity_uri(kind, i)[len(config.BASE_URI):] for kind, i in (('small', 0), ('small', args.small - 1))]
+        result.append(('small redirect', 'redirect', '-', redirects, {'Accept': 'text/html'}, 303))
+        # Revalidation with the ETag of the warm-up response, answered before the page is rendered
+        result.append(('small html 304', 'resource', 'html', kinds['small'], {'Accept': 'text/html', 'If-None-Match': None}, 304))
+    if args.hubs:
+        hub_uri = identity_uri('hub', 0)
+        query = urlencode({'uri': hub_uri, 'predicate': 'https://example.org/def/link0', 'limit': 50})
+        result.append(('hub inverse-relations', 'inverse-relations', 'json',
+                       [f"{config.INVERSE_RELATIONS_API_PAGE}?{query}"], {}, 200))
+    return result
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def fetch(http, url: str, headers: dict) -> tuple:
+    """Request a URL and read the whole body, returning (seconds, status, bytes)"""
+    start = time.perf_counter()
+    response = http.request('GET', url, headers=headers, redirect=False, timeout=60.0)
+    return time.perf_counter() - start, response.status, len(response.data)
+
+
+def run_scenario(http, base_url: str, scenario: tuple, etags: dict, requests: int, concurrency: int) -> dict:
+    name, route, format_name, paths, headers, expected = scenario
+
+    def request(i: int) -> tuple:
+        path = paths[i % len(paths)]
+        request_headers = dict(headers)
+        if 'If-None-Match' in request_headers:
+            request_headers['If-None-Match'] = etags.get(path, '"none"')
+        return fetch(http, base_url + path, request_headers)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(request, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    durations = sorted(seconds for seconds, _, _ in results)
+    summary = {
+        'route': route,
+        'format': format_name,
+        'requests': requests,
+        'errors': sum(1 for _, status, _ in results if status != expected),
+        'throughput': round(requests / elapsed, 2),
+        'mean_ms': round(sum(durations) / len(durations) * 1000, 2),
+        'max_ms': round(durations[-1] * 1000, 2),
+        'bytes': sum(size for _, _, size in results) // requests,
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(percentile(durations, p) * 1000, 2)
+    return summary
+
+
+def warm_up_hubs(endpoint_url: str, args):
+    """
+    Send the inverse relation queries of the hubs straight to the fake endpoint
+
+    Their first evaluation takes longer than INVERSE_RELATIONS_TIMEOUT, so the
+    viewer would render the hubs without them all through the warm-up. The
+    queries are those of the viewer's own SPARQLEndpoint, sent without its
+    timeouts and circuit breaker.
+    """
+    config.SPARQL_READ_TIMEOUT = config.INVERSE_RELATIONS_TIMEOUT = 3600
+    config.SPARQL_BREAKER_FAILURES = 0
+    source = SPARQLEndpoint(endpoint_url, config.BASE_URI)
+    for i in range(args.hubs):
+        uri = identity_uri('hub', i)
+        source.get_inverse_relations(uri)
+        source.get_inverse_subjects(uri, 'https://example.org/def/link0', 0, 51)
+
+
+def warm_up(http, base_url: str, all_scenarios: list, rounds: int) -> dict:
+    """Request every path once per round, so the endpoint and caches are warm; returns the ETags"""
+    etags = {}
+    for _ in range(rounds):
+        for _, _, _, paths, headers, _ in all_scenarios:
+            headers = {name: value for name, value in headers.items() if name != 'If-None-Match'}
+            for path in paths:
+                response = http.request('GET', base_url + path, headers=headers, redirect=False, timeout=120.0)
+                if 'ETag' in response.headers and headers.get('Accept') == 'text/html':
+                    etags[path] = response.headers['ETag']
+    return etags
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, previous: dict, threshold: float) -> list:
+    """Print the change of p50 and p95 per scenario, returning the scenarios slower than threshold"""
+    regressions = []
+    print(f"\n{'scenario':28} {'p50 before':>11} {'p50 now':>9} {'p95 before':>11} {'p95 now':>9}")
+    for name, now in results.items():
+        before = previous.get(name)
+        if before is None:
+            continue
+        ratio = now['p95_ms'] / before['p95_ms'] if before['p95_ms'] else 1.0
+        flag = '  slower' if ratio > threshold else ''
+        print(f"{name:28} {before['p50_ms']:11.1f} {now['p50_ms']:9.1f} {before['p95_ms']:11.1f} {now['p95_ms']:9.1f}{flag}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--server', choices=('flask', 'gunicorn'), default='flask')
+    parser.add_argument('--workers', type=int, default=3, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='threads per gunicorn worker')
+    parser.add_argument('--worker-class', default='sync', help="gunicorn worker class, e.g. 'gevent'")
+    parser.add_argument('--worker-connections', type=int, default=300, help="requests per 'gevent' worker")
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--only', action='append', help='run the scenarios whose name contains this (repeatable)')
+    parser.add_argument('--warmup', type=int, default=2, help='warm-up rounds over all paths')
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds the fake endpoint adds to every answer')
+    parser.add_argument('--graph-cache', action='store_true', help='keep the graph cache enabled')
+    parser.add_argument('--output', help='JSON file for the results, by default in benchmarks/results/')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.2, help='p95 ratio reported as slower with --compare')
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='ldview-bench-')
+    processes = []
+    try:
+        endpoint, endpoint_url = start_endpoint(args)
+        processes.append(endpoint)
+        app, base_url = start_app(args, endpoint_url, work_dir)
+        processes.append(app)
+
+        http = urllib3.PoolManager(maxsize=args.concurrency, retries=False)
+        all_scenarios = scenarios(args)
+        if args.only:
+            all_scenarios = [scenario for scenario in all_scenarios if any(part in scenario[0] for part in args.only)]
+        warm_up_hubs(endpoint_url, args)
+        etags = warm_up(http, base_url, all_scenarios, args.warmup)
+
+        results = {}
+        print(f"{'scenario':28} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for scenario in all_scenarios:
+            summary = run_scenario(http, base_url, scenario, etags, args.requests, args.concurrency)
+            results[scenario[0]] = summary
+            print(f"{scenario[0]:28} {summary['throughput']:8.1f} {summary['p50_ms']:8.1f} "
+                  f"{summary['p95_ms']:8.1f} {summary['p99_ms']:8.1f} {summary['errors']:7d}", flush=True)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    run = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'server': args.server,
+            'workers': args.workers if args.server == 'gunicorn' else 1,
+            'threads': args.threads if args.server == 'gunicorn' else None,
+            'worker_class': args.worker_class if args.server == 'gunicorn' else None,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'latency': args.latency,
+            'graph_cache': args.graph_cache,
+            'dataset': dataset_options(args),
+        },
+        'results': results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(os.path.join(BENCHMARKS, 'results'), exist_ok=True)
+        output = os.path.join(BENCHMARKS, 'results', f"load-{args.server}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        settings = ('server', 'workers', 'threads', 'worker_class', 'concurrency', 'latency', 'graph_cache', 'dataset')
+        changed = [name for name in settings if previous['meta'].get(name) != run['meta'][name]]
+        if changed:
+            print(f"\nNote: {args.compare} was run with other settings: {', '.join(changed)}")
+        if compare(results, previous['results'], args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+from datetime import datetime, date, timezone
+from flask import Response
+from rdflib import Graph, URIRef, BNode, Literal
+import config
+
+# Bounds the refinement of blank node signatures, e.g. along long chains of alike blank nodes
+MAX_REFINEMENT_ROUNDS = 16
+
+def _hash(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+def _encode_term(term) -> bytes:
+    """Encode a non-blank RDF term unambiguously, so encodings can be concatenated"""
+    if isinstance(term, Literal):
+        tag, text = b'L', f"{term}\x00{term.language or ''}\x00{term.datatype or ''}"
+    else:
+        tag, text = b'U', str(term)
+    data = text.encode('utf-8', 'surrogatepass')
+    return tag + len(data).to_bytes(4, 'big') + data
+
+def graph_digest(graph: Graph) -> str:
+    """
+    Compute a content hash of a graph that doesn't depend on blank node labels
+
+    Blank nodes are identified by a signature made from the triples around
+    them, refined round by round with the signatures of linked blank nodes
+    until no more blank nodes can be told apart. Isomorphic graphs therefore
+    get the same hash, whatever labels the data source or parser assigned.
+    (Like any such refinement it can't tell apart some highly symmetric
+    blank node structures of the same size, which is fine for validators.)
+
+    Args:
+        graph: The graph to hash
+
+    Returns:
+        str: Hexadecimal digest
+    """
+    encoded = {}
+    def encode(term):
+        value = encoded.get(term)
+        if value is None:
+            value = encoded[term] = _encode_term(term)
+        return value
+
+    digests = []
+    static = {}  # blank node -> digests of its triples with no other blank node
+    links = {}  # blank node -> (direction + predicate, other blank node) per triple linking them
+    for s, p, o in graph:
+        s_blank = isinstance(s, BNode)
+        o_blank = isinstance(o, BNode)
+        if not s_blank and not o_blank:
+            digests.append(_hash(encode(s) + encode(p) + encode(o)))
+        elif not o_blank:
+            static.setdefault(s, []).append(_hash(b'@' + encode(p) + encode(o)))
+        elif not s_blank:
+            static.setdefault(o, []).append(_hash(encode(s) + encode(p) + b'@'))
+        elif s == o:
+            static.setdefault(s, []).append(_hash(b'@' + encode(p) + b'@'))
+        else:
+            predicate = encode(p)
+            static.setdefault(s, [])
+            static.setdefault(o, [])
+            links.setdefault(s, []).append((b'>' + predicate, o))
+            links.setdefault(o, []).append((b'<' + predicate, s))
+
+    if static:
+        signatures = {node: _hash(b''.join(sorted(parts))) for node, parts in static.items()}
+        # Blank nodes without links to other blank nodes are fully described by now
+        classes = len(set(signatures.values()))
+        for _ in range(MAX_REFINEMENT_ROUNDS if links else 0):
+            refined = {
+                node: _hash(signatures[node] + b''.join(sorted(
+                    label + signatures[other] for label, other in node_links
+                )))
+                for node, node_links in links.items()
+            }
+            signatures.update(refined)
+            refined_classes = len(set(signatures.values()))
+            if refined_classes == classes or refined_classes == len(signatures):
+                break
+            classes = refined_classes
+        digests.extend(signatures.values())
+
+    digests.sort()
+    return _hash(b''.join(digests)).hex()
+
+def representation_etag(*parts) -> str:
+    """Build an ETag value from the parts a representation depends on"""
+    return _hash(b''.join(_hash(str(part).encode('utf-8', 'surrogatepass')) for part in parts)).hex()
+
+def files_fingerprint(directory: str) -> str:
+    """Fingerprint the files in a directory, e.g. the templates a view is rendered with"""
+    parts = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                parts.append(_hash(os.path.relpath(path, directory).encode('utf-8')) + _hash(f.read()))
+    return _hash(b''.join(parts)).hex()
+
+def config_fingerprint(values: list, paths: list = ()) -> str:
+    """
+    Fingerprint configuration values and the files they name, e.g. the prefixes RDF is serialized with
+
+    Args:
+        values: JSON serializable configuration values
+        paths: Paths of configuration files, None for a file that isn't configured
+
+    Returns:
+        str: Hexadecimal digest
+    """
+    parts = [_hash(json.dumps(value, sort_keys=True).encode('utf-8')) for value in values]
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                parts.append(_hash(f.read()))
+        except (TypeError, OSError):
+            # Not configured, or reported when the output is written
+            parts.append(_hash(str(path).encode('utf-8')))
+    return _hash(b''.join(parts)).hex()
+
+def graph_last_modified(graph: Graph, id_uri: str) -> datetime:
+    """
+    Get the modification date of a resource from the predicates in config.LAST_MODIFIED_PREDICATES
+
+    Returns:
+        datetime: The latest modification date in UTC, to the second, or None if not given
+    """
+    subject = URIRef(id_uri)
+    latest = None
+    for pred_uri in config.LAST_MODIFIED_PREDICATES:
+        for obj in graph.objects(subject, URIRef(pred_uri)):
+            value = obj.toPython() if isinstance(obj, Literal) else None
+            if isinstance(value, datetime):
+                value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+            elif isinstance(value, date):
+                value = datetime(value.year, value.month, value.day, tzinfo=timezone.utc)
+            else:
+                continue
+            value = value.replace(microsecond=0)
+            if latest is None or value > latest:
+                latest = value
+    return latest
+
+def is_not_modified(request, etag: str, last_modified: datetime = None) -> bool:
+    """
+    Check the conditional headers of a GET request against the validators of a representation
+
+    If-None-Match takes precedence; If-Modified-Since is only used without it.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+def add_caching_headers(response: Response, policy: str, etag: str = None,
+                        last_modified: datetime = None, vary_accept: bool = False,
+                        vary_encoding: bool = False) -> Response:
+    """
+    Add validators and the Cache-Control header of a policy in config.CACHE_CONTROL to a response
+
+    Args:
+        response: The response to add the headers to
+        policy: Key in config.CACHE_CONTROL, a route or output format name
+        etag: Optional ETag value, sent as a weak validator
+        last_modified: Optional modification date
+        vary_accept: Whether the representation was selected with the Accept header
+        vary_encoding: Whether the content coding was selected with the Accept-Encoding header
+
+    Returns:
+        Response: The same response
+    """
+    if etag is not None:
+        # Weak, since serializations may differ in blank node labels between requests
+        response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    cache_control = config.CACHE_CONTROL.get(policy, config.CACHE_CONTROL.get('default'))
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    if vary_accept:
+        response.vary.add('Accept')
+    if vary_encoding:
+        response.vary.add('Accept-Encoding')
+    return response
+
+def not_modified_response(policy: str, etag: str, last_modified: datetime = None, vary_accept: bool = False,
+                          vary_encoding: bool = False) -> Response:
+    """Create a 304 response carrying the same caching headers as the full response"""
+    return add_caching_headers(Response(status=304), policy, etag, last_modified, vary_accept, vary_encoding)
@@ -1,4 +1,9 @@
 ## ldview config ##
+import os
+import tempfile
+
+# Local state of the worker processes (caches, indexes, metrics), in a directory only this user can access
+STATE_DIRECTORY = os.path.join(tempfile.gettempdir(), f'ldview-{os.getuid()}')
 
 #BASE_URI = 'http://data.bibliotheken.nl/'
 BASE_URI = 'https://data.digitopia.nl/'
@@ -13,21 +18,104 @@ SEMANTIC_REDIRECT_URI_SEGMENTS = {
 }
 
 # Date source configuration
-RDF_DATA_SOURCE_TYPE = 'sparql'  # Options: 'sparql', 'turtlefiles'
+RDF_DATA_SOURCE_TYPE = 'sparql'  # Options: 'sparql', 'turtlefiles', 'hdt', 'dump'
 
 # turtlefiles -> source configuration:
 TURTLE_FILES_DIRECTORY = 'resources'  # Directory containing .ttl files
+TURTLE_GRAPH_CACHE_SIZE = 1024  # Parsed graphs kept in memory per worker until their file changes (0 disables)
+TURTLE_SIDECAR_DIRECTORY = os.path.join(STATE_DIRECTORY, 'turtle-graphs')  # Pre-parsed copies of the files, loaded instead of re-parsing (None disables)
+TURTLE_INVERSE_INDEX_PATH = os.path.join(STATE_DIRECTORY, 'turtle-inverse.sqlite')  # Index of the links between the files, for inverse relations (None disables)
+TURTLE_INVERSE_INDEX_INTERVAL = 60  # Seconds between background scans for added, changed and removed files (0 disables)
+
+# dump -> source configuration:
+DUMP_FILE = 'data/dump.nt'  # One N-Triples (or, with extension .nq, N-Quads) file with all resources, ideally sorted by subject
+DUMP_INDEX_PATH = None  # Subject index of the dump, DUMP_FILE + '.index.sqlite' when None; build it with: python -m rdf_sources.ntriples_dump
+DUMP_HOME_PAGE_TYPE = 'http://schema.org/Dataset'  # Resources of this type are listed on the homepage (None for no homepage)
+DUMP_HOME_PAGE_PREDICATES = [  # Predicates of those resources shown on the homepage
+    'http://schema.org/name',
+    'http://schema.org/description',
+    'http://schema.org/dateModified',
+]
+
+# hdt -> source configuration (requires the hdt package, see requirements.txt):
+HDT_FILE = 'hdt/example.hdt'  # Memory-mapped HDT file; its index (HDT_FILE + '.index.v1-1') is created next to it when missing
+HDT_HOME_PAGE_TYPE = 'http://schema.org/Dataset'  # Resources of this type are listed on the homepage
+HDT_HOME_PAGE_PREDICATES = [  # Predicates of those resources shown on the homepage
+    'http://schema.org/name',
+    'http://schema.org/description',
+    'http://schema.org/dateModified',
+]
 
 # sparql -> endpoint configuration:
 SPARQL_ENDPOINT = "https://data.digitopia.nl/sparql"  # Pas dit aan naar het gewenste endpoint
 #SPARQL_ENDPOINT = "https://api.bibliotheken.nl/datasets/KB/Production/services/Production-VTS/sparql"  # Pas dit aan naar het gewenste endpoint
 
+# sparql -> HTTP connection pool, kept alive and reused across requests within a worker:
+SPARQL_POOL_CONNECTIONS = 4  # Number of per-host connection pools to keep
+SPARQL_POOL_MAXSIZE = 10  # Maximum number of kept-alive connections per host (WORKER_CONNECTIONS with gevent workers)
+SPARQL_POOL_BLOCK = False  # When True, wait for a free pooled connection instead of opening an extra one
+SPARQL_CONNECT_TIMEOUT = 3.0  # Seconds to wait for a connection to the endpoint
+SPARQL_READ_TIMEOUT = 10.0  # Seconds to wait for the endpoint to send data
+SPARQL_CONNECT_RETRIES = 1  # Retries on connection errors (queries are never re-sent after a read error)
+SPARQL_MAX_TRIPLES = 500000  # Larger CONSTRUCT results are aborted while they are received
+# Circuit breaker per worker; the optional inverse relations and label queries are refused while it is open, but never open it
+SPARQL_BREAKER_FAILURES = 5  # Consecutive failed or slow queries after which a worker stops querying the endpoint (0 disables)
+SPARQL_BREAKER_SLOW_CALL = 5.0  # Seconds after which a query counts as failed, even when it is answered
+SPARQL_BREAKER_RESET_TIMEOUT = 30  # Seconds before a worker tries the endpoint again; meanwhile cached graphs are served, or a 503
+
+# The data source queries of one request (main graph, inverse relations, labels) share this budget,
+# so a slow data source can't hold a worker longer (seconds, 0 disables)
+REQUEST_DEADLINE = 10.0
+
+# Resource graph cache, on local disk and shared by all worker processes:
+GRAPH_CACHE_ENABLED = True
+GRAPH_CACHE_PATH = os.path.join(STATE_DIRECTORY, 'graph-cache.sqlite')  # SQLite database holding the cached graphs
+GRAPH_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Least recently used graphs are evicted above this size
+GRAPH_CACHE_TTL = 300  # Seconds a cached graph is served without asking the data source
+GRAPH_CACHE_STALE_TTL = 3600  # Seconds after that a cached graph is still served while refreshed in the background
+OUTPUT_CACHE_ENABLED = True  # Also keep serialized RDF output in the graph cache, evicted along with its graph
+OUTPUT_CACHE_MAX_ENTRY_BYTES = 8 * 1024 * 1024  # Larger serializations are streamed without being cached
+OUTPUT_CACHE_ENCODINGS = ['br', 'gzip']  # Precompressed variants served by Accept-Encoding; 'br' needs the brotli package
+
+# Request coalescing: concurrent lookups for the same URI share one upstream query.
+# Within a worker this always applies; across workers it works through the graph cache.
+SINGLE_FLIGHT_ENABLED = True
+SINGLE_FLIGHT_TIMEOUT = 15  # Seconds a worker waits for another worker fetching the same graph
+
+# Negative cache: resources found missing are answered with a 404 without asking the data source again.
+# Kept per worker, and shared by all workers through the graph cache when that is enabled.
+NEGATIVE_CACHE_ENABLED = True
+NEGATIVE_CACHE_SIZE = 100000  # Missing resources remembered per worker
+NEGATIVE_CACHE_TTL = 60  # Seconds a missing resource is remembered, so a new resource shows up at most this late
+
+# Labels of linked resources, shown instead of their URIs in the HTML view:
+OBJECT_LABELS_ENABLED = True
+LABEL_CACHE_SIZE = 100000  # URIs whose label (or lack of one) is kept per worker
+LABEL_CACHE_TTL = 3600  # Seconds a looked up label is reused
+LABEL_LOOKUP_MAX_URIS = 1000  # Linked URIs labelled per page, all in one lookup
+LABEL_LOOKUP_TIMEOUT = 2.0  # Seconds to wait for the labels from the SPARQL endpoint
+
+# HTTP caching: ETag/Last-Modified validators, answered with 304 before rendering or serializing
+LAST_MODIFIED_PREDICATES = [  # Date(Time) literals on the resource used for Last-Modified, the latest wins
+    'http://purl.org/dc/terms/modified',
+    'http://schema.org/dateModified',
+]
+CACHE_CONTROL = {  # Cache-Control per output format and route; 'default' for formats not listed
+    'html': 'public, max-age=60, stale-while-revalidate=300',
+    'default': 'public, max-age=300, stale-while-revalidate=3600',
+    'inverse-relations': 'public, max-age=60, stale-while-revalidate=300',
+    'yasgui': 'public, max-age=3600',
+    'stale': 'no-cache',  # Expired cached graphs, served while the data source fails
+}
+
 # Content negotiation settings
 SUPPORTED_OUTPUT_FORMATS = {
     'text/html': 'html',
     'application/rdf+xml': 'xml',
     'text/turtle': 'turtle',
-    'application/ld+json': 'json-ld'
+    'application/ld+json': 'json-ld',
+    'application/n-triples': 'nt',
+    'application/n-quads': 'nquads'
 }
 
 # Namespaces as used in 'html' view: 
@@ -42,6 +130,9 @@ NAMESPACES = {
     'dc': 'http://purl.org/dc/elements/1.1/',
     'dcterms': 'http://purl.org/dc/terms/'
 }
+NAMESPACES_FILE = None  # Optional JSON prefix map to add, e.g. 'namespaces.json' from https://prefix.cc/popular/all.file.json
+JSONLD_CONTEXT_FILE = None  # Optional static JSON-LD context (a JSON file with an "@context" object) added to the NAMESPACES prefixes in JSON-LD output
+SHORTEN_URI_CACHE_SIZE = 65536  # Number of shortened URIs kept in memory per worker
 
 # Predicate config for html viewer:
 LABEL_PREDICATES = [
@@ -200,3 +291,28 @@ YASGUI_PAGE = 'yasgui'  # Will be accessible at {BASE_URI}{YASGUI_PAGE}
 
 # Display configuration
 MAX_INVERSE_SUBJECTS = 5 # Maximum number of subjects to show for inverse relations
+
+# Inverse relations retrieval: 'aggregate' lets the SPARQL endpoint count them and return a labelled
+# sample of MAX_INVERSE_SUBJECTS per predicate; 'graph' fetches all inverse triples (other sources always do)
+INVERSE_RELATIONS_MODE = 'aggregate'
+INVERSE_RELATIONS_API_PAGE = 'inverse-relations'  # JSON paging endpoint at {BASE_URI}{INVERSE_RELATIONS_API_PAGE}
+INVERSE_RELATIONS_PAGE_SIZE = 50  # Default number of subjects per page of the JSON endpoint
+INVERSE_RELATIONS_MAX_PAGE_SIZE = 1000  # Maximum number of subjects per page of the JSON endpoint
+
+# Instrumentation: per-stage durations as Server-Timing header, Prometheus metrics of all workers
+SERVER_TIMING_ENABLED = True
+METRICS_ENABLED = True
+METRICS_PAGE = 'metrics'  # Prometheus text format at {BASE_URI}{METRICS_PAGE}; restrict access in the proxy
+METRICS_PATH = os.path.join(STATE_DIRECTORY, 'metrics.sqlite')  # SQLite database with the totals of all worker processes
+
+# Gunicorn workers (read by gunicorn.conf.py): 'gevent' workers serve many requests at once, switching between
+# them while they wait on the SPARQL endpoint; 'sync' workers serve one request at a time. 'auto' picks 'gevent'
+# for the 'sparql' source when the gevent package is installed, and 'sync' for the local sources, whose work
+# is CPU-bound and would hold up the other requests of a gevent worker
+WORKER_CLASS = 'auto'
+WORKER_CONNECTIONS = 300  # Requests a gevent worker serves at once; its SPARQL connection and inverse relations pools match it
+
+# Inverse relations are fetched concurrently with the main graph for HTML views:
+CONCURRENT_INVERSE_RELATIONS = True  # Set to False to fetch them after the main graph
+INVERSE_RELATIONS_WORKERS = 4  # Threads per worker process for concurrent inverse relations lookups (WORKER_CONNECTIONS with gevent)
+INVERSE_RELATIONS_TIMEOUT = 3.0  # Seconds to wait for inverse relations before rendering without them
@@ -1,6 +1,7 @@
 from flask import Response
 from rdflib import Graph
 import logging
+from streaming_serializers import SERIALIZERS
 
 logger = logging.getLogger(__name__)
 
@@ -24,8 +25,21 @@ class ContentNegotiator:
             'format': 'json-ld',
             'content_type': 'application/ld+json; charset=utf-8',
             'mime_type': 'application/ld+json'
+        },
+        'nt': {
+            'format': 'nt',
+            'content_type': 'application/n-triples; charset=utf-8',
+            'mime_type': 'application/n-triples'
+        },
+        'nquads': {
+            'format': 'nquads',
+            'content_type': 'application/n-quads; charset=utf-8',
+            'mime_type': 'application/n-quads'
         }
     }
+
+    # Media types answered with the HTML view
+    HTML_MIME_TYPES = ('text/html', 'application/xhtml+xml')
     
     @classmethod
     def get_response(cls, graph: Graph, format_param: str = None, accept_header: str = None) -> Response:
@@ -40,24 +54,129 @@ class ContentNegotiator:
         Returns:
             Response: Flask response with the appropriate content type and serialized data
         """
+        format_info = cls.select_format(format_param, accept_header)
+        if format_info:
+            return cls._create_response(graph, format_info)
+
+        # No matching format found, return None to indicate HTML should be used
+        return None
+
+    @classmethod
+    def select_format(cls, format_param: str = None, accept_header: str = None) -> dict:
+        """
+        Select the RDF output format for a request, without needing the graph
+        
+        Args:
+            format_param: Optional format parameter from URL
+            accept_header: Optional HTTP accept header
+            
+        Returns:
+            dict: Format information from FORMATS, or None when HTML should be used
+        """
         # First try format parameter
         if format_param and format_param in cls.FORMATS:
-            format_info = cls.FORMATS[format_param]
-            return cls._create_response(graph, format_info)
+            return cls.FORMATS[format_param]
             
         # Then try accept header
         if accept_header:
-            for format_info in cls.FORMATS.values():
-                if accept_header == format_info['mime_type']:
-                    return cls._create_response(graph, format_info)
-                    
-        # No matching format found, return None to indicate HTML should be used
+            return cls._best_format(cls.parse_accept(accept_header))
+
         return None
-    
+
+    @staticmethod
+    def parse_accept(accept_header: str) -> list:
+        """
+        Parse an HTTP Accept header
+
+        Args:
+            accept_header: Value of the Accept header
+
+        Returns:
+            list: (media range, q-value) tuples in header order; media ranges are lowercase
+        """
+        ranges = []
+        for item in accept_header.split(','):
+            parts = item.split(';')
+            media_range = parts[0].strip().lower()
+            if not media_range:
+                continue
+            quality = 1.0
+            for param in parts[1:]:
+                name, _, value = param.partition('=')
+                if name.strip().lower() == 'q':
+                    try:
+                        quality = min(max(float(value), 0.0), 1.0)
+                    except ValueError:
+                        quality = 0.0
+            ranges.append((media_range, quality))
+        return ranges
+
+    @staticmethod
+    def _quality(mime_type: str, ranges: list) -> tuple:
+        """
+        Get the q-value of a media type from its most specific matching range
+
+        Returns:
+            tuple: (q-value, specificity, -position) of the matching range, None without a match
+        """
+        main_type = mime_type.split('/')[0]
+        best = None
+        for position, (media_range, quality) in enumerate(ranges):
+            if media_range == mime_type:
+                specificity = 2
+            elif media_range == main_type + '/*':
+                specificity = 1
+            elif media_range == '*/*':
+                specificity = 0
+            else:
+                continue
+            if best is None or specificity > best[1]:
+                best = (quality, specificity, -position)
+        return best
+
+    @classmethod
+    def _best_format(cls, ranges: list) -> dict:
+        """
+        Pick the format with the highest q-value; more specific and earlier ranges win ties
+
+        HTML comes first, so browsers and clients sending only */* keep getting
+        the HTML view. Without any acceptable RDF format HTML is used too.
+        """
+        best_format = None
+        best = None
+        for format_info in [None] + list(cls.FORMATS.values()):
+            mime_types = cls.HTML_MIME_TYPES if format_info is None else (format_info['mime_type'],)
+            for mime_type in mime_types:
+                quality = cls._quality(mime_type, ranges)
+                if quality is not None and quality[0] > 0 and (best is None or quality > best):
+                    best_format, best = format_info, quality
+        return best_format
+
     @staticmethod
-    def _create_response(graph: Graph, format_info: dict) -> Response:
+    def serialize(graph: Graph, format_info: dict):
+        """
+        Serialize a graph in a format, as an iterable of text chunks
+
+        Formats with a streaming serializer are written chunk by chunk, so
+        large graphs are never serialized in one piece; RDF/XML is serialized
+        by rdflib as a single chunk.
+
+        Args:
+            graph: The RDF graph to serialize
+            format_info: Dictionary containing format information
+
+        Returns:
+            Iterable of str chunks
+        """
+        serializer = SERIALIZERS.get(format_info['format'])
+        if serializer is not None:
+            return serializer(graph)
+        return [graph.serialize(format=format_info['format'])]
+
+    @classmethod
+    def _create_response(cls, graph: Graph, format_info: dict) -> Response:
         """
-        Create a Flask response with the serialized graph
+        Create a Flask response with the serialized graph, streamed while it is written
         
         Args:
             graph: The RDF graph to serialize
@@ -66,7 +185,4 @@ class ContentNegotiator:
         Returns:
             Response: Flask response with the appropriate content type and serialized data
         """
-        return Response(
-            graph.serialize(format=format_info['format']),
-            content_type=format_info['content_type']
-        )
+        return Response(cls.serialize(graph, format_info), content_type=format_info['content_type'])
@@ -0,0 +1,41 @@
+import threading
+import config
+
+try:
+    from gevent import monkey
+except ImportError:  # Optional dependency, only needed for gevent workers
+    monkey = None
+
+def is_cooperative() -> bool:
+    """
+    Check if this process runs a gevent worker
+
+    gunicorn's gevent worker patches blocking I/O before the app is loaded,
+    so a request waiting on the data source lets the worker go on with
+    other requests.
+    """
+    return monkey is not None and monkey.is_module_patched('socket')
+
+def pool_size(size: int) -> int:
+    """
+    Size a pool shared by the requests of a worker process
+
+    Args:
+        size: The size for a worker serving one request at a time
+
+    Returns:
+        int: size, or config.WORKER_CONNECTIONS when larger in a gevent worker
+    """
+    return max(size, config.WORKER_CONNECTIONS) if is_cooperative() else size
+
+def thread_local() -> threading.local:
+    """
+    Create a threading.local that stays per thread in a gevent worker
+
+    gevent makes threading.local per greenlet, which would give every
+    request its own SQLite connection; the greenlets of a thread can share
+    one, as long as every statement is committed before they switch.
+    """
+    if is_cooperative():
+        return monkey.get_original('threading', 'local')()
+    return threading.local()
@@ -0,0 +1,57 @@
+import contextvars
+import time
+
+# Monotonic time by which the current request must be done with the data source, or None
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting a query when the request has no time left for it"""
+    pass
+
+def start(seconds: float) -> contextvars.Token:
+    """
+    Start the deadline of a request
+
+    The main graph, inverse relations and label queries of a request share
+    one budget, so together they can't hold a worker longer than this. Run
+    work for the request in other threads with contextvars.copy_context().run
+    to give it the same deadline.
+
+    Args:
+        seconds: The budget of the request (0 for none)
+
+    Returns:
+        contextvars.Token: Token for end()
+    """
+    return _deadline.set(time.monotonic() + seconds if seconds else None)
+
+def end(token: contextvars.Token):
+    """End the deadline started with start()"""
+    _deadline.reset(token)
+
+def remaining() -> float:
+    """Get the seconds left for the current request, or None without a deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def timeout(limit: float) -> float:
+    """
+    Limit a timeout to the time left for the current request
+
+    Args:
+        limit: The timeout of the operation itself
+
+    Returns:
+        float: limit, or the time left when that is less
+
+    Raises:
+        DeadlineExceeded: When no time is left
+    """
+    left = remaining()
+    if left is None:
+        return limit
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(limit, left)
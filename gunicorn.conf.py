@@ -1,4 +1,21 @@
 # Gunicorn configuration file
+import os
+import sys
+
+# The worker settings come from the app's config.py, next to this file
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import config
+
+def _worker_class():
+    if config.WORKER_CLASS != 'auto':
+        return config.WORKER_CLASS
+    if config.RDF_DATA_SOURCE_TYPE != 'sparql':
+        return 'sync'
+    try:
+        import gevent
+    except ImportError:
+        return 'sync'
+    return 'gevent'
 
 # Server socket
 bind = '0.0.0.0:8000'  # Listen on all interfaces
@@ -6,8 +23,8 @@ backlog = 2048
 
 # Worker processes
 workers = 3  # Regel van duim: 2 * aantal CPU cores + 1
-worker_class = 'sync'
-worker_connections = 1000
+worker_class = _worker_class()  # See WORKER_CLASS in config.py
+worker_connections = config.WORKER_CONNECTIONS  # Concurrent requests per 'gevent' worker
 timeout = 30
 keepalive = 2
 
@@ -29,7 +46,7 @@ worker_tmp_dir = '/var/run/ldview'
 
 # Server mechanics
 daemon = False
-umask = 0
+umask = 0o027  # Nothing the workers create is writable or readable by other users
 user = None
 group = None
 tmp_upload_dir = None
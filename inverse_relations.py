@@ -1,4 +1,4 @@
-from urllib.parse import quote
+from urllib.parse import quote, urlencode
 import config
 from rdflib import Graph, URIRef
 
@@ -7,6 +7,9 @@ def prerender_inverse_relations(graph: Graph, id_uri: str) -> dict:
     Process an RDF graph containing inverse relations to prepare it for view presentation.
     The output structure matches exactly that of get_inverse_relations().
     
+    Counts, capped subject samples and the subject labels are all collected in
+    a single pass over the graph, so the cost is linear in the number of triples.
+    
     Args:
         graph: RDFLib Graph containing the inverse relations
         id_uri: The URI that was used as object in the inverse relations
@@ -14,77 +17,139 @@ def prerender_inverse_relations(graph: Graph, id_uri: str) -> dict:
     Returns:
         dict: Dictionary containing inverse relations grouped by predicate, with counts and YASGUI links
     """
-    inverse_relations = {}
+    target = URIRef(id_uri)
+    max_subjects = config.MAX_INVERSE_SUBJECTS
+    label_ranks = {URIRef(label_pred): rank for rank, label_pred in enumerate(config.LABEL_PREDICATES)}
+    
+    counts = {}  # predicate -> number of subjects
+    samples = {}  # predicate -> first max_subjects subjects
+    labels = {}  # subject -> (rank of label predicate, label)
     
-    # First pass: collect all predicates and their subjects
     for s, p, o in graph:
-        if str(o) != id_uri:
-            continue
-            
-        pred = str(p)
-        subj = str(s)
+        if o == target:
+            if p in counts:
+                counts[p] += 1
+                if len(samples[p]) < max_subjects:
+                    samples[p].append(s)
+            else:
+                counts[p] = 1
+                samples[p] = [s] if max_subjects > 0 else []
         
-        if pred not in inverse_relations:
-            inverse_relations[pred] = []
-            
-        # Get label if available
-        label = ''
-        for label_pred in config.LABEL_PREDICATES:
-            for label_obj in graph.objects(s, URIRef(label_pred)):
-                label = str(label_obj)
-                break
-            if label:
-                break
-                
-        if len(inverse_relations[pred]) < config.MAX_INVERSE_SUBJECTS:
-            inverse_relations[pred].append({
-                'uri': subj,
-                'label': label
-            })
+        # Keep the label of the first matching predicate in config.LABEL_PREDICATES
+        rank = label_ranks.get(p)
+        if rank is not None:
+            current = labels.get(s)
+            if (current is None or rank < current[0]) and str(o):
+                labels[s] = (rank, str(o))
+    
+    inverse_relations = {}
+    for pred, subjects in samples.items():
+        inverse_relations[str(pred)] = [
+            {'uri': str(subj), 'label': labels[subj][1] if subj in labels else ''}
+            for subj in subjects
+        ]
     
-    # Second pass: structure the results with counts and YASGUI links where needed
-    for pred in list(inverse_relations.keys()):  # Use list() to avoid dictionary size change during iteration
-        # Count total subjects for this predicate
-        total_count = sum(1 for s, p, o in graph if str(p) == pred and str(o) == id_uri)
+    return summarize_inverse_relations(inverse_relations, {str(pred): count for pred, count in counts.items()}, id_uri)
+
+def summarize_inverse_relations(samples: dict, counts: dict, id_uri: str) -> dict:
+    """
+    Structure sampled inverse relations with their counts and links to the complete lists.
+    
+    Args:
+        samples: Dictionary mapping predicate URIs to lists of {'uri', 'label'} subject dicts
+        counts: Dictionary mapping predicate URIs to the total number of subjects
+        id_uri: The URI that was used as object in the inverse relations
         
-        # Build YASGUI URL if we have more results than shown
+    Returns:
+        dict: Dictionary containing inverse relations grouped by predicate, with counts and links
+              to the complete lists (YASGUI in SPARQL mode, the JSON pages always)
+    """
+    inverse_relations = {}
+    for pred, subjects in samples.items():
+        total_count = counts.get(pred, len(subjects))
+        
+        # Link the complete list if we have more results than shown
         if total_count > config.MAX_INVERSE_SUBJECTS:
-            yasgui_url = '/' + config.YASGUI_PAGE.strip('/') + '#'
-            
-            # Build YASGUI query
-            label_optionals = "\n  ".join(f"OPTIONAL {{ ?s <{pred}> ?label }}" for pred in config.LABEL_PREDICATES)
-            yasgui_query = f"""
-SELECT ?s ?label WHERE {{
-  ?s <{pred}> <{id_uri}> .
-  FILTER(!isBlank(?s))
-  {label_optionals}
-}} ORDER BY ?s
-            """
-            
-            yasgui_params = {
-                'query': yasgui_query,
-                'endpoint': config.SPARQL_ENDPOINT,
-                'requestMethod': 'POST',
-                'tabTitle': f'Inverse relations for {id_uri}',
-                'headers': '{}'
-            }
-            
-            param_strings = []
-            for key, value in yasgui_params.items():
-                param_strings.append(f"{key}={quote(value)}")
-            yasgui_url += '&'.join(param_strings)
-            
-            # Add URL to the results
             inverse_relations[pred] = {
-                'subjects': inverse_relations[pred],
+                'subjects': subjects,
                 'total_count': total_count,
-                'yasgui_url': yasgui_url
+                'page_url': build_page_url(pred, id_uri)
             }
+            # YASGUI is only served in SPARQL mode
+            if config.RDF_DATA_SOURCE_TYPE == 'sparql':
+                inverse_relations[pred]['yasgui_url'] = build_yasgui_url(pred, id_uri)
         else:
             # Just wrap the subjects in a dict for consistent structure
             inverse_relations[pred] = {
-                'subjects': inverse_relations[pred],
+                'subjects': subjects,
                 'total_count': total_count
             }
     
     return inverse_relations
+
+def build_yasgui_url(pred: str, id_uri: str) -> str:
+    """
+    Build a YASGUI link with a query listing all subjects for an inverse predicate.
+    """
+    yasgui_url = '/' + config.YASGUI_PAGE.strip('/') + '#'
+    
+    # Build YASGUI query
+    label_optionals = "\n  ".join(f"OPTIONAL {{ ?s <{label_pred}> ?label }}" for label_pred in config.LABEL_PREDICATES)
+    yasgui_query = f"""
+SELECT ?s ?label WHERE {{
+  ?s <{pred}> <{id_uri}> .
+  FILTER(!isBlank(?s))
+  {label_optionals}
+}} ORDER BY ?s
+            """
+    
+    yasgui_params = {
+        'query': yasgui_query,
+        'endpoint': config.SPARQL_ENDPOINT,
+        'requestMethod': 'POST',
+        'tabTitle': f'Inverse relations for {id_uri}',
+        'headers': '{}'
+    }
+    
+    param_strings = []
+    for key, value in yasgui_params.items():
+        param_strings.append(f"{key}={quote(value)}")
+    return yasgui_url + '&'.join(param_strings)
+
+def build_page_url(pred: str, id_uri: str, offset: int = 0, limit: int = None) -> str:
+    """
+    Build a link to the JSON endpoint that pages through all subjects for an inverse predicate.
+    """
+    return '/' + config.INVERSE_RELATIONS_API_PAGE.strip('/') + '?' + urlencode({
+        'uri': id_uri,
+        'predicate': pred,
+        'offset': offset,
+        'limit': limit or config.INVERSE_RELATIONS_PAGE_SIZE
+    })
+
+def page_inverse_subjects(graph: Graph, id_uri: str, predicate: str, offset: int, limit: int) -> list:
+    """
+    Get one page of the subjects linking to id_uri with predicate, ordered by subject URI.
+    
+    Args:
+        graph: RDFLib Graph containing the inverse relations
+        id_uri: The URI that was used as object in the inverse relations
+        predicate: The inverse predicate to list subjects for
+        offset: Number of subjects to skip
+        limit: Maximum number of subjects to return
+        
+    Returns:
+        list: Subject dicts with 'uri' and 'label'
+    """
+    subjects = sorted(str(s) for s in graph.subjects(URIRef(predicate), URIRef(id_uri)))
+    page = []
+    for subj in subjects[offset:offset + limit]:
+        label = ''
+        for label_pred in config.LABEL_PREDICATES:
+            for label_obj in graph.objects(URIRef(subj), URIRef(label_pred)):
+                label = str(label_obj)
+                break
+            if label:
+                break
+        page.append({'uri': subj, 'label': label})
+    return page
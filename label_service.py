@@ -0,0 +1,68 @@
+import logging
+import time
+from rdf_sources.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+class LabelService:
+    """
+    Labels of linked resources, looked up in batches and kept in a long-lived cache
+
+    A page asks for the labels of all resources it links to at once. Labels
+    in the cache (including the knowledge that a resource has none) are
+    answered from memory; the rest are looked up together in a single call
+    to the data source, so a page costs at most one extra round-trip.
+    """
+
+    def __init__(self, lookup, cache_size: int, ttl: float, max_uris: int):
+        """
+        Initialize LabelService
+
+        Args:
+            lookup: Callable taking a list of URIs and returning a dictionary of their labels,
+                    like RDFSource.get_labels
+            cache_size: Maximum number of URIs kept in the cache
+            ttl: Seconds a looked up label (or its absence) is reused
+            max_uris: Maximum number of URIs looked up per call; the rest stay unlabelled
+        """
+        self.lookup = lookup
+        self.cache = LRUCache(cache_size)
+        self.ttl = ttl
+        self.max_uris = max_uris
+
+    def get_labels(self, uris) -> dict:
+        """
+        Get the labels of resources
+
+        Args:
+            uris: The URIs to label
+
+        Returns:
+            dict: The label of each URI that has one
+        """
+        now = time.monotonic()
+        labels = {}
+        missing = []
+        for uri in uris:
+            cached = self.cache.get(uri)
+            if cached is not None and cached[1] > now:
+                if cached[0]:
+                    labels[uri] = cached[0]
+            elif len(missing) < self.max_uris:
+                missing.append(uri)
+        if not missing:
+            return labels
+
+        try:
+            found = self.lookup(missing)
+        except Exception as e:
+            # Not cached, so the labels are looked up again by a later page
+            logger.warning(f"Label lookup for {len(missing)} URIs failed: {str(e)}")
+            return labels
+        expires = now + self.ttl
+        for uri in missing:
+            label = found.get(uri, '')
+            self.cache.set(uri, (label, expires))
+            if label:
+                labels[uri] = label
+        return labels
@@ -0,0 +1,208 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from flask import g, has_request_context
+from cooperative import thread_local
+from private_files import private_directory
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets per unit
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TRIPLE_COUNT_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+
+# Metric families: name -> (type, help)
+FAMILIES = {
+    'ldview_requests_total': ('counter', 'Requests handled, by route and status code'),
+    'ldview_request_duration_seconds': ('histogram', 'Time until the response starts, by route'),
+    'ldview_stage_duration_seconds': ('histogram', 'Time spent per stage of handling a request'),
+    'ldview_graph_triples': ('histogram', 'Number of triples in fetched resource graphs'),
+    'ldview_upstream_errors_total': ('counter', 'Failed lookups in the data source, by operation'),
+    'ldview_stale_responses_total': ('counter', 'Expired cached graphs served because the data source failed'),
+    'ldview_graph_cache_hits_total': ('counter', 'Graph cache hits, by freshness'),
+    'ldview_graph_cache_misses_total': ('counter', 'Graph cache misses'),
+    'ldview_graph_cache_evictions_total': ('counter', 'Entries evicted from the graph cache'),
+    'ldview_graph_cache_entries': ('gauge', 'Entries in the graph cache'),
+    'ldview_graph_cache_bytes': ('gauge', 'Total size of the graph cache entries'),
+}
+
+def _labels(labels: dict) -> str:
+    """Format labels in the exposition format, sorted so equal label sets give equal keys"""
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in sorted(labels.items()))
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class MetricsStore:
+    """
+    Counters and histograms merged over all worker processes
+
+    Every process adds to its own pending values, which a background thread
+    adds to shared totals in a SQLite database every FLUSH_INTERVAL, like the
+    CacheStore counters; histograms are kept as counters per bucket. A scrape
+    flushes the pending values of the scraping process and an exiting process
+    flushes its last values, so the totals lag at most FLUSH_INTERVAL behind
+    for the other workers, idle or not.
+    """
+
+    # Seconds between flushes of the per-process values
+    FLUSH_INTERVAL = 5.0
+
+    def __init__(self, path: str):
+        """
+        Initialize MetricsStore
+
+        Args:
+            path: Path of the SQLite database file, created when missing
+        """
+        self.path = path
+        self._local = thread_local()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flusher = None
+        self._flusher_pid = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            private_directory(directory)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS samples (
+                name TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (name, labels)
+            )
+        """)
+        atexit.register(self.flush)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the SQLite connection of the current thread (never one inherited over fork)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Add to a counter"""
+        self._add([(name, _labels(labels), value)])
+
+    def observe(self, name: str, value: float, buckets: tuple = DURATION_BUCKETS, **labels):
+        """Add an observation to a histogram"""
+        key = _labels(labels)
+        prefix = key + ',' if key else ''
+        # Buckets the value is over get 0, so every bucket is exposed
+        samples = [(f"{name}_bucket", f'{prefix}le="{bound}"', int(value <= bound)) for bound in buckets]
+        samples.append((f"{name}_bucket", f'{prefix}le="+Inf"', 1))
+        samples.append((f"{name}_sum", key, value))
+        samples.append((f"{name}_count", key, 1))
+        self._add(samples)
+
+    def _add(self, samples: list):
+        with self._lock:
+            for name, labels, value in samples:
+                self._pending[(name, labels)] = self._pending.get((name, labels), 0) + value
+            # Started by the worker process itself, threads don't survive a fork
+            if self._flusher_pid != os.getpid():
+                self._flusher = threading.Thread(target=self._run_flusher, name='metrics-flusher', daemon=True)
+                self._flusher_pid = os.getpid()
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        """Add the pending values of this process to the shared totals"""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        if not pending:
+            return
+        try:
+            self._connection().executemany(
+                "INSERT INTO samples (name, labels, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value",
+                [(name, labels, value) for (name, labels), value in pending.items()]
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not flush metrics: {str(e)}")
+
+    def samples(self) -> list:
+        """Get the (name, labels, value) totals of all processes"""
+        self.flush()
+        return self._connection().execute("SELECT name, labels, value FROM samples ORDER BY name, labels").fetchall()
+
+def cache_samples(stats: dict) -> list:
+    """Turn CacheStore.stats() into samples; the store merges them over the workers itself"""
+    return [
+        ('ldview_graph_cache_hits_total', 'freshness="fresh"', stats['hits']),
+        ('ldview_graph_cache_hits_total', 'freshness="stale"', stats['stale_hits']),
+        ('ldview_graph_cache_misses_total', '', stats['misses']),
+        ('ldview_graph_cache_evictions_total', '', stats['evictions']),
+        ('ldview_graph_cache_entries', '', stats['entries']),
+        ('ldview_graph_cache_bytes', '', stats['bytes']),
+    ]
+
+def _sample_order(sample: tuple) -> tuple:
+    """Order samples by name and labels, with histogram buckets by their numeric bound"""
+    name, labels, _ = sample
+    if not name.endswith('_bucket'):
+        return name, labels, 0.0
+    other, _, bound = labels.rpartition('le="')
+    return name, other, float(bound.rstrip('"').replace('+Inf', 'inf'))
+
+def render_metrics(samples: list) -> str:
+    """
+    Write samples in the Prometheus text exposition format
+
+    Args:
+        samples: (name, labels, value) tuples, where labels is a formatted label string
+
+    Returns:
+        str: The exposition, with the TYPE and HELP lines of the families in FAMILIES
+    """
+    by_family = {}
+    for name, labels, value in sorted(samples, key=_sample_order):
+        family = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and name[:-len(suffix)] in FAMILIES:
+                family = name[:-len(suffix)]
+        by_family.setdefault(family, []).append((name, labels, value))
+
+    lines = []
+    for family, family_samples in by_family.items():
+        metric_type, help_text = FAMILIES.get(family, ('untyped', ''))
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {metric_type}")
+        for name, labels, value in family_samples:
+            value = int(value) if float(value).is_integer() else value
+            lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+    return '\n'.join(lines) + '\n'
+
+@contextmanager
+def stage(name: str):
+    """Time a stage of the current request, for the Server-Timing header and the stage histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+def record_stage(name: str, seconds: float):
+    """Record the duration of a stage of the current request"""
+    if has_request_context():
+        g.setdefault('stage_timings', []).append((name, seconds))
+
+def server_timing(timings: list) -> str:
+    """Format stage durations as a Server-Timing header value, in milliseconds"""
+    return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings)
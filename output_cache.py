@@ -0,0 +1,126 @@
+import gzip
+import logging
+from flask import Response
+from content_negotiation import ContentNegotiator
+
+try:
+    import brotli
+except ImportError:  # Optional dependency, only needed for the 'br' encoding
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Compression functions per content coding
+COMPRESSORS = {
+    'gzip': lambda data: gzip.compress(data, compresslevel=6, mtime=0),
+}
+if brotli is not None:
+    COMPRESSORS['br'] = lambda data: brotli.compress(data, quality=9)
+
+class OutputCache:
+    """
+    Cache of serialized graphs and their compressed variants, in the graph CacheStore
+
+    Entries are keyed on the content digest of the graph, the output format
+    and a fingerprint of the serializer configuration, so harvesters asking for the same resource in several formats, or
+    for the same unchanged resource every night, don't make the slow rdflib
+    serializers run again. Every variant is stored as a child of the cached
+    graph, so it shares the size budget of the graph cache and is evicted
+    along with the graph.
+    """
+
+    def __init__(self, store, ttl: float, max_entry_bytes: int, encodings: list, fingerprint: str = ''):
+        """
+        Initialize OutputCache
+
+        Args:
+            store: The CacheStore of the graph cache
+            ttl: Seconds a serialization is kept (it can't go stale, its key changes with the graph)
+            max_entry_bytes: Serializations larger than this are streamed without being cached
+            encodings: Content codings to store precompressed variants for, by preference;
+                       codings without an installed compressor are skipped
+            fingerprint: Fingerprint of the configuration the serializers depend on, e.g. the prefixes
+        """
+        self.store = store
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.encodings = [encoding for encoding in encodings if encoding in COMPRESSORS]
+        self.fingerprint = fingerprint
+
+    def select_encoding(self, accept_encodings) -> str:
+        """
+        Pick the content coding for a request
+
+        Args:
+            accept_encodings: The werkzeug Accept object of the Accept-Encoding header
+
+        Returns:
+            str: A coding from self.encodings, or None for an uncompressed response
+        """
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accept_encodings.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def response(self, graph, format_info: dict, digest: str, accept_encodings, parent: str) -> Response:
+        """
+        Create the response for a graph in a format, from the cache when possible
+
+        On a miss the serialization is streamed to the client as usual while
+        it is collected; once complete, it is stored with its compressed
+        variants.
+
+        Args:
+            graph: The graph to serialize
+            format_info: Dictionary containing format information
+            digest: Content digest of the graph
+            accept_encodings: The werkzeug Accept object of the Accept-Encoding header
+            parent: Cache key of the graph, the entries are removed along with it
+
+        Returns:
+            Response: Flask response with the appropriate content type and encoding
+        """
+        key = f"output {digest} {format_info['format']} {self.fingerprint}"
+        encoding = self.select_encoding(accept_encodings)
+        if encoding is not None:
+            cached = self.store.get(f"{key} {encoding}", count=False)
+            if cached is not None:
+                response = Response(cached[0], content_type=format_info['content_type'])
+                response.headers['Content-Encoding'] = encoding
+                return self._vary(response)
+        cached = self.store.get(key, count=False)
+        if cached is not None:
+            return self._vary(Response(cached[0], content_type=format_info['content_type']))
+        body = self._collect(ContentNegotiator.serialize(graph, format_info), key, parent)
+        return self._vary(Response(body, content_type=format_info['content_type']))
+
+    @staticmethod
+    def _vary(response: Response) -> Response:
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _collect(self, chunks, key: str, parent: str):
+        """Pass on the encoded chunks, and store the whole serialization when it is complete"""
+        parts = []
+        size = 0
+        for chunk in chunks:
+            data = chunk.encode('utf-8')
+            if parts is not None:
+                size += len(data)
+                if size > self.max_entry_bytes:
+                    parts = None
+                else:
+                    parts.append(data)
+            yield data
+        if parts is not None:
+            self._store(key, b''.join(parts), parent)
+
+    def _store(self, key: str, data: bytes, parent: str):
+        try:
+            self.store.set(key, data, self.ttl, 0, parent=parent)
+            for encoding in self.encodings:
+                self.store.set(f"{key} {encoding}", COMPRESSORS[encoding](data), self.ttl, 0, parent=parent)
+        except Exception as e:
+            logger.warning(f"Could not cache {key}: {str(e)}")
@@ -0,0 +1,26 @@
+import os
+
+def private_directory(path: str) -> str:
+    """
+    Create a directory only the current user can access, or check an existing one
+
+    Caches and indexes in it are read back by the workers, so no other local
+    user may be able to write there, e.g. to plant a database or hold its
+    lock files.
+
+    Args:
+        path: The directory, created with its parents when missing
+
+    Returns:
+        str: path
+
+    Raises:
+        PermissionError: When the directory belongs to another user or others can write to it
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    status = os.stat(path)
+    if status.st_uid != os.getuid():
+        raise PermissionError(f"Directory {path} is owned by another user")
+    if status.st_mode & 0o022:
+        raise PermissionError(f"Directory {path} is writable by other users")
+    return path
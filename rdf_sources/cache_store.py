@@ -0,0 +1,276 @@
+import os
+import fcntl
+import sqlite3
+import threading
+import time
+import zlib
+import logging
+from contextlib import contextmanager
+from cooperative import thread_local
+from private_files import private_directory
+
+logger = logging.getLogger(__name__)
+
+class CacheStore:
+    """
+    Size-bounded key/value store on local disk, shared by all worker processes
+
+    Entries live in a single SQLite database (in WAL mode), so every gunicorn
+    worker on the host sees the same entries. Each entry has a fresh period
+    and a stale period; least recently used entries are evicted once the
+    total size exceeds max_bytes. An entry may name a parent entry, e.g. the
+    serializations of a cached graph; it is removed along with its parent.
+    Hit/miss counters are kept per process and periodically added to shared
+    totals.
+    """
+
+    # Access times are only rewritten when older than this, to keep hits cheap
+    ACCESS_RESOLUTION = 1.0
+    # Seconds between flushes of the per-process counters
+    COUNTER_FLUSH_INTERVAL = 5.0
+    COUNTERS = ('hits', 'stale_hits', 'misses', 'evictions')
+    # Number of lock files that keys are spread over for fill_lock()
+    LOCK_STRIPES = 1024
+
+    def __init__(self, path: str, max_bytes: int):
+        """
+        Initialize CacheStore
+
+        Args:
+            path: Path of the SQLite database file, created when missing
+            max_bytes: Maximum total size of the stored values
+
+        Raises:
+            PermissionError: When other users can write to the directory of the database
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = thread_local()
+        self._counter_lock = threading.Lock()
+        self._pending_counters = dict.fromkeys(self.COUNTERS, 0)
+        self._last_flush = time.monotonic()
+
+        # The cached graphs are decoded again by every worker, so keep others out
+        private_directory(os.path.dirname(os.path.abspath(path)))
+        self.lock_directory = private_directory(path + '.locks')
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                last_access REAL NOT NULL,
+                refreshing_until REAL NOT NULL DEFAULT 0,
+                value BLOB NOT NULL,
+                parent TEXT
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_access ON entries(last_access, size);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+        # Databases created before entries had parents
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(entries)")]
+        if 'parent' not in columns:
+            connection.execute("ALTER TABLE entries ADD COLUMN parent TEXT")
+        connection.execute("CREATE INDEX IF NOT EXISTS entries_parent ON entries(parent)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Return the SQLite connection of the current thread (never one inherited over fork)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _count(self, name: str):
+        with self._counter_lock:
+            self._pending_counters[name] += 1
+            if time.monotonic() - self._last_flush < self.COUNTER_FLUSH_INTERVAL:
+                return
+        self.flush_counters()
+
+    def flush_counters(self):
+        """Add the counters of this process to the shared totals"""
+        with self._counter_lock:
+            pending = {name: value for name, value in self._pending_counters.items() if value}
+            self._pending_counters = dict.fromkeys(self.COUNTERS, 0)
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            self._connection().executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                pending.items()
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not flush cache counters: {str(e)}")
+
+    def get(self, key: str, count: bool = True, expired: bool = False):
+        """
+        Look up an entry
+
+        Args:
+            key: The cache key
+            count: Whether the lookup is added to the hit/miss counters
+            expired: Whether an entry past its stale period is returned too, until it is evicted
+
+        Returns:
+            tuple: (value, is_fresh) for a fresh or stale entry, or None on a miss
+        """
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, fresh_until, stale_until, last_access FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[2] <= now and not expired):
+            if count:
+                self._count('misses')
+            return None
+
+        value, fresh_until, stale_until, last_access = row
+        if now - last_access > self.ACCESS_RESOLUTION:
+            connection.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        is_fresh = now < fresh_until
+        if count:
+            self._count('hits' if is_fresh else 'stale_hits')
+        return value, is_fresh
+
+    @contextmanager
+    def fill_lock(self, key: str, timeout: float):
+        """
+        Hold an exclusive lock for filling an entry, across worker processes
+
+        Workers that miss the same key at the same time take turns, so the
+        ones that wait can find the entry stored by the first instead of
+        fetching it themselves. Keys share lock files by hash, so an
+        unrelated key may occasionally wait as well.
+
+        Args:
+            key: The cache key
+            timeout: Seconds to wait for the lock before giving up
+
+        Yields:
+            bool: True when the lock was acquired, False after a timeout
+        """
+        stripe = zlib.crc32(key.encode('utf-8')) % self.LOCK_STRIPES
+        fd = os.open(os.path.join(self.lock_directory, f"{stripe}.lock"), os.O_CREAT | os.O_RDWR, 0o600)
+        locked = False
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        break
+                    time.sleep(0.01)
+            yield locked
+        finally:
+            if locked:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def set(self, key: str, value: bytes, ttl: float, stale_ttl: float, parent: str = None):
+        """
+        Store an entry and evict least recently used entries when over size
+
+        Args:
+            key: The cache key
+            value: The value to store
+            ttl: Seconds the entry is fresh
+            stale_ttl: Seconds after expiry the entry may still be served stale
+            parent: Optional key of the entry this one is removed with
+        """
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO entries (key, value, size, fresh_until, stale_until, last_access, parent) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, value, len(value), now + ttl, now + ttl + stale_ttl, now, parent)
+        )
+        self._evict()
+
+    @staticmethod
+    def _delete(connection: sqlite3.Connection, key: str) -> int:
+        """Remove an entry and its children, returning the number of bytes freed"""
+        freed = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries WHERE key = ? OR parent = ?", (key, key)
+        ).fetchone()[0]
+        connection.execute("DELETE FROM entries WHERE key = ? OR parent = ?", (key, key))
+        return freed
+
+    def delete(self, key: str):
+        """Remove an entry and its children"""
+        self._delete(self._connection(), key)
+
+    def claim_refresh(self, key: str, lease: float) -> bool:
+        """
+        Claim the background refresh of a stale entry for this process
+
+        Only one worker gets the claim until the lease expires, so a stale
+        entry is refreshed once rather than by every worker that serves it.
+
+        Args:
+            key: The cache key
+            lease: Seconds the claim is valid
+
+        Returns:
+            bool: True when this caller should perform the refresh
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE entries SET refreshing_until = ? WHERE key = ? AND refreshing_until < ?",
+            (now + lease, key, now)
+        )
+        return cursor.rowcount == 1
+
+    def _evict(self):
+        connection = self._connection()
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        evicted = 0
+        while total > self.max_bytes:
+            rows = connection.execute(
+                "SELECT key, size FROM entries ORDER BY last_access LIMIT 32"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                freed = self._delete(connection, key)
+                if not freed:
+                    # Already removed along with its parent
+                    continue
+                total -= freed
+                evicted += 1
+                if total <= self.max_bytes:
+                    break
+        if evicted:
+            with self._counter_lock:
+                self._pending_counters['evictions'] += evicted
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters, summed over all worker processes
+
+        Returns:
+            dict: Counter values plus the current number of entries and their total size
+        """
+        self.flush_counters()
+        connection = self._connection()
+        stats = dict.fromkeys(self.COUNTERS, 0)
+        stats.update(connection.execute("SELECT name, value FROM counters").fetchall())
+        stats['entries'], stats['bytes'] = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return stats
@@ -0,0 +1,226 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+from rdflib import Graph
+import logging
+from .rdf_source import RDFSource, ResourceNotFound
+from .cache_store import CacheStore
+from .graph_codec import dump_graph, load_graph
+import deadline
+
+logger = logging.getLogger(__name__)
+
+class CachedRDFSource(RDFSource):
+    """
+    RDF source that caches the graphs of another RDF source in a CacheStore
+
+    Fresh entries are served directly. Stale entries are served as well, while
+    one worker refreshes them from the wrapped source in the background
+    (stale-while-revalidate). Missing resources are remembered for missing_ttl
+    seconds, so the other workers don't ask the wrapped source for them either.
+    Expired graphs stay until they are evicted, for get_stale_rdf_for_uri().
+    """
+
+    # Stored instead of a graph for a missing resource, followed by the message
+    MISSING = b'missing '
+
+    def __init__(self, source: RDFSource, store: CacheStore, ttl: float, stale_ttl: float, fill_timeout: float = 0,
+                 missing_ttl: float = 0):
+        """
+        Initialize CachedRDFSource
+
+        Args:
+            source: The RDF source to cache
+            store: The store holding the cached graphs
+            ttl: Seconds a cached graph is served as fresh
+            stale_ttl: Seconds after that a cached graph is still served while it is refreshed
+            fill_timeout: Seconds to wait for another worker filling the same entry (0 disables)
+            missing_ttl: Seconds a missing resource is remembered (0 disables)
+        """
+        self.source = source
+        self.store = store
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.fill_timeout = fill_timeout
+        self.missing_ttl = missing_ttl
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+
+    def __getattr__(self, name):
+        # Source specific methods (e.g. SPARQLEndpoint.query) go to the wrapped source
+        if name == 'source':
+            raise AttributeError(name)
+        return getattr(self.source, name)
+
+    def _cached(self, key: str, fetch, encode=dump_graph, decode=load_graph):
+        """
+        Get a value from the cache, or fetch and store it
+
+        Args:
+            key: The cache key
+            fetch: Callable returning the value from the wrapped source
+            encode: Callable turning the value into bytes
+            decode: Callable turning bytes back into the value
+
+        Returns:
+            The cached or fetched value
+
+        Raises:
+            DeadlineExceeded: When the request has no time left to wait for another worker
+        """
+        value = self._lookup(key, fetch, encode, decode)
+        if value is not None:
+            return value
+
+        if not self.fill_timeout:
+            value = fetch()
+            self._store(key, value, encode)
+            return value
+
+        # Another worker may be fetching the same value: wait for it and re-check, but not past the
+        # request deadline (after a timeout the value is fetched directly, within what is left of it)
+        waiting_since = time.time()
+        with self.store.fill_lock(key, deadline.timeout(self.fill_timeout)):
+            value = self._lookup(key, fetch, encode, decode, count=False)
+            if value is None:
+                self._raise_missed_fill(key, waiting_since)
+                try:
+                    value = fetch()
+                except ResourceNotFound as e:
+                    self._record_missed_fill(key, e)
+                    raise
+                self._store(key, value, encode)
+        return value
+
+    @staticmethod
+    def _missed_fill_key(key: str) -> str:
+        return f"{key} missed-fill"
+
+    def _record_missed_fill(self, key: str, error: ResourceNotFound):
+        """
+        Tell the workers waiting for an entry that the resource is missing
+
+        Unlike a remembered miss (missing_ttl) this only answers the lookups
+        that were already waiting, later lookups fetch the resource again.
+        """
+        record = json.dumps({'time': time.time(), 'message': str(error)}).encode('utf-8')
+        self.store.set(self._missed_fill_key(key), record, self.fill_timeout, 0)
+
+    def _raise_missed_fill(self, key: str, waiting_since: float):
+        """Raise ResourceNotFound when the fill waited for found the resource missing"""
+        cached = self.store.get(self._missed_fill_key(key), count=False)
+        if cached is None:
+            return
+        try:
+            record = json.loads(cached[0])
+            missed_at, message = float(record['time']), str(record['message'])
+        except Exception:
+            return
+        if missed_at >= waiting_since:
+            raise ResourceNotFound(message)
+
+    def _lookup(self, key: str, fetch, encode, decode, count: bool = True):
+        """Get a value from the cache, scheduling a refresh when it is stale"""
+        cached = self.store.get(key, count=count)
+        if cached is None:
+            return None
+        data, is_fresh = cached
+        try:
+            value = decode(data)
+        except ResourceNotFound:
+            raise
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {str(e)}")
+            self.store.delete(key)
+            return None
+        if not is_fresh and self.store.claim_refresh(key, lease=self.ttl):
+            self._refresh_executor.submit(self._refresh, key, fetch, encode)
+        return value
+
+    def _store(self, key: str, value, encode):
+        self.store.set(key, encode(value), self.ttl, self.stale_ttl)
+
+    def _refresh(self, key: str, fetch, encode):
+        """Re-fetch a stale entry in the background"""
+        try:
+            self._store(key, fetch(), encode)
+        except ResourceNotFound:
+            # Remembered or removed by _fetch_graph
+            pass
+        except Exception as e:
+            logger.warning(f"Background refresh of {key} failed: {str(e)}")
+
+    @staticmethod
+    def graph_key(id_uri: str, page_uri: str = None) -> str:
+        """Get the cache key of the graph of a URI, e.g. to store entries removed along with it"""
+        return f"graph {id_uri} {page_uri or id_uri}"
+
+    def _fetch_graph(self, key: str, id_uri: str, page_uri: str) -> Graph:
+        """Fetch a graph from the wrapped source, remembering it when the resource is missing"""
+        try:
+            return self.source.get_rdf_for_uri(id_uri, page_uri)
+        except ResourceNotFound as e:
+            # Removes a graph cached before, with its serializations
+            self.store.delete(key)
+            if self.missing_ttl:
+                self.store.set(key, self.MISSING + str(e).encode('utf-8'), self.missing_ttl, 0)
+            raise
+
+    @staticmethod
+    def _load_summary(data: bytes) -> dict:
+        summary = json.loads(data)
+        if not isinstance(summary, dict):
+            raise ValueError("Inverse relations summary is not an object")
+        return summary
+
+    def _load_graph(self, data: bytes) -> Graph:
+        if data.startswith(self.MISSING):
+            raise ResourceNotFound(data[len(self.MISSING):].decode('utf-8'))
+        return load_graph(data)
+
+    def get_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+        key = self.graph_key(id_uri, page_uri)
+        return self._cached(
+            key,
+            lambda: self._fetch_graph(key, id_uri, page_uri),
+            decode=self._load_graph
+        )
+
+    def get_inverse_relations_graph(self, id_uri: str) -> Graph:
+        # Sources raise when the lookup fails, so an empty graph means no inverse relations
+        return self._cached(
+            f"inverse {id_uri}",
+            lambda: self.source.get_inverse_relations_graph(id_uri)
+        )
+
+    def get_inverse_relations(self, id_uri: str) -> dict:
+        # Most resources have no inverse relations, so empty summaries are cached as well
+        return self._cached(
+            f"inverse-summary {id_uri}",
+            lambda: self.source.get_inverse_relations(id_uri),
+            encode=lambda summary: json.dumps(summary).encode('utf-8'),
+            decode=self._load_summary
+        )
+
+    def get_inverse_subjects(self, id_uri: str, predicate: str, offset: int, limit: int) -> list:
+        return self.source.get_inverse_subjects(id_uri, predicate, offset, limit)
+
+    def get_labels(self, uris: list) -> dict:
+        return self.source.get_labels(uris)
+
+    def is_missing(self, id_uri: str, page_uri: str = None) -> bool:
+        return self.source.is_missing(id_uri, page_uri)
+
+    def get_stale_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+        """Get the cached graph of a URI even when it expired, or None"""
+        cached = self.store.get(self.graph_key(id_uri, page_uri), count=False, expired=True)
+        if cached is None:
+            return None
+        try:
+            return self._load_graph(cached[0])
+        except Exception:
+            # A missing resource, or an unreadable entry
+            return None
+
+    def stats(self) -> dict:
+        """Get the hit/miss counters of the cache"""
+        return self.store.stats()
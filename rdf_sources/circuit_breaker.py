@@ -0,0 +1,110 @@
+import threading
+import time
+from contextlib import contextmanager
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a service that is failing"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Stop calling a service after consecutive failures, and try again later
+
+    A call fails when it raises an exception that is_failure accepts, or when
+    it takes slow_call seconds or more; it succeeds when it returns in time.
+    Other exceptions (e.g. a timeout cut short by the caller) say nothing
+    about the service and leave the count as it is. After failures
+    consecutive failed calls the circuit opens: calls raise CircuitOpen
+    right away for reset_timeout seconds. Then a single trial call is let
+    through (half open); it closes the circuit again when it succeeds,
+    reopens it when it fails and lets another call try when it ends
+    otherwise. State is kept per worker process.
+    """
+
+    def __init__(self, failures: int, slow_call: float, reset_timeout: float):
+        """
+        Initialize CircuitBreaker
+
+        Args:
+            failures: Consecutive failed calls that open the circuit
+            slow_call: Seconds after which a call counts as failed, even when it succeeds
+            reset_timeout: Seconds the circuit stays open before a trial call
+        """
+        self.failures = failures
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failed = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently refused (the trial call of a half-open circuit aside)"""
+        return self._opened_at is not None
+
+    def check(self):
+        """
+        Refuse an optional call while the circuit is not closed
+
+        Optional calls (e.g. with short timeouts of their own) are made
+        outside call(): they neither count towards opening the circuit nor
+        serve as the trial call of a half-open circuit.
+
+        Raises:
+            CircuitOpen: When the circuit is open or half open
+        """
+        with self._lock:
+            if self._opened_at is not None:
+                retry_after = self._opened_at + self.reset_timeout - time.monotonic()
+                raise CircuitOpen("Circuit open after repeated failures", max(1.0, retry_after))
+
+    def _before_call(self) -> bool:
+        """Refuse a call while the circuit is open; returns whether the call is the trial call"""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            retry_after = self._opened_at + self.reset_timeout - time.monotonic()
+            if retry_after > 0 or self._trial_running:
+                raise CircuitOpen("Circuit open after repeated failures", max(1.0, retry_after))
+            self._trial_running = True
+            return True
+
+    def _record(self, failed: bool, is_trial: bool):
+        """Record the outcome of a call: failed, succeeded (False) or neither (None)"""
+        with self._lock:
+            if is_trial:
+                self._trial_running = False
+            if failed is None:
+                return
+            if not failed:
+                self._failed = 0
+                self._opened_at = None
+                return
+            self._failed += 1
+            if is_trial or self._failed >= self.failures:
+                self._opened_at = time.monotonic()
+
+    @contextmanager
+    def call(self, is_failure=lambda e: True):
+        """
+        Guard a call to the service
+
+        Args:
+            is_failure: Callable telling whether an exception raised by the call is a failure of the service
+
+        Raises:
+            CircuitOpen: When the circuit is open
+        """
+        is_trial = self._before_call()
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            failed = (isinstance(e, Exception) and is_failure(e)) or time.monotonic() - start >= self.slow_call
+            self._record(True if failed else None, is_trial)
+            raise
+        self._record(time.monotonic() - start >= self.slow_call, is_trial)
@@ -0,0 +1,184 @@
+from array import array
+from rdflib import Graph
+
+class CompactGraph:
+    """
+    Read-only graph of interned terms and parallel arrays of term ids
+
+    Every distinct term is held once, in a term table; a triple is three
+    ids at the same position in the subject, predicate and object arrays.
+    That takes a fraction of the memory of rdflib's Memory store, which
+    indexes every triple in several nested dictionaries.
+
+    Supports the parts of the rdflib Graph API the viewer uses: iteration,
+    len(), membership, triples(), subjects(), objects(), predicates(),
+    value() and serialize(). Pattern lookups use subject and object indexes
+    that are built on first use. to_graph() gives a regular rdflib Graph.
+    """
+    __slots__ = ('_terms', '_s', '_p', '_o', '_ids', '_by_subject', '_by_object')
+
+    def __init__(self, terms: list, subjects: array, predicates: array, objects: array):
+        """
+        Initialize CompactGraph; use from_triples() to build one from terms
+
+        Args:
+            terms: The term table
+            subjects, predicates, objects: Arrays of term ids, one position per triple;
+                                           triples must be distinct
+        """
+        self._terms = terms
+        self._s = subjects
+        self._p = predicates
+        self._o = objects
+        self._ids = None
+        self._by_subject = None
+        self._by_object = None
+
+    @classmethod
+    def from_triples(cls, triples) -> 'CompactGraph':
+        """Build a CompactGraph from (subject, predicate, object) triples, e.g. an rdflib Graph"""
+        builder = CompactGraphBuilder()
+        for triple in triples:
+            builder.add(triple)
+        return builder.build()
+
+    def __len__(self):
+        return len(self._s)
+
+    def __iter__(self):
+        terms = self._terms
+        for s, p, o in zip(self._s, self._p, self._o):
+            yield terms[s], terms[p], terms[o]
+
+    def __contains__(self, triple):
+        for _ in self.triples(triple):
+            return True
+        return False
+
+    def _term_id(self, term):
+        if self._ids is None:
+            self._ids = {t: i for i, t in enumerate(self._terms)}
+        return self._ids.get(term)
+
+    @staticmethod
+    def _index(ids: array) -> dict:
+        index = {}
+        for position, term_id in enumerate(ids):
+            positions = index.get(term_id)
+            if positions is None:
+                index[term_id] = [position]
+            else:
+                positions.append(position)
+        return index
+
+    def triples(self, pattern):
+        """Get the triples matching a (subject, predicate, object) pattern, None matching anything"""
+        subject, predicate, obj = pattern
+        wanted = []
+        for term in (subject, predicate, obj):
+            if term is None:
+                wanted.append(None)
+                continue
+            term_id = self._term_id(term)
+            if term_id is None:
+                return
+            wanted.append(term_id)
+        s_id, p_id, o_id = wanted
+
+        if s_id is not None:
+            if self._by_subject is None:
+                self._by_subject = self._index(self._s)
+            positions = self._by_subject.get(s_id, ())
+        elif o_id is not None:
+            if self._by_object is None:
+                self._by_object = self._index(self._o)
+            positions = self._by_object.get(o_id, ())
+        else:
+            positions = range(len(self._s))
+
+        terms = self._terms
+        for i in positions:
+            if ((s_id is None or self._s[i] == s_id) and (p_id is None or self._p[i] == p_id)
+                    and (o_id is None or self._o[i] == o_id)):
+                yield terms[self._s[i]], terms[self._p[i]], terms[self._o[i]]
+
+    def _select(self, position: int, pattern, unique: bool):
+        seen = set()
+        for triple in self.triples(pattern):
+            term = triple[position]
+            if unique:
+                if term in seen:
+                    continue
+                seen.add(term)
+            yield term
+
+    def subjects(self, predicate=None, object=None, unique: bool = False):
+        return self._select(0, (None, predicate, object), unique)
+
+    def predicates(self, subject=None, object=None, unique: bool = False):
+        return self._select(1, (subject, None, object), unique)
+
+    def objects(self, subject=None, predicate=None, unique: bool = False):
+        return self._select(2, (subject, predicate, None), unique)
+
+    def value(self, subject=None, predicate=None, object=None, default=None):
+        """Get the missing term of the first triple matching two given terms"""
+        missing = [subject, predicate, object].index(None)
+        for triple in self.triples((subject, predicate, object)):
+            return triple[missing]
+        return default
+
+    def to_graph(self) -> Graph:
+        """Copy the triples into a new rdflib Graph"""
+        graph = Graph()
+        add = graph.add
+        for triple in self:
+            add(triple)
+        return graph
+
+    def serialize(self, destination=None, format: str = 'turtle', **args):
+        """Serialize through an rdflib Graph; see rdflib.Graph.serialize"""
+        return self.to_graph().serialize(destination=destination, format=format, **args)
+
+class CompactGraphBuilder:
+    """
+    Collects triples into a CompactGraph, dropping duplicates
+
+    Also works as the sink of rdflib's N-Triples parser, so parsed triples
+    go straight into the compact form.
+    """
+    __slots__ = ('_ids', '_terms', '_s', '_p', '_o', '_seen')
+
+    def __init__(self):
+        self._ids = {}
+        self._terms = []
+        self._s, self._p, self._o = array('I'), array('I'), array('I')
+        self._seen = set()
+
+    def _term_id(self, term) -> int:
+        term_id = self._ids.get(term)
+        if term_id is None:
+            term_id = self._ids[term] = len(self._terms)
+            self._terms.append(term)
+        return term_id
+
+    def add(self, triple):
+        s_id, p_id, o_id = self._term_id(triple[0]), self._term_id(triple[1]), self._term_id(triple[2])
+        # One int per triple takes less memory than a tuple of ids
+        key = (s_id << 64) | (p_id << 32) | o_id
+        if key in self._seen:
+            return
+        self._seen.add(key)
+        self._s.append(s_id)
+        self._p.append(p_id)
+        self._o.append(o_id)
+
+    def triple(self, s, p, o):
+        """Sink interface of rdflib's N-Triples parser"""
+        self.add((s, p, o))
+
+    def __len__(self):
+        return len(self._s)
+
+    def build(self) -> CompactGraph:
+        return CompactGraph(self._terms, self._s, self._p, self._o)
@@ -0,0 +1,120 @@
+from array import array
+import json
+import struct
+from rdflib import Graph, URIRef, BNode, Literal
+from .compact_graph import CompactGraph
+
+# Bump when the encoded layout changes, so old cache entries are ignored
+FORMAT_VERSION = 2
+
+# Magic, format version, number of terms and length of the JSON term strings, followed by
+# the kind of each term (a byte), the term strings and the term ids
+_HEADER = struct.Struct('<4sBII')
+_MAGIC = b'LDVG'
+
+_URI, _BNODE, _LITERAL = 0, 1, 2
+
+class GraphDecodeError(Exception):
+    """Exception raised when encoded graph data cannot be decoded"""
+    pass
+
+def _encode_term(term, kinds: bytearray, strings: list):
+    if isinstance(term, Literal):
+        kinds.append(_LITERAL)
+        strings.extend((str(term), term.language or '', str(term.datatype or '')))
+    elif isinstance(term, BNode):
+        kinds.append(_BNODE)
+        strings.append(str(term))
+    else:
+        kinds.append(_URI)
+        strings.append(str(term))
+
+def _decode_terms(kinds: bytes, strings: list) -> list:
+    # One flat list of strings rather than a container per term, which would keep the garbage collector busy
+    terms = []
+    position = 0
+    for kind in kinds:
+        if kind == _URI:
+            terms.append(URIRef(strings[position]))
+            position += 1
+        elif kind == _BNODE:
+            terms.append(BNode(strings[position]))
+            position += 1
+        elif kind == _LITERAL:
+            datatype = strings[position + 2]
+            terms.append(Literal(strings[position], lang=strings[position + 1] or None,
+                                 datatype=URIRef(datatype) if datatype else None))
+            position += 3
+        else:
+            raise GraphDecodeError(f"Cannot decode graph data: unknown term kind {kind}")
+    if position != len(strings):
+        raise GraphDecodeError("Cannot decode graph data: term strings don't match the term kinds")
+    return terms
+
+def dump_graph(graph) -> bytes:
+    """
+    Encode a graph into a compact binary form that loads much faster than Turtle
+
+    Every distinct term is stored once in a term table (a kind byte per term
+    and a JSON list of strings); triples are stored as an array of 32-bit
+    term ids. Blank node labels are preserved.
+    The encoding holds data only, so reading it back can't run code, even
+    when a cache file was tampered with.
+
+    Args:
+        graph: The RDF graph to encode (an rdflib Graph or a CompactGraph)
+
+    Returns:
+        bytes: The encoded graph
+    """
+    term_ids = {}
+    kinds = bytearray()
+    strings = []
+    ids = array('I')
+    for triple in graph:
+        for term in triple:
+            term_id = term_ids.get(term)
+            if term_id is None:
+                term_id = term_ids[term] = len(kinds)
+                _encode_term(term, kinds, strings)
+            ids.append(term_id)
+    table = json.dumps(strings, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return _HEADER.pack(_MAGIC, FORMAT_VERSION, len(kinds), len(table)) + bytes(kinds) + table + ids.tobytes()
+
+def load_graph(data: bytes) -> CompactGraph:
+    """
+    Decode a graph encoded by dump_graph()
+
+    The term table and id arrays are used as they are, so decoding doesn't
+    have to insert every triple into an rdflib store.
+
+    Args:
+        data: The encoded graph
+
+    Returns:
+        CompactGraph: A new read-only graph with the decoded triples
+
+    Raises:
+        GraphDecodeError: When the data is corrupt or written by another format version
+    """
+    if len(data) < _HEADER.size:
+        raise GraphDecodeError("Cannot decode graph data: too short")
+    magic, version, term_count, table_size = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise GraphDecodeError("Cannot decode graph data: not an encoded graph")
+    if version != FORMAT_VERSION:
+        raise GraphDecodeError(f"Unsupported graph data version: {version}")
+
+    table_start = _HEADER.size + term_count
+    table_end = table_start + table_size
+    ids = array('I')
+    try:
+        terms = _decode_terms(data[_HEADER.size:table_start], json.loads(data[table_start:table_end]))
+        ids.frombytes(data[table_end:])
+    except GraphDecodeError:
+        raise
+    except Exception as e:
+        raise GraphDecodeError(f"Cannot decode graph data: {str(e)}")
+    if len(ids) % 3 or (ids and max(ids) >= len(terms)):
+        raise GraphDecodeError("Cannot decode graph data: term ids don't match the term table")
+    return CompactGraph(terms, ids[0::3], ids[1::3], ids[2::3])
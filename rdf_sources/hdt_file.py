@@ -0,0 +1,209 @@
+from rdflib import Graph, URIRef, BNode, Literal, RDF
+import threading
+import logging
+import config
+from inverse_relations import summarize_inverse_relations
+from .rdf_source import RDFSource, ResourceNotFound
+
+try:
+    from hdt import HDTDocument
+except ImportError:  # Optional dependency, only needed for RDF_DATA_SOURCE_TYPE 'hdt'
+    HDTDocument = None
+
+logger = logging.getLogger(__name__)
+
+SKOLEM_SEGMENT = '/.well-known/genid/'
+
+def parse_hdt_term(value: str):
+    """
+    Turn a term as stored in an HDT dictionary into an RDFLib term
+
+    HDT stores URIs without angle brackets, blank nodes as _:label and
+    literals as "lexical form", optionally followed by @lang or ^^<datatype>.
+    """
+    if value.startswith('"'):
+        end = value.rfind('"')
+        if end <= 0:
+            return Literal(value)
+        lexical, suffix = value[1:end], value[end + 1:]
+        if suffix.startswith('@'):
+            return Literal(lexical, lang=suffix[1:])
+        if suffix.startswith('^^'):
+            return Literal(lexical, datatype=URIRef(suffix[2:].strip('<>')))
+        return Literal(lexical)
+    if value.startswith('_:'):
+        return BNode(value[2:])
+    return URIRef(value)
+
+def is_blank_or_skolem(value: str) -> bool:
+    """Check if an HDT term is a blank node or a skolem IRI standing in for one"""
+    return value.startswith('_:') or (not value.startswith('"') and SKOLEM_SEGMENT in value)
+
+class HDTFile(RDFSource):
+    """
+    RDF source that reads a memory-mapped HDT file
+
+    Resources are looked up in the indexes of the HDT file itself, so no data
+    is loaded into memory up front and lookups don't leave the process.
+    Lookups for a URI include the blank nodes and skolem IRIs it refers to,
+    two levels deep, like config.SPARQL_CONSTRUCT_QUERY does.
+    """
+
+    # Levels of blank nodes / skolem IRIs included below the resource
+    EXPANSION_DEPTH = 2
+
+    def __init__(self, file_path: str, base_uri: str):
+        """
+        Initialize HDTFile source
+
+        Args:
+            file_path: Path of the HDT file. Object lookups need its index file
+                       (file_path + '.index.v1-1'), which is created when missing.
+            base_uri: Base URI of the resources in the file
+
+        Raises:
+            ImportError: When the hdt package (pyHDT) is not installed
+        """
+        if HDTDocument is None:
+            raise ImportError("RDF_DATA_SOURCE_TYPE 'hdt' requires the hdt package (pip install hdt)")
+        self.file_path = file_path
+        self.base_uri = base_uri
+        self.document = HDTDocument(file_path, map=True, indexed=True)
+        # Searches are served by iterators over shared state, so they don't run concurrently
+        self._lock = threading.Lock()
+
+    def _search(self, subject: str = '', predicate: str = '', obj: str = '', limit: int = 0, offset: int = 0) -> list:
+        """
+        Get the triples matching a pattern, as HDT term strings
+
+        Args:
+            subject, predicate, obj: Terms to match, '' matches anything
+            limit: Maximum number of triples to return (0 for all)
+            offset: Number of triples to skip
+
+        Returns:
+            list: (subject, predicate, object) tuples of HDT term strings
+        """
+        with self._lock:
+            triples, cardinality = self.document.search_triples(subject, predicate, obj, limit=limit, offset=offset)
+            return list(triples)
+
+    @staticmethod
+    def _to_graph(triples) -> Graph:
+        """Build a graph from HDT term string triples"""
+        graph = Graph()
+        terms = {}
+        def term(value):
+            parsed = terms.get(value)
+            if parsed is None:
+                parsed = terms[value] = parse_hdt_term(value)
+            return parsed
+        for s, p, o in triples:
+            graph.add((term(s), term(p), term(o)))
+        return graph
+
+    def _describe(self, subjects: list) -> list:
+        """Get the triples of subjects and of the blank nodes and skolem IRIs below them"""
+        triples = []
+        seen = set()
+        frontier = subjects
+        for depth in range(self.EXPANSION_DEPTH + 1):
+            next_frontier = []
+            for subject in frontier:
+                if subject in seen:
+                    continue
+                seen.add(subject)
+                for triple in self._search(subject):
+                    triples.append(triple)
+                    if is_blank_or_skolem(triple[2]):
+                        next_frontier.append(triple[2])
+            frontier = next_frontier
+        return triples
+
+    def _home_page_triples(self) -> list:
+        """Get the triples listing the resources of config.HDT_HOME_PAGE_TYPE"""
+        triples = []
+        for subject, _, _ in self._search('', str(RDF.type), config.HDT_HOME_PAGE_TYPE):
+            for predicate in config.HDT_HOME_PAGE_PREDICATES:
+                triples.extend(self._search(subject, predicate))
+        return triples
+
+    def get_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+        if page_uri is None:
+            page_uri = id_uri
+
+        if id_uri == config.BASE_URI:
+            triples = self._home_page_triples()
+        else:
+            triples = self._describe(list(dict.fromkeys([id_uri, page_uri])))
+
+        rdf_graph = self._to_graph(triples)
+        if len(rdf_graph) == 0:
+            raise ResourceNotFound(f"No data found in HDT file for URI: {id_uri}")
+        return rdf_graph
+
+    def _labels(self, subjects) -> dict:
+        """Get the label of each subject, by the order of config.LABEL_PREDICATES"""
+        labels = {}
+        for subject in subjects:
+            for label_pred in config.LABEL_PREDICATES:
+                found = self._search(subject, label_pred, limit=1)
+                if found:
+                    labels[subject] = str(parse_hdt_term(found[0][2]))
+                    break
+        return labels
+
+    def get_inverse_relations_graph(self, id_uri: str) -> Graph:
+        """
+        Get a graph containing all inverse relations for a given URI, with the labels of their subjects.
+
+        Args:
+            id_uri: The URI to find inverse relations for
+
+        Returns:
+            Graph: RDFLib Graph containing all triples where id_uri is the object
+        """
+        triples = self._search('', '', id_uri)
+        for subject in dict.fromkeys(s for s, _, _ in triples):
+            for label_pred in config.LABEL_PREDICATES:
+                triples.extend(self._search(subject, label_pred))
+        return self._to_graph(triples)
+
+    def get_inverse_relations(self, id_uri: str) -> dict:
+        """
+        Get the inverse relations for a given URI, counted and sampled from the object index.
+
+        Only the sampled subjects are labelled, so the work done beyond a single
+        scan of the triples pointing at id_uri doesn't grow with their number.
+        """
+        max_subjects = config.MAX_INVERSE_SUBJECTS
+        counts = {}
+        samples = {}
+        for subject, predicate, _ in self._search('', '', id_uri):
+            if predicate in counts:
+                counts[predicate] += 1
+                if len(samples[predicate]) < max_subjects:
+                    samples[predicate].append(subject)
+            else:
+                counts[predicate] = 1
+                samples[predicate] = [subject] if max_subjects > 0 else []
+
+        labels = self._labels({subject for subjects in samples.values() for subject in subjects})
+        inverse_relations = {
+            predicate: [{'uri': subject, 'label': labels.get(subject, '')} for subject in subjects]
+            for predicate, subjects in samples.items()
+        }
+        return summarize_inverse_relations(inverse_relations, counts, id_uri)
+
+    def get_inverse_subjects(self, id_uri: str, predicate: str, offset: int, limit: int) -> list:
+        """
+        Get one page of the subjects that link to a URI with a given predicate.
+
+        Subjects come in the order of the HDT dictionary, which is stable between pages.
+        """
+        subjects = [s for s, _, _ in self._search('', predicate, id_uri, limit=limit, offset=offset)]
+        labels = self._labels(subjects)
+        return [{'uri': subject, 'label': labels.get(subject, '')} for subject in subjects]
+
+    def get_labels(self, uris: list) -> dict:
+        return self._labels(uris)
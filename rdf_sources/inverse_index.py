@@ -0,0 +1,252 @@
+import fcntl
+import logging
+import os
+import sqlite3
+import threading
+import time
+from rdflib import Graph, URIRef, BNode, Literal
+import config
+from private_files import private_directory
+
+logger = logging.getLogger(__name__)
+
+class InverseIndex:
+    """
+    Persistent index from objects to the subjects linking to them, over a directory of Turtle files
+
+    The index is a SQLite database holding, per indexed file, the links to
+    other resources and the labels of its subjects. Scans compare the
+    modification time and size of every file with the indexed ones, one
+    directory at a time, and only parse files that were added or changed; the
+    links of removed files are dropped. Scans run in a background thread in
+    every worker, but a lock file makes sure only one worker scans at a time.
+    """
+
+    # Files indexed per transaction during a scan
+    BATCH_SIZE = 200
+
+    # Subjects looked up per query, below SQLite's limit on query parameters
+    QUERY_BATCH_SIZE = 500
+
+    def __init__(self, path: str, directory: str, interval: float):
+        """
+        Initialize InverseIndex
+
+        Args:
+            path: Path of the SQLite database file, created when missing
+            directory: Directory with the Turtle files to index
+            interval: Seconds between scans for changed files (0 disables background
+                      scans, leaving updates to explicit update() calls)
+
+        Raises:
+            PermissionError: When other users can write to the directory of the database
+        """
+        self.path = path
+        self.directory = directory
+        self.interval = interval
+        self._local = threading.local()
+        self._indexer = None
+        self._indexer_pid = None
+        self._indexer_lock = threading.Lock()
+
+        # The inverse relations are answered from it, so keep others from changing it
+        private_directory(os.path.dirname(os.path.abspath(path)))
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                dir TEXT NOT NULL,
+                name TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                UNIQUE (dir, name)
+            );
+            CREATE TABLE IF NOT EXISTS links (
+                object TEXT NOT NULL,
+                predicate TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                file_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS links_by_object ON links(object, predicate, subject);
+            CREATE INDEX IF NOT EXISTS links_by_file ON links(file_id);
+            CREATE TABLE IF NOT EXISTS labels (
+                subject TEXT NOT NULL,
+                predicate TEXT NOT NULL,
+                label TEXT NOT NULL,
+                file_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS labels_by_subject ON labels(subject);
+            CREATE INDEX IF NOT EXISTS labels_by_file ON labels(file_id);
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get the connection of the current thread, reconnecting after a fork"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def start(self):
+        """Start the background indexer of this process, unless it is running"""
+        if self.interval <= 0:
+            return
+        with self._indexer_lock:
+            if self._indexer is not None and self._indexer_pid == os.getpid():
+                return
+            self._indexer = threading.Thread(target=self._run, name='inverse-indexer', daemon=True)
+            self._indexer_pid = os.getpid()
+            self._indexer.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.update()
+            except Exception as e:
+                logger.error(f"Indexing {self.directory} failed: {str(e)}")
+            time.sleep(self.interval)
+
+    def update(self) -> bool:
+        """
+        Bring the index up to date with the directory, unless another worker is doing so
+
+        Returns:
+            bool: Whether this call scanned the directory
+        """
+        fd = os.open(self.path + '.lock', os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            try:
+                self._scan()
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            return True
+        finally:
+            os.close(fd)
+
+    def _scan(self):
+        connection = self._connection()
+        seen_dirs = set()
+        pending = 0
+        stack = [self.directory]
+        while stack:
+            directory = stack.pop()
+            relative_dir = os.path.relpath(directory, self.directory)
+            seen_dirs.add(relative_dir)
+            indexed = {
+                name: (file_id, mtime_ns, size)
+                for file_id, name, mtime_ns, size in connection.execute(
+                    "SELECT id, name, mtime_ns, size FROM files WHERE dir = ?", (relative_dir,))
+            }
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                logger.warning(f"Cannot scan {directory}: {str(e)}")
+                continue
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                if not entry.name.endswith('.ttl'):
+                    continue
+                stat = entry.stat()
+                current = indexed.pop(entry.name, None)
+                if current is not None and current[1:] == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                self._index_file(connection, relative_dir, entry, stat, current[0] if current else None)
+                pending += 1
+                if pending >= self.BATCH_SIZE:
+                    connection.commit()
+                    pending = 0
+
+            # Files that were indexed but are gone
+            for file_id, _, _ in indexed.values():
+                self._remove_file(connection, file_id)
+        connection.commit()
+
+        # Directories that are gone altogether
+        gone = [d for (d,) in connection.execute("SELECT DISTINCT dir FROM files") if d not in seen_dirs]
+        for relative_dir in gone:
+            for (file_id,) in connection.execute("SELECT id FROM files WHERE dir = ?", (relative_dir,)).fetchall():
+                self._remove_file(connection, file_id)
+        connection.commit()
+
+    @staticmethod
+    def _remove_file(connection: sqlite3.Connection, file_id: int):
+        connection.execute("DELETE FROM links WHERE file_id = ?", (file_id,))
+        connection.execute("DELETE FROM labels WHERE file_id = ?", (file_id,))
+        connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _index_file(self, connection: sqlite3.Connection, relative_dir: str, entry, stat, file_id: int = None):
+        """Replace the indexed links and labels of one file"""
+        graph = Graph()
+        try:
+            graph.parse(entry.path, format='turtle')
+        except Exception as e:
+            # Recorded anyway, so the file isn't parsed again until it changes
+            logger.warning(f"Cannot index {entry.path}: {str(e)}")
+
+        if file_id is None:
+            file_id = connection.execute(
+                "INSERT INTO files (dir, name, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                (relative_dir, entry.name, stat.st_mtime_ns, stat.st_size)
+            ).lastrowid
+        else:
+            connection.execute("DELETE FROM links WHERE file_id = ?", (file_id,))
+            connection.execute("DELETE FROM labels WHERE file_id = ?", (file_id,))
+            connection.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE id = ?",
+                               (stat.st_mtime_ns, stat.st_size, file_id))
+
+        label_predicates = {URIRef(label_pred) for label_pred in config.LABEL_PREDICATES}
+        links = []
+        labels = []
+        for s, p, o in graph:
+            if isinstance(s, BNode):
+                continue
+            if isinstance(o, URIRef):
+                links.append((str(o), str(p), str(s), file_id))
+            elif isinstance(o, Literal) and p in label_predicates and str(o):
+                labels.append((str(s), str(p), str(o), file_id))
+        connection.executemany("INSERT INTO links VALUES (?, ?, ?, ?)", links)
+        connection.executemany("INSERT INTO labels VALUES (?, ?, ?, ?)", labels)
+
+    def labels(self, subjects) -> dict:
+        """Get the (label predicate, label) of each subject, by the order of config.LABEL_PREDICATES"""
+        ranks = {label_pred: rank for rank, label_pred in enumerate(config.LABEL_PREDICATES)}
+        best = {}
+        connection = self._connection()
+        subjects = list(subjects)
+        for start in range(0, len(subjects), self.QUERY_BATCH_SIZE):
+            batch = subjects[start:start + self.QUERY_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            for subject, predicate, label in connection.execute(
+                    f"SELECT subject, predicate, label FROM labels WHERE subject IN ({placeholders})", batch):
+                rank = ranks.get(predicate)
+                if rank is not None and (subject not in best or rank < best[subject][0]):
+                    best[subject] = (rank, predicate, label)
+        return {subject: (predicate, label) for subject, (rank, predicate, label) in best.items()}
+
+    def links_to(self, object_uri: str) -> list:
+        """Get the (predicate, subject) pairs of all links to a URI"""
+        return self._connection().execute(
+            "SELECT DISTINCT predicate, subject FROM links WHERE object = ?", (object_uri,)).fetchall()
+
+    def counts(self, object_uri: str) -> dict:
+        """Get the number of subjects linking to a URI, per predicate"""
+        return dict(self._connection().execute(
+            "SELECT predicate, COUNT(DISTINCT subject) FROM links WHERE object = ? GROUP BY predicate",
+            (object_uri,)))
+
+    def subjects(self, object_uri: str, predicate: str, offset: int, limit: int) -> list:
+        """Get one page of the subjects linking to a URI with a predicate, ordered by subject URI"""
+        return [subject for (subject,) in self._connection().execute(
+            "SELECT DISTINCT subject FROM links WHERE object = ? AND predicate = ? ORDER BY subject LIMIT ? OFFSET ?",
+            (object_uri, predicate, limit, offset))]
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+import threading
+
+class LRUCache:
+    """
+    Thread-safe in-process mapping that keeps the most recently used entries
+
+    Unlike functools.lru_cache, entries can be inspected, replaced and
+    removed, e.g. when the data they were built from has changed.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_size: int):
+        """
+        Initialize LRUCache
+
+        Args:
+            max_size: Maximum number of entries; the least recently used are dropped above it
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get the value for key, marking it as recently used, or default when missing"""
+        with self._lock:
+            value = self._entries.get(key, self._MISSING)
+            if value is self._MISSING:
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store the value for key, dropping the least recently used entries when full"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove the entry for key, if any"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,74 @@
+import time
+from rdflib import Graph
+from .rdf_source import RDFSource, ResourceNotFound
+from .lru import LRUCache
+
+class NegativeCachedRDFSource(RDFSource):
+    """
+    RDF source that remembers which resources another RDF source doesn't have
+
+    Crawlers probe many paths that don't exist, often more than once. A
+    resource found missing is answered from memory until its entry expires,
+    without asking the wrapped source (or its caches) again. The entries are
+    kept per worker in a bounded LRU; found resources are never remembered,
+    so a resource that appears is served at most ttl seconds later.
+    """
+
+    def __init__(self, source: RDFSource, size: int, ttl: float):
+        """
+        Initialize NegativeCachedRDFSource
+
+        Args:
+            source: The RDF source to remember missing resources of
+            size: Maximum number of missing resources remembered
+            ttl: Seconds a missing resource is remembered
+        """
+        self.source = source
+        self.ttl = ttl
+        self._missing = LRUCache(size)
+
+    def __getattr__(self, name):
+        # Source specific methods (e.g. SPARQLEndpoint.query) go to the wrapped source
+        if name == 'source':
+            raise AttributeError(name)
+        return getattr(self.source, name)
+
+    def _missing_message(self, key) -> str:
+        """Get the message of a remembered miss, or None when it isn't remembered (anymore)"""
+        entry = self._missing.get(key)
+        if entry is None:
+            return None
+        expires, message = entry
+        if expires <= time.monotonic():
+            self._missing.delete(key)
+            return None
+        return message
+
+    def is_missing(self, id_uri: str, page_uri: str = None) -> bool:
+        return self._missing_message((id_uri, page_uri or id_uri)) is not None
+
+    def get_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+        key = (id_uri, page_uri or id_uri)
+        message = self._missing_message(key)
+        if message is not None:
+            raise ResourceNotFound(message)
+        try:
+            return self.source.get_rdf_for_uri(id_uri, page_uri)
+        except ResourceNotFound as e:
+            self._missing.set(key, (time.monotonic() + self.ttl, str(e)))
+            raise
+
+    def get_inverse_relations_graph(self, id_uri: str) -> Graph:
+        return self.source.get_inverse_relations_graph(id_uri)
+
+    def get_inverse_relations(self, id_uri: str) -> dict:
+        return self.source.get_inverse_relations(id_uri)
+
+    def get_inverse_subjects(self, id_uri: str, predicate: str, offset: int, limit: int) -> list:
+        return self.source.get_inverse_subjects(id_uri, predicate, offset, limit)
+
+    def get_labels(self, uris: list) -> dict:
+        return self.source.get_labels(uris)
+
+    def get_stale_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+        return self.source.get_stale_rdf_for_uri(id_uri, page_uri)
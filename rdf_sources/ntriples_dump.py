@@ -0,0 +1,357 @@
+from rdflib import Graph, ConjunctiveGraph, URIRef, RDF
+import fcntl
+import logging
+import mmap
+import os
+import sqlite3
+import tempfile
+import threading
+import config
+from .rdf_source import RDFSource, ResourceNotFound
+
+logger = logging.getLogger(__name__)
+
+SKOLEM_SEGMENT = '/.well-known/genid/'
+
+RDF_TYPE_TOKEN = f"<{RDF.type}>".encode('utf-8')
+
+def _subject_key(line: bytes) -> str:
+    """Get the subject of an N-Triples/N-Quads line as IRI (without brackets) or _:label, or None"""
+    if not line or line[0] not in b'<_':
+        return None
+    token = line.split(None, 1)[0]
+    if token.startswith(b'<'):
+        return token[1:-1].decode('utf-8')
+    return token.decode('utf-8')
+
+def _object_key(line: bytes) -> str:
+    """Get the object of an N-Triples/N-Quads line as IRI or _:label, or None for literals"""
+    parts = line.split(None, 2)
+    if len(parts) < 3:
+        return None
+    rest = parts[2]
+    if rest.startswith(b'<'):
+        end = rest.find(b'>')
+        return rest[1:end].decode('utf-8') if end > 0 else None
+    if rest.startswith(b'_:'):
+        return rest.split(None, 1)[0].rstrip(b'.').decode('utf-8')
+    return None
+
+def _predicate_token(line: bytes) -> bytes:
+    """Get the predicate of an N-Triples/N-Quads line, with its brackets"""
+    parts = line.split(None, 2)
+    return parts[1] if len(parts) > 1 else None
+
+class _IndexReplaced(Exception):
+    """The index was replaced by one for a newer dump than the mapped one"""
+
+def _is_blank_or_skolem(key: str) -> bool:
+    return key.startswith('_:') or SKOLEM_SEGMENT in key
+
+class NTriplesDump(RDFSource):
+    """
+    RDF source that reads resources from one large N-Triples or N-Quads dump
+
+    A SQLite index maps every subject to the byte ranges of its lines in the
+    dump; consecutive lines of a subject form one range, so a dump sorted by
+    subject has one range per subject. Lookups read those ranges from the
+    memory-mapped dump and parse only these lines, so memory use doesn't
+    depend on the size of the dump. Like config.SPARQL_CONSTRUCT_QUERY,
+    lookups include the blank nodes and skolem IRIs a resource refers to,
+    two levels deep. Graph names in N-Quads dumps are ignored.
+
+    The index also lists the resources of the home page type, which make up
+    the home page. It is (re)built at startup when missing or when the dump
+    has changed. When the dump changes later on, a background thread
+    rebuilds it (or waits for the worker doing so) while lookups keep
+    reading the old dump and index; replace the dump with a rename rather
+    than rewriting it in place, so the old one stays readable. For large
+    dumps, build the index beforehand with: python -m rdf_sources.ntriples_dump
+    """
+
+    # Levels of blank nodes / skolem IRIs included below the resource
+    EXPANSION_DEPTH = 2
+
+    # Bump when the index layout changes, so older indexes are rebuilt
+    INDEX_VERSION = 2
+
+    # Ranges inserted per statement while building the index
+    BATCH_SIZE = 10000
+
+    # Subjects looked up per query, below SQLite's limit on query parameters
+    QUERY_BATCH_SIZE = 500
+
+    def __init__(self, dump_path: str, index_path: str = None, home_page_type: str = None,
+                 home_page_predicates: list = ()):
+        """
+        Initialize NTriplesDump
+
+        Args:
+            dump_path: Path of the dump; .nq files are read as N-Quads, others as N-Triples
+            index_path: Path of the SQLite index, dump_path + '.index.sqlite' by default
+            home_page_type: Resources of this type are listed on the home page (None for no home page)
+            home_page_predicates: Predicates of those resources shown on the home page
+        """
+        self.dump_path = dump_path
+        self.index_path = index_path or dump_path + '.index.sqlite'
+        self.format = 'nquads' if dump_path.endswith('.nq') else 'nt'
+        self.home_page_type = home_page_type
+        self.home_page_predicates = {f"<{predicate}>".encode('utf-8') for predicate in home_page_predicates}
+        self._local = threading.local()
+        # Held by the thread reopening a changed dump
+        self._reopen_lock = threading.Lock()
+        # (mapped dump, generation, index version, (size, mtime)); the generation is bumped on every
+        # reopen, so the threads reconnect to the new index
+        self._opened = (b'', 0, None, None)
+        self._reopen()
+
+    def _reopen(self):
+        """Map the dump, after making sure its index is up to date, and switch the lookups over to it"""
+        while True:
+            self.ensure_index()
+            with open(self.dump_path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                version = self._dump_version(stat)
+                if self._index_version() != version:
+                    # Changed again while indexing
+                    continue
+                # mmap can't map empty files; an empty dump has no resources anyway
+                dump = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else b''
+            self._opened = (dump, self._opened[1] + 1, version, (stat.st_size, stat.st_mtime_ns))
+            return
+
+    def _check_dump(self):
+        """Start reopening the dump in the background when it changed since it was opened"""
+        try:
+            stat = os.stat(self.dump_path)
+        except OSError:
+            # Being replaced: keep serving the open dump
+            return
+        if (stat.st_size, stat.st_mtime_ns) == self._opened[3] or not self._reopen_lock.acquire(blocking=False):
+            return
+        logger.warning(f"{self.dump_path} changed, reopening it in the background")
+        threading.Thread(target=self._reopen_in_background, name='dump-reopen', daemon=True).start()
+
+    def _reopen_in_background(self):
+        try:
+            self._reopen()
+        except Exception as e:
+            logger.error(f"Reopening {self.dump_path} failed, serving the old dump: {str(e)}")
+        finally:
+            self._reopen_lock.release()
+
+    def _read(self, lookup):
+        """
+        Run a lookup against the mapped dump
+
+        Another worker may replace the index before this one switched over to
+        the new dump; lookups in threads that connect in between switch right
+        away, as the new index is complete by then.
+        """
+        self._check_dump()
+        try:
+            return lookup(self._opened)
+        except _IndexReplaced:
+            self._reopen()
+            return lookup(self._opened)
+
+    def _dump_version(self, stat: os.stat_result = None) -> str:
+        stat = stat or os.stat(self.dump_path)
+        return f"{self.INDEX_VERSION} {stat.st_size} {stat.st_mtime_ns} {self.home_page_type}"
+
+    def _index_version(self) -> str:
+        try:
+            connection = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True)
+            try:
+                row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+
+    def ensure_index(self):
+        """Build the index unless it matches the dump; one process builds while others wait"""
+        if self._index_version() == self._dump_version():
+            return
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.index_path + '.lock', os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if self._index_version() != self._dump_version():
+                self.build_index()
+        finally:
+            os.close(fd)
+
+    def build_index(self):
+        """Scan the dump and write a new index, replacing the old one atomically"""
+        version = self._dump_version()
+        logger.warning(f"Building subject index of {self.dump_path}")
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.index_path) or '.', suffix='.tmp')
+        os.close(fd)
+        try:
+            connection = sqlite3.connect(temp_path)
+            connection.execute("PRAGMA journal_mode=OFF")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute("CREATE TABLE ranges (subject TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL)")
+            connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            connection.execute("CREATE TABLE home (subject TEXT PRIMARY KEY)")
+
+            type_token = f"<{self.home_page_type}>".encode('utf-8') if self.home_page_type else None
+            home = set()
+            batch = []
+            current, start, offset = None, 0, 0
+            with open(self.dump_path, 'rb') as f:
+                for line in f:
+                    subject = _subject_key(line)
+                    if type_token is not None and type_token in line and _predicate_token(line) == RDF_TYPE_TOKEN \
+                            and _object_key(line) == self.home_page_type:
+                        home.add(subject)
+                    if subject != current:
+                        if current is not None:
+                            batch.append((current, start, offset - start))
+                            if len(batch) >= self.BATCH_SIZE:
+                                connection.executemany("INSERT INTO ranges VALUES (?, ?, ?)", batch)
+                                batch = []
+                        current, start = subject, offset
+                    offset += len(line)
+            if current is not None:
+                batch.append((current, start, offset - start))
+            connection.executemany("INSERT INTO ranges VALUES (?, ?, ?)", batch)
+            connection.executemany("INSERT INTO home VALUES (?)", ((subject,) for subject in home))
+
+            connection.execute("CREATE INDEX ranges_by_subject ON ranges(subject, offset)")
+            connection.execute("INSERT INTO meta VALUES ('version', ?)", (version,))
+            connection.commit()
+            connection.close()
+            # mkstemp creates the file private; the index may be prebuilt by another user
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, self.index_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _connection(self, opened: tuple) -> sqlite3.Connection:
+        """Get the read-only index connection of the current thread, reconnecting after a fork or reopen"""
+        _, generation, version, _ = opened
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid() or self._local.generation != generation:
+            if connection is not None:
+                connection.close()
+            self._local.connection = None
+            connection = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True)
+            row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != version:
+                connection.close()
+                raise _IndexReplaced()
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+            self._local.generation = generation
+        return connection
+
+    def _lines(self, subject: str, opened: tuple) -> list:
+        """Get the dump lines of a subject"""
+        dump = opened[0]
+        lines = []
+        for offset, length in self._connection(opened).execute(
+                "SELECT offset, length FROM ranges WHERE subject = ? ORDER BY offset", (subject,)):
+            lines.extend(dump[offset:offset + length].splitlines())
+        return lines
+
+    def _home_page_lines(self, opened: tuple) -> list:
+        """Get the lines listing the resources of the home page type"""
+        lines = []
+        for (subject,) in self._connection(opened).execute("SELECT subject FROM home ORDER BY subject"):
+            lines.extend(line for line in self._lines(subject, opened)
+                         if _predicate_token(line) in self.home_page_predicates)
+        return lines
+
+    def _parse(self, lines: list) -> Graph:
+        # All lines are parsed at once, so equal blank node labels become the same node
+        data = b'\n'.join(lines).decode('utf-8')
+        if self.format == 'nt':
+            return Graph().parse(data=data, format='nt')
+        quads = ConjunctiveGraph()
+        quads.parse(data=data, format='nquads')
+        graph = Graph()
+        for triple in quads.triples((None, None, None)):
+            graph.add(triple)
+        return graph
+
+    def get_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+        return self._read(lambda opened: self._describe(opened, id_uri, page_uri or id_uri))
+
+    def _describe(self, opened: tuple, id_uri: str, page_uri: str) -> Graph:
+        if id_uri == config.BASE_URI:
+            lines = self._home_page_lines(opened)
+            if not lines:
+                raise ResourceNotFound(f"No home page resources found in dump for URI: {id_uri}")
+            return self._parse(lines)
+
+        lines = []
+        seen = set()
+        frontier = [id_uri, page_uri]
+        for depth in range(self.EXPANSION_DEPTH + 1):
+            next_frontier = []
+            for subject in frontier:
+                if subject in seen:
+                    continue
+                seen.add(subject)
+                for line in self._lines(subject, opened):
+                    lines.append(line)
+                    obj = _object_key(line)
+                    if obj is not None and _is_blank_or_skolem(obj):
+                        next_frontier.append(obj)
+            frontier = next_frontier
+
+        if not lines:
+            raise ResourceNotFound(f"No data found in dump for URI: {id_uri}")
+        return self._parse(lines)
+
+    def get_labels(self, uris: list) -> dict:
+        """Get the labels of resources from the lines of all of them, parsed at once"""
+        return self._read(lambda opened: self._labels(opened, uris))
+
+    def _labels(self, opened: tuple, uris: list) -> dict:
+        dump = opened[0]
+        label_ranks = {URIRef(label_pred): rank for rank, label_pred in enumerate(config.LABEL_PREDICATES)}
+        # Only lines with a label predicate are worth parsing
+        tokens = [f"<{label_pred}>".encode('utf-8') for label_pred in config.LABEL_PREDICATES]
+        lines = []
+        connection = self._connection(opened)
+        for start in range(0, len(uris), self.QUERY_BATCH_SIZE):
+            batch = uris[start:start + self.QUERY_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            for offset, length in connection.execute(
+                    f"SELECT offset, length FROM ranges WHERE subject IN ({placeholders})", batch):
+                lines.extend(line for line in dump[offset:offset + length].splitlines()
+                             if any(token in line for token in tokens))
+        if not lines:
+            return {}
+
+        best = {}
+        for s, p, o in self._parse(lines):
+            rank = label_ranks.get(p)
+            subject = str(s)
+            if rank is not None and (subject not in best or rank < best[subject][0]):
+                best[subject] = (rank, str(o))
+        return {subject: label for subject, (rank, label) in best.items()}
+
+    def get_inverse_relations_graph(self, id_uri: str) -> Graph:
+        """
+        Get a graph containing all inverse relations for a given URI.
+        The dump is only indexed by subject, so this always returns an empty graph.
+
+        Args:
+            id_uri: The URI to find inverse relations for
+
+        Returns:
+            Graph: Empty RDFLib Graph since inverse relations are not supported
+        """
+        return Graph()
+
+if __name__ == '__main__':
+    # Build the index of the configured dump ahead of deployment
+    NTriplesDump(config.DUMP_FILE, config.DUMP_INDEX_PATH, config.DUMP_HOME_PAGE_TYPE)
@@ -3,6 +3,7 @@ from rdflib import Graph
 import logging
 from SPARQLWrapper import SPARQLWrapper, JSON
 import config
+from inverse_relations import prerender_inverse_relations, page_inverse_subjects
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +26,7 @@ class RDFSource(ABC):
             page_uri: Optional page URI if different from id_uri
             
         Returns:
-            Graph: RDFLib Graph containing the RDF data
+            Graph: RDFLib Graph, or read-only CompactGraph, containing the RDF data
             
         Raises:
             ResourceNotFound: When the requested resource cannot be found
@@ -44,3 +45,83 @@ class RDFSource(ABC):
             Graph: RDFLib Graph containing all triples where id_uri is the object
         """
         pass
+
+    def get_inverse_relations(self, id_uri: str) -> dict:
+        """
+        Get the inverse relations for a given URI, prepared for the view.
+        
+        Sources that can count and sample inverse relations server side override
+        this, so the amount of data fetched doesn't grow with the number of links.
+        
+        Args:
+            id_uri: The URI to find inverse relations for
+            
+        Returns:
+            dict: Inverse relations grouped by predicate, as made by prerender_inverse_relations()
+        """
+        return prerender_inverse_relations(self.get_inverse_relations_graph(id_uri), id_uri)
+
+    def get_inverse_subjects(self, id_uri: str, predicate: str, offset: int, limit: int) -> list:
+        """
+        Get one page of the subjects that link to a URI with a given predicate.
+        
+        Args:
+            id_uri: The URI the subjects link to
+            predicate: The linking predicate
+            offset: Number of subjects to skip
+            limit: Maximum number of subjects to return
+            
+        Returns:
+            list: Subject dicts with 'uri' and 'label', ordered by subject URI
+        """
+        return page_inverse_subjects(self.get_inverse_relations_graph(id_uri), id_uri, predicate, offset, limit)
+
+    def get_labels(self, uris: list) -> dict:
+        """
+        Get the labels of resources, e.g. the resources a page links to, in one lookup.
+
+        Sources without a cheap way to look up many labels at once keep this
+        default, which finds none.
+
+        Args:
+            uris: The URIs to label
+
+        Returns:
+            dict: The label of each URI that has one, chosen by the order of config.LABEL_PREDICATES
+
+        Raises:
+            Exception: When the lookup fails, so failures aren't taken for missing labels
+        """
+        return {}
+
+    def is_missing(self, id_uri: str, page_uri: str = None) -> bool:
+        """
+        Check, without a lookup, whether a resource is known to be missing.
+
+        Lets callers skip work for a request that get_rdf_for_uri() will answer
+        with ResourceNotFound. Sources that don't remember misses keep this
+        default, which knows none.
+
+        Args:
+            id_uri: The identity URI
+            page_uri: Optional page URI if different from id_uri
+
+        Returns:
+            bool: True when get_rdf_for_uri() is known to raise ResourceNotFound
+        """
+        return False
+
+    def get_stale_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+        """
+        Get the last known graph of a URI, to serve when get_rdf_for_uri() fails.
+
+        Sources without a cache of past results keep this default, which has none.
+
+        Args:
+            id_uri: The identity URI
+            page_uri: Optional page URI if different from id_uri
+
+        Returns:
+            Graph: The last graph fetched for the URI, however old, or None
+        """
+        return None
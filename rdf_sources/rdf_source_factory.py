@@ -1,21 +1,53 @@
 import config
 from .sparql_endpoint import SPARQLEndpoint
 from .turtle_files import TurtleFiles
+from .hdt_file import HDTFile
+from .ntriples_dump import NTriplesDump
+from .inverse_index import InverseIndex
 from .rdf_source import RDFSource
+from .cache_store import CacheStore
+from .cached_source import CachedRDFSource
+from .single_flight import SingleFlightRDFSource
+from .negative_cache import NegativeCachedRDFSource
 
 def create_rdf_source() -> RDFSource:
     """
     Factory function that creates and returns the appropriate RDF source based on configuration.
     
     Returns:
-        RDFSource: Either a SPARQLEndpoint or TurtleFiles instance depending on config.RDF_DATA_SOURCE_TYPE
+        RDFSource: A SPARQLEndpoint, TurtleFiles, HDTFile or NTriplesDump instance depending on config.RDF_DATA_SOURCE_TYPE,
+                   wrapped in a CachedRDFSource when config.GRAPH_CACHE_ENABLED is set, in a
+                   SingleFlightRDFSource when config.SINGLE_FLIGHT_ENABLED is set and in a
+                   NegativeCachedRDFSource when config.NEGATIVE_CACHE_ENABLED is set
         
     Raises:
         ValueError: If an invalid RDF_DATA_SOURCE_TYPE is configured
     """
     if config.RDF_DATA_SOURCE_TYPE == 'sparql':
-        return SPARQLEndpoint(config.SPARQL_ENDPOINT, config.BASE_URI)
+        source = SPARQLEndpoint(config.SPARQL_ENDPOINT, config.BASE_URI)
     elif config.RDF_DATA_SOURCE_TYPE == 'turtlefiles':
-        return TurtleFiles(config.TURTLE_FILES_DIRECTORY, config.BASE_URI)
+        inverse_index = None
+        if config.TURTLE_INVERSE_INDEX_PATH:
+            inverse_index = InverseIndex(config.TURTLE_INVERSE_INDEX_PATH, config.TURTLE_FILES_DIRECTORY,
+                                         config.TURTLE_INVERSE_INDEX_INTERVAL)
+        source = TurtleFiles(config.TURTLE_FILES_DIRECTORY, config.BASE_URI,
+                             config.TURTLE_GRAPH_CACHE_SIZE, config.TURTLE_SIDECAR_DIRECTORY, inverse_index)
+    elif config.RDF_DATA_SOURCE_TYPE == 'hdt':
+        source = HDTFile(config.HDT_FILE, config.BASE_URI)
+    elif config.RDF_DATA_SOURCE_TYPE == 'dump':
+        source = NTriplesDump(config.DUMP_FILE, config.DUMP_INDEX_PATH, config.DUMP_HOME_PAGE_TYPE,
+                              config.DUMP_HOME_PAGE_PREDICATES)
     else:
         raise ValueError(f"Invalid RDF_DATA_SOURCE_TYPE in config: {config.RDF_DATA_SOURCE_TYPE}")
+
+    if config.GRAPH_CACHE_ENABLED:
+        store = CacheStore(config.GRAPH_CACHE_PATH, config.GRAPH_CACHE_MAX_BYTES)
+        fill_timeout = config.SINGLE_FLIGHT_TIMEOUT if config.SINGLE_FLIGHT_ENABLED else 0
+        missing_ttl = config.NEGATIVE_CACHE_TTL if config.NEGATIVE_CACHE_ENABLED else 0
+        source = CachedRDFSource(source, store, config.GRAPH_CACHE_TTL, config.GRAPH_CACHE_STALE_TTL, fill_timeout,
+                                 missing_ttl)
+    if config.SINGLE_FLIGHT_ENABLED:
+        source = SingleFlightRDFSource(source)
+    if config.NEGATIVE_CACHE_ENABLED:
+        source = NegativeCachedRDFSource(source, config.NEGATIVE_CACHE_SIZE, config.NEGATIVE_CACHE_TTL)
+    return source
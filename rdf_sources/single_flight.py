@@ -0,0 +1,119 @@
+import threading
+from rdflib import Graph
+from .rdf_source import RDFSource
+import deadline
+
+class _Call:
+    """An in-flight call whose outcome is shared with waiting callers"""
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into a single call
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait for it and get the same result (or exception), but no longer
+    than the deadline of their own request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run fn for key, or wait for the call already running for key
+
+        Args:
+            key: Hashable key identifying the call
+            fn: Callable without arguments
+
+        Returns:
+            The result of fn, shared by all callers for key
+
+        Raises:
+            DeadlineExceeded: When the request deadline passes while waiting for the running call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            left = deadline.remaining()
+            if not call.done.wait(None if left is None else max(0, left)):
+                raise deadline.DeadlineExceeded("Request deadline exceeded waiting for the same lookup")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+class SingleFlightRDFSource(RDFSource):
+    """
+    RDF source that coalesces concurrent identical lookups on another RDF source
+
+    Callers must treat the returned graphs as read-only, since concurrent
+    callers for the same URI share one graph object.
+    """
+
+    def __init__(self, source: RDFSource):
+        """
+        Initialize SingleFlightRDFSource
+
+        Args:
+            source: The RDF source to coalesce lookups for
+        """
+        self.source = source
+        self._flights = SingleFlight()
+
+    def __getattr__(self, name):
+        # Source specific methods (e.g. SPARQLEndpoint.query) go to the wrapped source
+        if name == 'source':
+            raise AttributeError(name)
+        return getattr(self.source, name)
+
+    def get_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+        return self._flights.do(
+            ('graph', id_uri, page_uri or id_uri),
+            lambda: self.source.get_rdf_for_uri(id_uri, page_uri)
+        )
+
+    def get_inverse_relations_graph(self, id_uri: str) -> Graph:
+        return self._flights.do(
+            ('inverse', id_uri),
+            lambda: self.source.get_inverse_relations_graph(id_uri)
+        )
+
+    def get_inverse_relations(self, id_uri: str) -> dict:
+        return self._flights.do(
+            ('inverse-summary', id_uri),
+            lambda: self.source.get_inverse_relations(id_uri)
+        )
+
+    def get_inverse_subjects(self, id_uri: str, predicate: str, offset: int, limit: int) -> list:
+        return self.source.get_inverse_subjects(id_uri, predicate, offset, limit)
+
+    def get_labels(self, uris: list) -> dict:
+        return self.source.get_labels(uris)
+
+    def is_missing(self, id_uri: str, page_uri: str = None) -> bool:
+        return self.source.is_missing(id_uri, page_uri)
+
+    def get_stale_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+        return self.source.get_stale_rdf_for_uri(id_uri, page_uri)
@@ -1,82 +1,307 @@
-from SPARQLWrapper import SPARQLWrapper, JSON
+import json
+import re
+import urllib3
 from rdflib import Graph
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser
 import config
 from .rdf_source import RDFSource, ResourceNotFound
+from .compact_graph import CompactGraphBuilder
+from inverse_relations import summarize_inverse_relations
+from cooperative import pool_size
+import deadline
+from .circuit_breaker import CircuitBreaker
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Characters that may not appear in an IRI reference, see the SPARQL IRIREF production
+_INVALID_IRI_CHARACTERS = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+
+# CONSTRUCT results: N-Triples can be parsed as it arrives, Turtle is the fallback
+CONSTRUCT_ACCEPT = 'application/n-triples, text/plain;q=0.9, text/turtle;q=0.5'
+NTRIPLES_CONTENT_TYPES = {'application/n-triples', 'text/plain', 'text/ntriples'}
+
+class SPARQLEndpointError(Exception):
+    """Exception raised when the SPARQL endpoint returns an unexpected response"""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+class TooManyTriples(Exception):
+    """Raised by _LimitedSink to abort parsing a result over the triple limit"""
+    pass
+
+class _LimitedSink(CompactGraphBuilder):
+    """N-Triples parser sink that collects at most max_triples triples"""
+    __slots__ = ('max_triples',)
+
+    def __init__(self, max_triples: int):
+        super().__init__()
+        self.max_triples = max_triples
+
+    def triple(self, s, p, o):
+        self.add((s, p, o))
+        if len(self) > self.max_triples:
+            raise TooManyTriples()
+
 class SPARQLEndpoint(RDFSource):
     """
     RDF source that queries a SPARQL endpoint
     """
-    
+
     def __init__(self, endpoint_url: str, base_uri: str):
         """
         Initialize SPARQLEndpoint source
-        
+
+        The source owns a pooled, keep-alive HTTP client that is reused for all
+        queries issued by this worker, so connections (and TLS sessions) to the
+        triple store are not re-established for every page view. Queries are
+        cut short at the deadline of the request, and refused for a while by
+        a circuit breaker when the endpoint keeps failing or answering slowly.
+
         Args:
             endpoint_url: URL of the SPARQL endpoint
             base_uri: Base URI for the RDF data (e.g., 'https://data.digitopia.nl/')
         """
         self.endpoint_url = endpoint_url
         self.base_uri = base_uri
-        
-    def get_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+        self.http = urllib3.PoolManager(
+            num_pools=config.SPARQL_POOL_CONNECTIONS,
+            maxsize=pool_size(config.SPARQL_POOL_MAXSIZE),
+            block=config.SPARQL_POOL_BLOCK,
+            timeout=urllib3.Timeout(connect=config.SPARQL_CONNECT_TIMEOUT, read=config.SPARQL_READ_TIMEOUT),
+            retries=urllib3.Retry(total=config.SPARQL_CONNECT_RETRIES, read=0, status=0, redirect=2)
+        )
+        self.breaker = None
+        if config.SPARQL_BREAKER_FAILURES:
+            self.breaker = CircuitBreaker(config.SPARQL_BREAKER_FAILURES, config.SPARQL_BREAKER_SLOW_CALL,
+                                          config.SPARQL_BREAKER_RESET_TIMEOUT)
+
+    @staticmethod
+    def _is_failure(error: Exception) -> bool:
+        """
+        Whether an error opening a response is a failure of the endpoint, for the circuit breaker
+
+        A read timeout only counts when the query took config.SPARQL_BREAKER_SLOW_CALL
+        seconds, which the breaker checks itself: a query can also time out
+        early, at the end of the request deadline.
+        """
+        if isinstance(error, SPARQLEndpointError):
+            return error.status is not None and error.status >= 500
+        if isinstance(error, urllib3.exceptions.MaxRetryError) and error.reason is not None:
+            error = error.reason
+        if isinstance(error, urllib3.exceptions.ReadTimeoutError):
+            return False
+        return isinstance(error, urllib3.exceptions.HTTPError)
+
+    def _open(self, sparql_query: str, accept: str, read_timeout: float = None,
+              optional: bool = False) -> urllib3.BaseHTTPResponse:
+        """
+        Send a query to the endpoint over the pooled connection, without reading the response body
+
+        The caller reads the body and then returns the connection to the pool
+        with release_conn(), or closes the response to drop the connection.
+        The timeouts are limited to the time left for the request. The circuit
+        breaker sees the time until the response headers arrive, which is
+        when most endpoints have evaluated the query. Optional queries, whose
+        page can do without them, are refused while the breaker is open but
+        don't count towards opening it.
+
+        Args:
+            sparql_query: The SPARQL query to execute
+            accept: Value for the HTTP Accept header
+            read_timeout: Optional read timeout overriding config.SPARQL_READ_TIMEOUT
+            optional: Whether this is an optional query (inverse relations, labels)
+
+        Returns:
+            urllib3.BaseHTTPResponse: The streaming response
+
+        Raises:
+            SPARQLEndpointError: When the endpoint does not answer with HTTP 200
+            DeadlineExceeded: When the request has no time left for the query
+            CircuitOpen: When the endpoint failed too often lately
+        """
+        timeout = urllib3.Timeout(
+            connect=deadline.timeout(config.SPARQL_CONNECT_TIMEOUT),
+            read=deadline.timeout(read_timeout if read_timeout is not None else config.SPARQL_READ_TIMEOUT)
+        )
+        if self.breaker is None:
+            return self._request(sparql_query, accept, timeout)
+        if optional:
+            self.breaker.check()
+            return self._request(sparql_query, accept, timeout)
+        with self.breaker.call(self._is_failure):
+            return self._request(sparql_query, accept, timeout)
+
+    def _request(self, sparql_query: str, accept: str, timeout: urllib3.Timeout) -> urllib3.BaseHTTPResponse:
+        response = self.http.request(
+            'POST',
+            self.endpoint_url,
+            fields={'query': sparql_query},
+            encode_multipart=False,
+            headers={'Accept': accept},
+            preload_content=False,
+            timeout=timeout
+        )
+        if response.status != 200:
+            message = response.read(200)
+            response.release_conn()
+            raise SPARQLEndpointError(f"SPARQL endpoint returned HTTP {response.status}: {message!r}", response.status)
+        return response
+
+    def _execute(self, sparql_query: str, accept: str, read_timeout: float = None, optional: bool = False) -> bytes:
+        """
+        Send a query to the endpoint over the pooled connection
+
+        Args:
+            sparql_query: The SPARQL query to execute
+            accept: Value for the HTTP Accept header
+            read_timeout: Optional read timeout overriding config.SPARQL_READ_TIMEOUT
+            optional: Whether this is an optional query, see _open()
+
+        Returns:
+            bytes: The raw response body
+
+        Raises:
+            SPARQLEndpointError: When the endpoint does not answer with HTTP 200
+        """
+        response = self._open(sparql_query, accept, read_timeout, optional)
+        try:
+            return response.read()
+        finally:
+            response.release_conn()
+
+    def _construct(self, sparql_query: str):
+        """
+        Run a CONSTRUCT query and parse its result
+
+        N-Triples results are parsed line by line while they are still being
+        received, straight into a CompactGraph; other formats (Turtle from
+        endpoints that don't offer N-Triples) are read completely and parsed
+        afterwards. Results are limited to config.SPARQL_MAX_TRIPLES triples.
+
+        Returns:
+            The parsed graph (CompactGraph or RDFLib Graph)
+
+        Raises:
+            SPARQLEndpointError: When the endpoint fails or the result is too large
+        """
+        response = self._open(sparql_query, CONSTRUCT_ACCEPT)
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        try:
+            if content_type in NTRIPLES_CONTENT_TYPES:
+                sink = _LimitedSink(config.SPARQL_MAX_TRIPLES)
+                W3CNTriplesParser(sink=sink).parse(response)
+                graph = sink.build()
+            else:
+                graph = Graph()
+                graph.parse(data=response.read(), format='turtle')
+                if len(graph) > config.SPARQL_MAX_TRIPLES:
+                    raise TooManyTriples()
+        except TooManyTriples:
+            # Don't read the rest of the response: drop the connection instead
+            response.close()
+            raise SPARQLEndpointError(f"SPARQL result has more than {config.SPARQL_MAX_TRIPLES} triples")
+        finally:
+            response.release_conn()
+        return graph
+
+    def get_rdf_for_uri(self, id_uri: str, page_uri: str = None):
         if page_uri is None:
             page_uri = id_uri
 
-        sparql = SPARQLWrapper(self.endpoint_url)
-        sparql.setTimeout(10)  # Set 10 second timeout
-
         if id_uri == config.BASE_URI:
-            sparql.setQuery(config.HOME_PAGE_SPARQL_QUERY)
+            query = config.HOME_PAGE_SPARQL_QUERY
         else:
             query = config.SPARQL_CONSTRUCT_QUERY.replace("{id_uri}", id_uri).replace("{page_uri}", page_uri)
-            sparql.setQuery(query)
 
-        sparql.setReturnFormat('turtle')
-        
-        try:
-            results = sparql.query().convert()
-            rdf_graph = Graph()
-            if isinstance(results, bytes):
-                rdf_graph.parse(data=results, format='turtle')
-            else:
-                rdf_graph = results
-                
-            if len(rdf_graph) == 0:
-                raise ResourceNotFound(f"No data found in SPARQL endpoint for URI: {id_uri}")
-            return rdf_graph
-        except Exception as e:
-            raise
-
-    def query(self, sparql_query: str):
+        rdf_graph = self._construct(query)
+        if len(rdf_graph) == 0:
+            raise ResourceNotFound(f"No data found in SPARQL endpoint for URI: {id_uri}")
+        return rdf_graph
+
+    @staticmethod
+    def _iri(value: str) -> str:
+        """
+        Format a value as an IRI reference for use in a query
+
+        Raises:
+            ValueError: When the value can't be a valid IRI and could alter the query
+        """
+        if not value or _INVALID_IRI_CHARACTERS.search(value):
+            raise ValueError(f"Invalid IRI: {value!r}")
+        return f"<{value}>"
+
+    @staticmethod
+    def _label_optional() -> str:
+        """Query pattern binding ?label_pred and ?label for the labels of ?s"""
+        label_predicates = " ".join(f"<{pred}>" for pred in config.LABEL_PREDICATES)
+        return f"OPTIONAL {{ ?s ?label_pred ?label . VALUES ?label_pred {{ {label_predicates} }} }}"
+
+    @staticmethod
+    def _best_labels(bindings: list) -> dict:
+        """Pick the label of each ?s by the order of config.LABEL_PREDICATES"""
+        labels = {}
+        ranks = {}
+        for binding in bindings:
+            if 'label' not in binding:
+                continue
+            subj = binding['s']['value']
+            rank = config.LABEL_PREDICATES.index(binding['label_pred']['value'])
+            if subj not in ranks or rank < ranks[subj]:
+                ranks[subj] = rank
+                labels[subj] = binding['label']['value']
+        return labels
+
+    def query(self, sparql_query: str, read_timeout: float = None, optional: bool = False):
         """Execute a SPARQL query and return the results"""
-        try:
-            sparql = SPARQLWrapper(config.SPARQL_ENDPOINT)
-            sparql.setQuery(sparql_query)
-            sparql.setReturnFormat(JSON)
-            results = sparql.query().convert()
-            if isinstance(results, dict) and 'results' in results and 'bindings' in results['results']:
-                return results['results']['bindings']
-            return []
-        except Exception as e:
-            raise
+        results = json.loads(self._execute(sparql_query, 'application/sparql-results+json', read_timeout, optional))
+        if isinstance(results, dict) and 'results' in results and 'bindings' in results['results']:
+            return results['results']['bindings']
+        return []
+
+    def get_labels(self, uris: list) -> dict:
+        """
+        Get the labels of resources with a single query, listing the URIs in a VALUES block.
+
+        URIs that can't be written as an IRI in a query are skipped.
+        """
+        values = []
+        for uri in uris:
+            try:
+                values.append(self._iri(uri))
+            except ValueError:
+                continue
+        if not values:
+            return {}
+        label_predicates = " ".join(f"<{pred}>" for pred in config.LABEL_PREDICATES)
+        labels_query = f"""
+            SELECT ?s ?label_pred ?label
+            WHERE {{
+                VALUES ?s {{ {" ".join(values)} }}
+                VALUES ?label_pred {{ {label_predicates} }}
+                ?s ?label_pred ?label .
+            }}
+        """
+        return self._best_labels(self.query(labels_query, read_timeout=config.LABEL_LOOKUP_TIMEOUT, optional=True))
 
     def get_inverse_relations_graph(self, id_uri: str) -> Graph:
         """
         Get a graph containing all inverse relations for a given URI using a CONSTRUCT query.
-        
+
         Args:
             id_uri: The URI to find inverse relations for
-            
+
         Returns:
             Graph: RDFLib Graph containing all triples where id_uri is the object,
                   including label predicates from config.LABEL_PREDICATES
+
+        Raises:
+            Exception: When the query fails, so a failure isn't taken (and cached) for no relations
         """
         # Build CONSTRUCT query that includes both the inverse relations and their labels
-        label_optionals = " ".join(f"OPTIONAL {{ ?s <{pred}> ?label }}" for pred in config.LABEL_PREDICATES)
+        label_optionals = self._label_optional()
         construct_query = f"""
             CONSTRUCT {{
                 ?s ?p <{id_uri}> .
@@ -88,17 +313,115 @@ class SPARQLEndpoint(RDFSource):
                 {label_optionals}
             }}
         """
-        
-        # Execute query and return the resulting graph
-        sparql = SPARQLWrapper(self.endpoint_url)
-        sparql.setQuery(construct_query)
-        sparql.setReturnFormat('turtle')  # Get result as Turtle format
-        
+
+        # The page doesn't wait longer than this for inverse relations, so neither does the query
+        result = self._execute(construct_query, 'text/turtle', read_timeout=config.INVERSE_RELATIONS_TIMEOUT,
+                               optional=True)
+        graph = Graph()
+        graph.parse(data=result, format='turtle')
+        return graph
+
+    def get_inverse_relations(self, id_uri: str) -> dict:
+        """
+        Get the inverse relations for a given URI, counted and sampled by the endpoint.
+
+        In 'aggregate' mode only per-predicate counts and config.MAX_INVERSE_SUBJECTS
+        labelled subjects per predicate are transferred, however many resources
+        link to id_uri.
+
+        Args:
+            id_uri: The URI to find inverse relations for
+
+        Returns:
+            dict: Inverse relations grouped by predicate, as made by prerender_inverse_relations()
+
+        Raises:
+            Exception: When a query fails, so a failure isn't taken (and cached) for no relations
+        """
+        if config.INVERSE_RELATIONS_MODE != 'aggregate':
+            return super().get_inverse_relations(id_uri)
+
         try:
-            result = sparql.queryAndConvert()
-            graph = Graph()
-            graph.parse(data=result, format='turtle')
-            return graph
-        except Exception as e:
-            logger.error(f"Error getting inverse relations graph: {str(e)}")
-            return Graph()
+            target = self._iri(id_uri)
+        except ValueError:
+            # Nothing can link to it in a query
+            return {}
+        counts_query = f"""
+            SELECT ?p (COUNT(DISTINCT ?s) AS ?count)
+            WHERE {{
+                ?s ?p {target} .
+                FILTER(!isBlank(?s))
+            }}
+            GROUP BY ?p
+        """
+        counts = {}
+        for binding in self.query(counts_query, read_timeout=config.INVERSE_RELATIONS_TIMEOUT, optional=True):
+            counts[binding['p']['value']] = int(binding['count']['value'])
+        if not counts:
+            return {}
+
+        # One LIMITed subquery per predicate, so each predicate gets its own sample
+        samples_union = "\nUNION\n".join(
+            f"""{{
+                {{ SELECT DISTINCT ?s WHERE {{ ?s {self._iri(pred)} {target} . FILTER(!isBlank(?s)) }} LIMIT {config.MAX_INVERSE_SUBJECTS} }}
+                BIND({self._iri(pred)} AS ?p)
+            }}"""
+            for pred in counts
+        )
+        samples_query = f"""
+            SELECT ?p ?s ?label_pred ?label
+            WHERE {{
+                {samples_union}
+                {self._label_optional()}
+            }}
+        """
+        bindings = self.query(samples_query, read_timeout=config.INVERSE_RELATIONS_TIMEOUT, optional=True)
+
+        labels = self._best_labels(bindings)
+        samples = {pred: [] for pred in counts}
+        seen = set()
+        for binding in bindings:
+            pred = binding['p']['value']
+            subj = binding['s']['value']
+            if (pred, subj) in seen:
+                continue
+            seen.add((pred, subj))
+            samples[pred].append({'uri': subj, 'label': labels.get(subj, '')})
+        return summarize_inverse_relations(samples, counts, id_uri)
+
+    def get_inverse_subjects(self, id_uri: str, predicate: str, offset: int, limit: int) -> list:
+        """
+        Get one page of the subjects that link to a URI with a given predicate.
+
+        Args:
+            id_uri: The URI the subjects link to
+            predicate: The linking predicate
+            offset: Number of subjects to skip
+            limit: Maximum number of subjects to return
+
+        Returns:
+            list: Subject dicts with 'uri' and 'label', ordered by subject URI
+
+        Raises:
+            ValueError: When id_uri or predicate is not a valid IRI
+        """
+        if config.INVERSE_RELATIONS_MODE != 'aggregate':
+            return super().get_inverse_subjects(id_uri, predicate, offset, limit)
+
+        page_query = f"""
+            SELECT ?s ?label_pred ?label
+            WHERE {{
+                {{
+                    SELECT DISTINCT ?s
+                    WHERE {{ ?s {self._iri(predicate)} {self._iri(id_uri)} . FILTER(!isBlank(?s)) }}
+                    ORDER BY ?s
+                    OFFSET {int(offset)}
+                    LIMIT {int(limit)}
+                }}
+                {self._label_optional()}
+            }}
+        """
+        bindings = self.query(page_query)
+        labels = self._best_labels(bindings)
+        subjects = sorted({binding['s']['value'] for binding in bindings})
+        return [{'uri': subj, 'label': labels.get(subj, '')} for subj in subjects]
@@ -1,18 +1,38 @@
-from rdflib import Graph
+from rdflib import Graph, URIRef, Literal
 import os
 import logging
+import tempfile
 import config
 from urllib.parse import urlparse
 from .rdf_source import RDFSource, ResourceNotFound
+from .graph_codec import dump_graph, load_graph, GraphDecodeError
+from .lru import LRUCache
+from .compact_graph import CompactGraph
+from .inverse_index import InverseIndex
+from inverse_relations import summarize_inverse_relations
+from private_files import private_directory
 
 logger = logging.getLogger(__name__)
 
 class TurtleFiles(RDFSource):
     """
     RDF source that reads Turtle files from a directory
+
+    Parsed graphs are kept in memory, as CompactGraphs, until their file
+    changes (by modification time or size).
+    With a sidecar directory, parsed graphs are also stored on disk in the
+    graph_codec format, which loads much faster than parsing the Turtle again
+    in other workers or after a restart.
+
+    Inverse relations are answered from an optional InverseIndex, which is
+    kept up to date in the background.
     """
+
+    # Identifies sidecar files, followed by the modification time and size of the Turtle file
+    SIDECAR_MAGIC = b'LDVIEW-GRAPH'
     
-    def __init__(self, base_directory: str, base_uri: str):
+    def __init__(self, base_directory: str, base_uri: str, cache_size: int = 0, sidecar_directory: str = None,
+                 inverse_index: InverseIndex = None):
         """
         Initialize TurtleFiles source
         
@@ -20,9 +40,25 @@ class TurtleFiles(RDFSource):
             base_directory: Directory containing the Turtle files
             base_uri: Base URI that will be stripped to find the file path
                      (e.g., 'https://data.digitopia.nl/id/')
+            cache_size: Number of parsed graphs kept in memory (0 disables)
+            sidecar_directory: Optional directory for the pre-parsed sidecar files, only accessible to this user
+            inverse_index: Optional index of the links between the files, for inverse relations
+
+        Raises:
+            PermissionError: When other users can write to the sidecar directory
         """
         self.base_directory = base_directory
+        # Requested files must resolve to a path below this one
+        self._real_base_directory = os.path.realpath(base_directory)
         self.base_uri = base_uri
+        self._graphs = LRUCache(cache_size) if cache_size > 0 else None
+        self.sidecar_directory = sidecar_directory
+        if sidecar_directory:
+            # Sidecars are loaded instead of the Turtle files, so keep others from planting them
+            private_directory(sidecar_directory)
+        self.inverse_index = inverse_index
+        if inverse_index is not None:
+            inverse_index.start()
         
     def _uri_to_file_path(self, uri: str) -> str:
         """
@@ -38,29 +74,150 @@ class TurtleFiles(RDFSource):
         relative_path = uri[len(self.base_uri):]
         file_path = os.path.join(self.base_directory, relative_path + '.ttl')
         return file_path
+
+    def _resolve(self, file_path: str, id_uri: str) -> str:
+        """
+        Resolve the Turtle file of a URI, which must be inside the base directory
+
+        The path comes from the requested URI, so it may contain '..' segments
+        (e.g. /id/..%2F..%2Fx); those must not read files elsewhere nor write
+        sidecars outside the sidecar directory.
+
+        Raises:
+            ResourceNotFound: When the file resolves to a path outside the base directory
+        """
+        real_path = os.path.realpath(file_path)
+        if os.path.commonpath([real_path, self._real_base_directory]) != self._real_base_directory:
+            raise ResourceNotFound(f"No Turtle file found for URI: {id_uri}")
+        return real_path
         
-    def get_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> Graph:
+    def get_rdf_for_uri(self, id_uri: str, page_uri: str = None) -> CompactGraph:
         if id_uri == config.BASE_URI:
             file_path = os.path.join(self.base_directory, config.HOME_PAGE_TURTLEFILE)
         else:
             file_path = self._uri_to_file_path(id_uri)
+        file_path = self._resolve(file_path, id_uri)
 
-        if not os.path.exists(file_path):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
             raise ResourceNotFound(f"No Turtle file found for URI: {id_uri}")
-                 
-        graph = Graph()
-        graph.parse(file_path, format='turtle')
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        if self._graphs is not None:
+            cached = self._graphs.get(file_path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        graph = self._read_sidecar(file_path, version)
+        if graph is None:
+            parsed = Graph()
+            parsed.parse(file_path, format='turtle')
+            graph = CompactGraph.from_triples(parsed)
+            self._write_sidecar(file_path, version, graph)
+
+        if self._graphs is not None:
+            self._graphs.set(file_path, (version, graph))
         return graph
 
+    def _sidecar_path(self, file_path: str) -> str:
+        # file_path is resolved inside the base directory by _resolve()
+        relative_path = os.path.relpath(file_path, self._real_base_directory)
+        return os.path.join(self.sidecar_directory, relative_path + '.graph')
+
+    def _read_sidecar(self, file_path: str, version: tuple) -> CompactGraph:
+        """Load the pre-parsed graph of a Turtle file, or None if missing or outdated"""
+        if not self.sidecar_directory:
+            return None
+        try:
+            with open(self._sidecar_path(file_path), 'rb') as f:
+                header = f.readline().split()
+                if header != [self.SIDECAR_MAGIC, str(version[0]).encode(), str(version[1]).encode()]:
+                    return None
+                return load_graph(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, GraphDecodeError) as e:
+            logger.warning(f"Ignoring unreadable sidecar of {file_path}: {str(e)}")
+            return None
+
+    def _write_sidecar(self, file_path: str, version: tuple, graph: CompactGraph):
+        """Store the pre-parsed graph of a Turtle file, replacing the sidecar atomically"""
+        if not self.sidecar_directory:
+            return
+        sidecar_path = self._sidecar_path(file_path)
+        try:
+            os.makedirs(os.path.dirname(sidecar_path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(sidecar_path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(b'%s %d %d\n' % (self.SIDECAR_MAGIC, version[0], version[1]))
+                    f.write(dump_graph(graph))
+                os.replace(temp_path, sidecar_path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Cannot write sidecar of {file_path}: {str(e)}")
+
+    def _index(self) -> InverseIndex:
+        if self.inverse_index is not None:
+            # (Re)starts the indexer in worker processes forked after initialization
+            self.inverse_index.start()
+        return self.inverse_index
+
     def get_inverse_relations_graph(self, id_uri: str) -> Graph:
         """
-        Get a graph containing all inverse relations for a given URI.
-        For TurtleFiles, this always returns an empty graph since we don't support inverse relations.
+        Get a graph containing all inverse relations for a given URI, with the labels of their subjects.
+        Without an inverse index this is always an empty graph.
         
         Args:
             id_uri: The URI to find inverse relations for
             
         Returns:
-            Graph: Empty RDFLib Graph since inverse relations are not supported
+            Graph: RDFLib Graph containing all triples where id_uri is the object
         """
-        return Graph()
+        graph = Graph()
+        index = self._index()
+        if index is None:
+            return graph
+
+        target = URIRef(id_uri)
+        links = index.links_to(id_uri)
+        for predicate, subject in links:
+            graph.add((URIRef(subject), URIRef(predicate), target))
+        for subject, (label_pred, label) in index.labels({subject for _, subject in links}).items():
+            graph.add((URIRef(subject), URIRef(label_pred), Literal(label)))
+        return graph
+
+    def get_inverse_relations(self, id_uri: str) -> dict:
+        index = self._index()
+        if index is None:
+            return {}
+
+        counts = index.counts(id_uri)
+        samples = {
+            predicate: index.subjects(id_uri, predicate, 0, config.MAX_INVERSE_SUBJECTS)
+            for predicate in counts
+        }
+        labels = index.labels({subject for subjects in samples.values() for subject in subjects})
+        inverse_relations = {
+            predicate: [{'uri': subject, 'label': labels[subject][1] if subject in labels else ''} for subject in subjects]
+            for predicate, subjects in samples.items()
+        }
+        return summarize_inverse_relations(inverse_relations, counts, id_uri)
+
+    def get_inverse_subjects(self, id_uri: str, predicate: str, offset: int, limit: int) -> list:
+        index = self._index()
+        if index is None:
+            return []
+
+        subjects = index.subjects(id_uri, predicate, offset, limit)
+        labels = index.labels(subjects)
+        return [{'uri': subject, 'label': labels[subject][1] if subject in labels else ''} for subject in subjects]
+
+    def get_labels(self, uris: list) -> dict:
+        index = self._index()
+        if index is None:
+            return {}
+        return {subject: label for subject, (label_pred, label) in index.labels(uris).items()}
@@ -0,0 +1,261 @@
+import json
+from rdflib import URIRef, BNode, Literal, RDF, XSD
+import config
+from uri_utils import PrefixIndex
+
+# Characters collected before a chunk is sent
+CHUNK_SIZE = 65536
+
+# Local names written as prefixed names; others are written as full IRIs
+_SAFE_LOCAL_NAME = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-')
+
+_ESCAPES = {'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r'}
+_ESCAPE_TABLE = str.maketrans(_ESCAPES)
+
+def _chunks(pieces):
+    """Join small strings into chunks of about CHUNK_SIZE characters"""
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+def _literal(literal: Literal) -> str:
+    """Write a literal on one line, valid in N-Triples and Turtle"""
+    quoted = '"' + str(literal).translate(_ESCAPE_TABLE) + '"'
+    if literal.language:
+        return f"{quoted}@{literal.language}"
+    if literal.datatype and literal.datatype != XSD.string:
+        return f"{quoted}^^<{literal.datatype}>"
+    return quoted
+
+def _term(term) -> str:
+    if isinstance(term, Literal):
+        return _literal(term)
+    if isinstance(term, BNode):
+        return f"_:{term}"
+    return f"<{term}>"
+
+def ntriples(graph):
+    """
+    Serialize a graph as N-Triples, a chunk at a time
+
+    The same output is valid N-Quads: all triples are in the default graph.
+    """
+    return _chunks(f"{_term(s)} {_term(p)} {_term(o)} .\n" for s, p, o in graph)
+
+def turtle(graph):
+    """
+    Serialize a graph as Turtle, a chunk at a time
+
+    Triples are grouped by subject and IRIs in config.NAMESPACES are written as
+    prefixed names. Unlike rdflib's serializer this doesn't nest blank nodes
+    or sort the output, so nothing has to be built up front.
+    """
+    index = PrefixIndex(config.NAMESPACES)
+
+    def term(value) -> str:
+        if isinstance(value, URIRef):
+            match = index.longest_prefix(value)
+            if match is not None:
+                local = value[match[1]:]
+                if local and _SAFE_LOCAL_NAME.issuperset(local) and local[0] != '-':
+                    return f"{match[0]}:{local}"
+        return _term(value)
+
+    def pieces():
+        for prefix, namespace in config.NAMESPACES.items():
+            yield f"@prefix {prefix}: <{namespace}> .\n"
+        for subject in graph.subjects(unique=True):
+            statements = []
+            for _, predicate, obj in graph.triples((subject, None, None)):
+                statements.append(f"    {'a' if predicate == RDF.type else term(predicate)} {term(obj)}")
+            yield f"\n{term(subject)}\n" + ' ;\n'.join(statements) + ' .\n'
+
+    return _chunks(pieces())
+
+# Characters a namespace must end with to be usable as a JSON-LD prefix
+_PREFIX_ENDINGS = ':/?#[]@'
+
+def load_context_file(path: str) -> dict:
+    """
+    Load a static JSON-LD context from a file
+
+    Args:
+        path: Path of a JSON file with an "@context" object, or of the context object itself
+
+    Returns:
+        dict: The context object
+
+    Raises:
+        ValueError: When the file doesn't hold a context object
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    context = data.get('@context', data) if isinstance(data, dict) else None
+    if not isinstance(context, dict):
+        raise ValueError(f"{path} does not contain a JSON-LD context object")
+    return context
+
+class JSONLDContext:
+    """
+    The @context of JSON-LD output, with the lookups to compact IRIs against it
+
+    Made of the prefixes in config.NAMESPACES, overridden by an optional static
+    context. Terms of the static context are used for properties and types
+    when they are plain IRI mappings; terms with coercion, containers and the
+    like are left alone, so compaction never changes what the data means.
+    """
+    __slots__ = ('context', 'terms', 'prefixes', 'default_language')
+
+    def __init__(self, namespaces: dict, static_context: dict = None):
+        """
+        Initialize JSONLDContext
+
+        Args:
+            namespaces: Dictionary mapping prefixes to namespace URIs
+            static_context: Optional JSON-LD context object to include
+        """
+        static_context = static_context or {}
+        prefixes = {prefix: namespace for prefix, namespace in namespaces.items()
+                    if namespace and namespace[-1] in _PREFIX_ENDINGS and prefix not in static_context}
+        self.context = dict(prefixes)
+        self.context.update(static_context)
+        self.prefixes = PrefixIndex(prefixes)
+        # Plain strings would pick up a default language, so they are written as value objects then
+        self.default_language = static_context.get('@language') is not None
+
+        self.terms = {}
+        for term, definition in static_context.items():
+            if term.startswith('@'):
+                continue
+            if isinstance(definition, dict):
+                if set(definition) != {'@id'}:
+                    continue
+                definition = definition['@id']
+            if not isinstance(definition, str):
+                continue
+            prefix, _, local = definition.partition(':')
+            if isinstance(self.context.get(prefix), str) and not local.startswith('//'):
+                definition = self.context[prefix] + local
+            self.terms.setdefault(definition, term)
+
+    def compact_iri(self, iri: str, vocab: bool = False) -> str:
+        """
+        Compact an IRI to a term (only where vocab is True, as for properties and types) or prefixed name
+        """
+        # Plain str, since rdflib terms hash differently from equal strings
+        iri = str(iri)
+        if vocab:
+            term = self.terms.get(iri)
+            if term is not None:
+                return term
+        match = self.prefixes.longest_prefix(iri)
+        if match is not None:
+            local = iri[match[1]:]
+            if local and not local.startswith('//'):
+                return f"{match[0]}:{local}"
+        return iri
+
+_jsonld_context = None
+_jsonld_context_source = (None, None)
+
+def get_jsonld_context() -> JSONLDContext:
+    """Get the JSON-LD context, rebuilding it only when the configuration is replaced"""
+    global _jsonld_context, _jsonld_context_source
+    namespaces, context_file = _jsonld_context_source
+    if _jsonld_context is None or namespaces is not config.NAMESPACES or context_file is not config.JSONLD_CONTEXT_FILE:
+        static_context = load_context_file(config.JSONLD_CONTEXT_FILE) if config.JSONLD_CONTEXT_FILE else None
+        _jsonld_context = JSONLDContext(config.NAMESPACES, static_context)
+        _jsonld_context_source = (config.NAMESPACES, config.JSONLD_CONTEXT_FILE)
+    return _jsonld_context
+
+def jsonld(graph, context: JSONLDContext = None):
+    """
+    Serialize a graph as compacted JSON-LD, a chunk at a time
+
+    Triples are grouped into one node object per subject in a single pass over
+    the graph, with IRIs compacted against the context; the node objects are
+    then written out one by one under @graph.
+
+    Args:
+        graph: The graph to serialize
+        context: The context to compact against, get_jsonld_context() by default
+    """
+    if context is None:
+        context = get_jsonld_context()
+    compact_iri = context.compact_iri
+    default_language = context.default_language
+    # Compacted forms of the terms seen so far; rdf:type becomes @type
+    keys = {}
+    ids = {}
+    datatypes = {}
+
+    def node_id(term) -> str:
+        value = ids.get(term)
+        if value is None:
+            value = ids[term] = f"_:{term}" if isinstance(term, BNode) else compact_iri(term)
+        return value
+
+    nodes = {}
+    for s, p, o in graph:
+        node = nodes.get(s)
+        if node is None:
+            node = nodes[s] = {'@id': node_id(s)}
+        property_key = keys.get(p)
+        if property_key is None:
+            property_key = keys[p] = '@type' if p == RDF.type else compact_iri(p, vocab=True)
+        if isinstance(o, Literal):
+            if property_key == '@type':
+                property_key = compact_iri(p, vocab=True)
+            datatype = o.datatype
+            if o.language:
+                value = {'@value': str(o), '@language': o.language}
+            elif datatype is not None:
+                datatype_key = datatypes.get(datatype)
+                if datatype_key is None:
+                    datatype_key = datatypes[datatype] = '' if datatype == XSD.string else compact_iri(datatype, vocab=True)
+                if datatype_key:
+                    value = {'@value': str(o), '@type': datatype_key}
+                else:
+                    value = {'@value': str(o)} if default_language else str(o)
+            elif default_language:
+                value = {'@value': str(o)}
+            else:
+                value = str(o)
+        elif property_key == '@type':
+            value = compact_iri(o, vocab=True) if isinstance(o, URIRef) else node_id(o)
+        else:
+            value = {'@id': node_id(o)}
+        values = node.get(property_key)
+        if values is None:
+            node[property_key] = [value]
+        else:
+            values.append(value)
+
+    def pieces():
+        yield '{"@context": ' + json.dumps(context.context, ensure_ascii=False) + ',\n"@graph": ['
+        separator = '\n'
+        for node in nodes.values():
+            for property_key, values in node.items():
+                if property_key != '@id' and len(values) == 1:
+                    node[property_key] = values[0]
+            yield separator + json.dumps(node, ensure_ascii=False)
+            separator = ',\n'
+        yield '\n]}\n'
+
+    return _chunks(pieces())
+
+# Streaming serializers by ContentNegotiator format name
+SERIALIZERS = {
+    'nt': ntriples,
+    'nquads': ntriples,
+    'turtle': turtle,
+    'json-ld': jsonld,
+}
@@ -0,0 +1,19 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import shutil
+import tempfile
+
+import config
+
+# The test modules import app, which opens its caches right away: keep them out of the real state directory
+_state_directory = tempfile.mkdtemp(prefix='ldview-tests-')
+config.STATE_DIRECTORY = _state_directory
+config.GRAPH_CACHE_PATH = os.path.join(_state_directory, 'graph-cache.sqlite')
+config.METRICS_PATH = os.path.join(_state_directory, 'metrics.sqlite')
+config.TURTLE_SIDECAR_DIRECTORY = os.path.join(_state_directory, 'turtle-graphs')
+config.TURTLE_INVERSE_INDEX_PATH = os.path.join(_state_directory, 'turtle-inverse.sqlite')
+
+def pytest_unconfigure():
+    shutil.rmtree(_state_directory, ignore_errors=True)
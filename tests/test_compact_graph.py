@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import pytest
+from rdflib import Graph, URIRef, Literal
+from rdflib.compare import isomorphic
+
+from rdf_sources.compact_graph import CompactGraph
+from rdf_sources.graph_codec import dump_graph, load_graph
+from view_model import build_view_model
+
+TURTLE = """
+@prefix schema: <http://schema.org/> .
+
+<http://example.org/id/a> a schema:Person ;
+    schema:name "A" , "A"@nl ;
+    schema:knows <http://example.org/id/b> ;
+    schema:address [ schema:streetAddress "Main street" ] .
+<http://example.org/id/b> schema:name "B" ;
+    schema:knows <http://example.org/id/a> .
+"""
+
+A = URIRef('http://example.org/id/a')
+B = URIRef('http://example.org/id/b')
+NAME = URIRef('http://schema.org/name')
+KNOWS = URIRef('http://schema.org/knows')
+
+@pytest.fixture
+def graph():
+    return Graph().parse(data=TURTLE, format='turtle')
+
+def test_pattern_queries_match_rdflib(graph):
+    compact = CompactGraph.from_triples(graph)
+    assert len(compact) == len(graph)
+    assert set(compact) == set(graph)
+    for pattern in [(A, None, None), (None, NAME, None), (None, None, A), (A, KNOWS, None),
+                    (None, KNOWS, B), (A, NAME, Literal('A', lang='nl')), (URIRef('http://example.org/x'), None, None)]:
+        assert set(compact.triples(pattern)) == set(graph.triples(pattern))
+    assert set(compact.objects(A, NAME)) == set(graph.objects(A, NAME))
+    assert set(compact.subjects(KNOWS, A)) == {B}
+    assert compact.value(B, NAME) == Literal('B')
+    assert (A, KNOWS, B) in compact and (B, KNOWS, B) not in compact
+
+def test_duplicates_are_dropped(graph):
+    assert len(CompactGraph.from_triples(list(graph) * 2)) == len(graph)
+
+def test_codec_decodes_to_compact_graph(graph):
+    decoded = load_graph(dump_graph(graph))
+    assert isinstance(decoded, CompactGraph)
+    assert isomorphic(decoded.to_graph(), graph)
+    assert isomorphic(Graph().parse(data=decoded.serialize(format='turtle'), format='turtle'), graph)
+
+def test_view_model_is_the_same(graph):
+    compact = CompactGraph.from_triples(graph)
+    assert build_view_model(compact, str(A)) == build_view_model(graph, str(A))
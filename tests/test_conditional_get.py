@@ -0,0 +1,118 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import pytest
+from rdflib import Graph
+
+import app as app_module
+import config
+from conditional_get import graph_digest, config_fingerprint
+from rdf_sources.rdf_source import RDFSource
+from rdf_sources.cache_store import CacheStore
+from output_cache import OutputCache
+
+TURTLE = """
+@prefix schema: <http://schema.org/> .
+@prefix dcterms: <http://purl.org/dc/terms/> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+<http://example.org/id/a> schema:name "A" ;
+    dcterms:modified "2024-05-01T12:30:00Z"^^xsd:dateTime ;
+    schema:address [ schema:streetAddress "Main street" ; schema:postalCode "1234" ] ;
+    schema:contactPoint [ schema:name "Desk" ] , [ schema:name "Phone" ] .
+"""
+
+class StaticSource(RDFSource):
+    def __init__(self, turtle):
+        self.turtle = turtle
+
+    def get_rdf_for_uri(self, id_uri, page_uri=None):
+        return Graph().parse(data=self.turtle, format='turtle')
+
+    def get_inverse_relations_graph(self, id_uri):
+        return Graph()
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(config, 'USE_SEMANTIC_REDIRECTS', False)
+    monkeypatch.setattr(config, 'BASE_URI', 'http://example.org/')
+    monkeypatch.setattr(app_module, 'rdf_source', StaticSource(TURTLE))
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        yield client
+
+def test_digest_ignores_blank_node_labels():
+    # Every parse assigns new blank node labels
+    first = Graph().parse(data=TURTLE, format='turtle')
+    second = Graph().parse(data=TURTLE, format='turtle')
+    assert set(first.all_nodes()) != set(second.all_nodes())
+    assert graph_digest(first) == graph_digest(second)
+
+def test_digest_sees_changes_inside_blank_nodes():
+    changed = Graph().parse(data=TURTLE.replace('"Phone"', '"Fax"'), format='turtle')
+    swapped = Graph().parse(data=TURTLE.replace('"1234"', '"Desk"').replace('schema:name "Desk"', 'schema:name "1234"'), format='turtle')
+    original = graph_digest(Graph().parse(data=TURTLE, format='turtle'))
+    assert graph_digest(changed) != original
+    assert graph_digest(swapped) != original
+
+@pytest.mark.parametrize('accept', ['text/html', 'text/turtle'])
+def test_revalidation_with_etag(client, accept):
+    response = client.get('/id/a', headers={'Accept': accept})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control']
+    assert 'Accept' in response.headers['Vary']
+    etag = response.headers['ETag']
+
+    response = client.get('/id/a', headers={'Accept': accept, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+    response = client.get('/id/a', headers={'Accept': accept, 'If-None-Match': 'W/"other"'})
+    assert response.status_code == 200
+
+def test_formats_get_their_own_etag(client):
+    html = client.get('/id/a', headers={'Accept': 'text/html'})
+    turtle = client.get('/id/a', headers={'Accept': 'text/turtle'})
+    assert html.headers['ETag'] != turtle.headers['ETag']
+
+def test_revalidation_with_last_modified(client):
+    response = client.get('/id/a', headers={'Accept': 'text/turtle'})
+    assert response.headers['Last-Modified'] == 'Wed, 01 May 2024 12:30:00 GMT'
+
+    response = client.get('/id/a', headers={'Accept': 'text/turtle', 'If-Modified-Since': 'Wed, 01 May 2024 12:30:00 GMT'})
+    assert response.status_code == 304
+    response = client.get('/id/a', headers={'Accept': 'text/turtle', 'If-Modified-Since': 'Tue, 30 Apr 2024 12:30:00 GMT'})
+    assert response.status_code == 200
+
+def test_prefix_changes_change_the_etag(client, monkeypatch):
+    before = client.get('/id/a', headers={'Accept': 'text/turtle'})
+    monkeypatch.setattr(app_module, 'serialization_fingerprint', config_fingerprint([{'s': 'http://schema.org/'}]))
+    after = client.get('/id/a', headers={'Accept': 'text/turtle'})
+    assert before.headers['ETag'] != after.headers['ETag']
+
+def test_config_fingerprint_covers_file_contents(tmp_path):
+    path = tmp_path / 'context.json'
+    path.write_text('{"@context": {"s": "http://schema.org/"}}')
+    first = config_fingerprint([{}], [str(path), None])
+    assert config_fingerprint([{}], [str(path), None]) == first
+    path.write_text('{"@context": {"schema": "http://schema.org/"}}')
+    assert config_fingerprint([{}], [str(path), None]) != first
+
+def test_not_modified_varies_on_encoding_with_the_output_cache(client, monkeypatch, tmp_path):
+    store = CacheStore(str(tmp_path / 'cache.sqlite'), 1024 * 1024)
+    monkeypatch.setattr(app_module, 'output_cache', OutputCache(store, 60, 1024 * 1024, ['gzip']))
+    response = client.get('/id/a', headers={'Accept': 'text/turtle', 'Accept-Encoding': 'gzip'})
+    assert 'Accept-Encoding' in response.vary
+
+    response = client.get('/id/a', headers={'Accept': 'text/turtle', 'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+    assert 'Accept-Encoding' in response.vary and 'Accept' in response.vary
@@ -0,0 +1,58 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import pytest
+from rdflib import Graph
+from rdflib.compare import isomorphic
+
+from content_negotiation import ContentNegotiator
+from rdf_sources.compact_graph import CompactGraph
+
+DATA = """
+@prefix schema: <http://schema.org/> .
+<https://example.org/id/a> a schema:Person ;
+    schema:name "A \\"quoted\\"\\nsecond line", "A"@nl ;
+    schema:age 42 ;
+    schema:address [ schema:streetAddress "Main street 1" ] ;
+    schema:url <https://example.org/a.html> .
+"""
+
+def select(accept_header):
+    format_info = ContentNegotiator.select_format(accept_header=accept_header)
+    return format_info['format'] if format_info else 'html'
+
+@pytest.mark.parametrize('accept_header, expected', [
+    ('text/turtle', 'turtle'),
+    ('application/ld+json;q=0.9, text/turtle;q=0.5', 'json-ld'),
+    ('text/turtle;q=0.5, application/n-triples', 'nt'),
+    ('text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8', 'html'),
+    ('*/*', 'html'),
+    ('text/turtle, */*;q=0.1', 'turtle'),
+    ('application/n-quads, text/html', 'nquads'),
+    ('text/turtle;q=0, */*', 'html'),
+    ('image/png', 'html'),
+])
+def test_accept_header_with_q_values(accept_header, expected):
+    assert select(accept_header) == expected
+
+def test_format_parameter_wins():
+    assert ContentNegotiator.select_format('nt', 'text/turtle')['format'] == 'nt'
+
+@pytest.mark.parametrize('format_name, parse_format', [
+    ('nt', 'nt'), ('nquads', 'nquads'), ('turtle', 'turtle'), ('json-ld', 'json-ld'),
+])
+def test_streamed_output_round_trips(format_name, parse_format):
+    graph = Graph().parse(data=DATA, format='turtle')
+    for source in (graph, CompactGraph.from_triples(graph)):
+        response = ContentNegotiator._create_response(source, ContentNegotiator.FORMATS[format_name])
+        assert response.is_streamed
+        parsed = Graph().parse(data=response.get_data(as_text=True), format=parse_format)
+        assert isomorphic(parsed, graph)
@@ -0,0 +1,82 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import subprocess
+import textwrap
+import pytest
+
+import config
+from cooperative import is_cooperative, pool_size
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def run_patched(script: str):
+    """Run a script in a process patched like a gunicorn gevent worker"""
+    pytest.importorskip('gevent')
+    source = "from gevent import monkey\nmonkey.patch_all()\n" + textwrap.dedent(script)
+    result = subprocess.run([sys.executable, '-c', source], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+
+def test_sync_worker_keeps_configured_sizes():
+    assert not is_cooperative()
+    assert pool_size(4) == 4
+
+def test_gevent_worker_queries_concurrently():
+    run_patched("""
+        import time
+        import gevent
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        import config
+        from cooperative import is_cooperative, pool_size
+        from rdf_sources.sparql_endpoint import SPARQLEndpoint
+
+        class SlowEndpoint(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                time.sleep(0.5)
+                body = b'{"head": {"vars": []}, "results": {"bindings": []}}'
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/sparql-results+json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        # Room in the listen backlog for all connections at once
+        ThreadingHTTPServer.request_queue_size = 64
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SlowEndpoint)
+        gevent.spawn(server.serve_forever)
+        assert is_cooperative()
+        assert pool_size(4) == config.WORKER_CONNECTIONS
+
+        endpoint = SPARQLEndpoint(f"http://127.0.0.1:{server.server_port}/sparql", 'https://example.org/')
+        start = time.monotonic()
+        gevent.joinall([gevent.spawn(endpoint.query, 'SELECT * WHERE { ?s ?p ?o }') for _ in range(20)], raise_error=True)
+        # Twenty queries of half a second overlap instead of taking ten seconds
+        assert time.monotonic() - start < 3
+    """)
+
+def test_gevent_worker_shares_sqlite_connection(tmp_path):
+    run_patched(f"""
+        import gevent
+        from rdf_sources.cache_store import CacheStore
+
+        store = CacheStore({str(tmp_path / 'cache.sqlite')!r}, 1024 * 1024)
+        def fill(i):
+            store.set(f'key {{i}}', b'value', 60, 60)
+            assert store.get(f'key {{i}}') == (b'value', True)
+            return store._connection()
+        greenlets = [gevent.spawn(fill, i) for i in range(50)]
+        gevent.joinall(greenlets, raise_error=True)
+        assert len({{id(greenlet.value) for greenlet in greenlets}}) == 1
+    """)
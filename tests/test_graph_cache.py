@@ -0,0 +1,176 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import time
+import pickle
+import pytest
+from rdflib import Graph, URIRef, BNode, Literal
+from rdflib.compare import isomorphic
+
+from rdf_sources.rdf_source import RDFSource, ResourceNotFound
+from rdf_sources.cache_store import CacheStore
+from rdf_sources.cached_source import CachedRDFSource
+from rdf_sources.graph_codec import dump_graph, load_graph, GraphDecodeError
+from private_files import private_directory
+
+
+class CountingSource(RDFSource):
+    """RDF source returning a fixed graph and counting the lookups"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.calls = 0
+
+    def get_rdf_for_uri(self, id_uri, page_uri=None):
+        self.calls += 1
+        if id_uri.endswith('missing'):
+            raise ResourceNotFound(id_uri)
+        return self.graph
+
+    def get_inverse_relations_graph(self, id_uri):
+        return Graph()
+
+
+@pytest.fixture
+def graph():
+    graph = Graph()
+    subject = URIRef('http://example.org/id/a')
+    node = BNode()
+    graph.add((subject, URIRef('http://schema.org/name'), Literal('A', lang='nl')))
+    graph.add((subject, URIRef('http://schema.org/birthDate'), Literal('1900-01-01', datatype=URIRef('http://www.w3.org/2001/XMLSchema#date'))))
+    graph.add((subject, URIRef('http://schema.org/address'), node))
+    graph.add((node, URIRef('http://schema.org/latitude'), Literal('52.1')))
+    return graph
+
+
+def test_graph_codec_round_trip(graph):
+    """
+    Test that an encoded graph decodes to the same triples, including blank node labels.
+    """
+    decoded = load_graph(dump_graph(graph))
+    assert set(decoded) == set(graph)
+
+
+class Planted:
+    def __reduce__(self):
+        return (pytest.fail, ("cache data was executed",))
+
+
+def test_graph_codec_rejects_foreign_data(graph):
+    """
+    Test that data not written by dump_graph(), e.g. planted pickles, is refused without being run.
+    """
+    data = dump_graph(graph)
+    for foreign in [pickle.dumps(Planted()), data[:-4], data[:5] + b'\xff' + data[6:], b'']:
+        with pytest.raises(GraphDecodeError):
+            load_graph(foreign)
+
+
+def test_cache_directory_must_be_private(tmp_path):
+    directory = tmp_path / 'shared'
+    directory.mkdir()
+    os.chmod(directory, 0o777)
+    with pytest.raises(PermissionError):
+        CacheStore(str(directory / 'cache.sqlite'), 1024 * 1024)
+    assert private_directory(str(tmp_path / 'private')) and (os.stat(tmp_path / 'private').st_mode & 0o777) == 0o700
+
+
+def test_cached_source_hits_and_misses(tmp_path, graph):
+    """
+    Test that a second lookup is answered from the cache and counted as a hit.
+    """
+    source = CountingSource(graph)
+    cached = CachedRDFSource(source, CacheStore(str(tmp_path / 'cache.sqlite'), 1024 * 1024), ttl=60, stale_ttl=60)
+
+    first = cached.get_rdf_for_uri('http://example.org/id/a')
+    second = cached.get_rdf_for_uri('http://example.org/id/a')
+
+    assert source.calls == 1
+    assert isomorphic(first, second)
+    stats = cached.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1
+
+
+class SummarySource(CountingSource):
+    """RDF source whose inverse relations lookup fails while 'failing' is set"""
+
+    failing = False
+
+    def get_inverse_relations(self, id_uri):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("endpoint down")
+        if id_uri.endswith('linked'):
+            return {'http://schema.org/about': {'subjects': [{'uri': 'http://example.org/id/b', 'label': 'B'}],
+                                                'total_count': 1}}
+        return {}
+
+
+def test_inverse_summaries_are_cached_including_empty_ones(tmp_path, graph):
+    source = SummarySource(graph)
+    cached = CachedRDFSource(source, CacheStore(str(tmp_path / 'cache.sqlite'), 1024 * 1024), ttl=60, stale_ttl=60)
+
+    for _ in range(2):
+        assert cached.get_inverse_relations('http://example.org/id/a') == {}
+        assert cached.get_inverse_relations('http://example.org/id/linked')['http://schema.org/about']['total_count'] == 1
+    assert source.calls == 2
+
+
+def test_failed_inverse_lookups_are_not_cached(tmp_path, graph):
+    source = SummarySource(graph)
+    source.failing = True
+    cached = CachedRDFSource(source, CacheStore(str(tmp_path / 'cache.sqlite'), 1024 * 1024), ttl=60, stale_ttl=60)
+
+    with pytest.raises(ConnectionError):
+        cached.get_inverse_relations('http://example.org/id/a')
+    source.failing = False
+    assert cached.get_inverse_relations('http://example.org/id/a') == {}
+    assert source.calls == 2
+
+
+def test_missing_resources_are_not_cached(tmp_path, graph):
+    source = CountingSource(graph)
+    cached = CachedRDFSource(source, CacheStore(str(tmp_path / 'cache.sqlite'), 1024 * 1024), ttl=60, stale_ttl=60)
+
+    for _ in range(2):
+        with pytest.raises(ResourceNotFound):
+            cached.get_rdf_for_uri('http://example.org/id/missing')
+    assert source.calls == 2
+
+
+def test_stale_entry_is_served_and_refreshed(tmp_path, graph):
+    """
+    Test that an expired entry within the stale period is returned while it is refreshed in the background.
+    """
+    source = CountingSource(graph)
+    cached = CachedRDFSource(source, CacheStore(str(tmp_path / 'cache.sqlite'), 1024 * 1024), ttl=0, stale_ttl=60)
+
+    cached.get_rdf_for_uri('http://example.org/id/a')
+    stale = cached.get_rdf_for_uri('http://example.org/id/a')
+    cached._refresh_executor.shutdown(wait=True)
+
+    assert isomorphic(stale, graph)
+    assert source.calls == 2
+    assert cached.stats()['stale_hits'] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    store = CacheStore(str(tmp_path / 'cache.sqlite'), max_bytes=250)
+    store.set('a', b'x' * 100, ttl=60, stale_ttl=0)
+    store.set('b', b'x' * 100, ttl=60, stale_ttl=0)
+    time.sleep(store.ACCESS_RESOLUTION + 0.1)
+    assert store.get('a') is not None
+
+    store.set('c', b'x' * 100, ttl=60, stale_ttl=0)
+
+    assert store.get('a') is not None
+    assert store.get('b') is None
+    assert store.get('c') is not None
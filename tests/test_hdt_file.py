@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import pytest
+from rdflib import URIRef, BNode, Literal, XSD
+
+from rdf_sources.hdt_file import HDTDocument, HDTFile, parse_hdt_term, is_blank_or_skolem
+from rdf_sources.rdf_source import ResourceNotFound
+
+HDT_FILE = os.path.join(os.path.dirname(__file__), '..', 'hdt', 'example.hdt')
+
+def test_parse_hdt_terms():
+    assert parse_hdt_term('http://example.org/a') == URIRef('http://example.org/a')
+    assert parse_hdt_term('_:b1') == BNode('b1')
+    assert parse_hdt_term('"plain"') == Literal('plain')
+    assert parse_hdt_term('"naam"@nl') == Literal('naam', lang='nl')
+    assert parse_hdt_term(f'"5"^^<{XSD.integer}>') == Literal('5', datatype=XSD.integer)
+    assert parse_hdt_term('"say "hi""') == Literal('say "hi"')
+
+def test_blank_or_skolem():
+    assert is_blank_or_skolem('_:b1')
+    assert is_blank_or_skolem('https://example.org/.well-known/genid/x1')
+    assert not is_blank_or_skolem('https://example.org/id/a')
+    assert not is_blank_or_skolem('"/.well-known/genid/ in a literal"')
+
+@pytest.mark.skipif(HDTDocument is None, reason="the hdt package is not installed")
+def test_lookup_in_example_file():
+    source = HDTFile(HDT_FILE, 'http://example.org/')
+    (subject, predicate, obj), = source._search(limit=1)
+    graph = source.get_rdf_for_uri(subject)
+    assert (parse_hdt_term(subject), parse_hdt_term(predicate), parse_hdt_term(obj)) in graph
+    with pytest.raises(ResourceNotFound):
+        source.get_rdf_for_uri('http://example.org/does-not-exist')
@@ -0,0 +1,74 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import pytest
+from rdflib import Graph, URIRef, Literal
+
+import config
+from inverse_relations import prerender_inverse_relations
+
+HUB = 'http://example.org/id/hub'
+KNOWS = 'http://schema.org/knows'
+ABOUT = 'http://schema.org/about'
+PREF_LABEL = 'http://www.w3.org/2004/02/skos/core#prefLabel'
+NAME = 'http://schema.org/name'
+
+
+@pytest.fixture
+def graph():
+    graph = Graph()
+    for i in range(8):
+        subject = URIRef(f'http://example.org/id/s{i}')
+        graph.add((subject, URIRef(KNOWS), URIRef(HUB)))
+        graph.add((subject, URIRef(NAME), Literal(f'name {i}')))
+        if i == 3:
+            graph.add((subject, URIRef(PREF_LABEL), Literal('preferred')))
+    graph.add((URIRef('http://example.org/id/z'), URIRef(ABOUT), URIRef(HUB)))
+    return graph
+
+
+def test_counts_and_capped_samples(graph, monkeypatch):
+    monkeypatch.setattr(config, "MAX_INVERSE_SUBJECTS", 5)
+    monkeypatch.setattr(config, "RDF_DATA_SOURCE_TYPE", 'sparql')
+
+    relations = prerender_inverse_relations(graph, HUB)
+
+    assert set(relations) == {KNOWS, ABOUT}
+    assert relations[KNOWS]['total_count'] == 8
+    assert len(relations[KNOWS]['subjects']) == 5
+    assert 'yasgui_url' in relations[KNOWS] and 'page_url' in relations[KNOWS]
+    assert relations[ABOUT] == {
+        'subjects': [{'uri': 'http://example.org/id/z', 'label': ''}],
+        'total_count': 1
+    }
+
+
+def test_yasgui_is_only_linked_in_sparql_mode(graph, monkeypatch):
+    monkeypatch.setattr(config, "MAX_INVERSE_SUBJECTS", 5)
+    monkeypatch.setattr(config, "RDF_DATA_SOURCE_TYPE", 'turtlefiles')
+
+    relations = prerender_inverse_relations(graph, HUB)
+
+    assert 'yasgui_url' not in relations[KNOWS]
+    assert relations[KNOWS]['page_url'].startswith('/' + config.INVERSE_RELATIONS_API_PAGE.strip('/') + '?')
+
+
+def test_labels_follow_label_predicate_order(graph, monkeypatch):
+    """
+    Test that a subject's label comes from the first matching predicate in config.LABEL_PREDICATES.
+    """
+    monkeypatch.setattr(config, "MAX_INVERSE_SUBJECTS", 10)
+
+    relations = prerender_inverse_relations(graph, HUB)
+
+    labels = {subject['uri']: subject['label'] for subject in relations[KNOWS]['subjects']}
+    assert labels['http://example.org/id/s3'] == 'preferred'
+    assert labels['http://example.org/id/s0'] == 'name 0'
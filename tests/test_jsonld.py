@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import json
+import pytest
+from rdflib import Graph
+from rdflib.compare import isomorphic
+
+import config
+from streaming_serializers import jsonld, JSONLDContext, load_context_file
+
+DATA = """
+@prefix schema: <http://schema.org/> .
+<https://example.org/id/a> a schema:Person, <https://example.org/def/Author> ;
+    schema:name "A \\"quoted\\"\\nsecond line", "A"@nl ;
+    schema:birthDate "1900-01-01"^^<http://www.w3.org/2001/XMLSchema#date> ;
+    schema:address [ a schema:PostalAddress ; schema:streetAddress "Main street 1" ] ;
+    schema:url <https://example.org/a.html>, <http://schema.org/> .
+<https://example.org/id/b> schema:knows <https://example.org/id/a> .
+"""
+
+STATIC_CONTEXT = {
+    '@language': 'en',
+    'name': 'schema:name',
+    'Person': {'@id': 'http://schema.org/Person'},
+    'url': {'@id': 'http://schema.org/url', '@type': '@id'},
+}
+
+@pytest.fixture
+def graph():
+    return Graph().parse(data=DATA, format='turtle')
+
+def parse(chunks):
+    return Graph().parse(data=''.join(chunks), format='json-ld')
+
+def test_equivalent_to_rdflib_output(graph):
+    rdflib_output = Graph().parse(data=graph.serialize(format='json-ld'), format='json-ld')
+    assert isomorphic(parse(jsonld(graph)), rdflib_output)
+
+def test_compacted_with_namespaces(graph):
+    document = json.loads(''.join(jsonld(graph, JSONLDContext({'schema': 'http://schema.org/'}))))
+    assert document['@context'] == {'schema': 'http://schema.org/'}
+    node = next(node for node in document['@graph'] if node['@id'] == 'https://example.org/id/b')
+    assert node == {'@id': 'https://example.org/id/b', 'schema:knows': {'@id': 'https://example.org/id/a'}}
+
+def test_static_context_terms(graph, tmp_path):
+    path = tmp_path / 'context.jsonld'
+    path.write_text(json.dumps({'@context': STATIC_CONTEXT}))
+    context = JSONLDContext({'schema': 'http://schema.org/'}, load_context_file(str(path)))
+    output = ''.join(jsonld(graph, context))
+    node = next(node for node in json.loads(output)['@graph'] if node['@id'] == 'https://example.org/id/a')
+    assert 'Person' in node['@type'] and 'name' in node
+    # Coerced terms are not used, and plain strings don't pick up the default language
+    assert 'url' not in node
+    assert isomorphic(parse([output]), graph)
+
+def test_configured_context_file(graph, tmp_path, monkeypatch):
+    path = tmp_path / 'context.json'
+    path.write_text(json.dumps(STATIC_CONTEXT))
+    monkeypatch.setattr(config, 'JSONLD_CONTEXT_FILE', str(path))
+    assert json.loads(''.join(jsonld(graph)))['@context']['name'] == 'schema:name'
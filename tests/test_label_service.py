@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import pytest
+
+from label_service import LabelService
+
+LABELS = {'https://example.org/id/a': 'A', 'https://example.org/id/b': 'B'}
+
+
+class CountingLookup:
+    """Label lookup answering from LABELS and recording every batch"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, uris):
+        self.batches.append(list(uris))
+        if self.fail:
+            raise RuntimeError('endpoint down')
+        return {uri: LABELS[uri] for uri in uris if uri in LABELS}
+
+
+def test_labels_are_looked_up_once_in_one_batch():
+    lookup = CountingLookup()
+    service = LabelService(lookup, 100, 60, 100)
+    uris = ['https://example.org/id/a', 'https://example.org/id/b', 'https://example.org/id/c']
+    assert service.get_labels(uris) == LABELS
+    assert service.get_labels(uris) == LABELS
+    # Also the unlabelled URI is answered from the cache the second time
+    assert lookup.batches == [uris]
+
+
+def test_failed_lookups_are_not_cached():
+    lookup = CountingLookup(fail=True)
+    service = LabelService(lookup, 100, 60, 100)
+    assert service.get_labels(['https://example.org/id/a']) == {}
+    lookup.fail = False
+    assert service.get_labels(['https://example.org/id/a']) == {'https://example.org/id/a': 'A'}
+    assert len(lookup.batches) == 2
+
+
+def test_lookup_is_bounded_and_expires():
+    lookup = CountingLookup()
+    service = LabelService(lookup, 100, 0, 1)
+    assert service.get_labels(['https://example.org/id/a', 'https://example.org/id/b']) == {'https://example.org/id/a': 'A'}
+    service.get_labels(['https://example.org/id/a'])
+    assert lookup.batches == [['https://example.org/id/a'], ['https://example.org/id/a']]
@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import time
+import pytest
+from rdflib import Graph
+
+import app as app_module
+import config
+from metrics import MetricsStore, render_metrics
+from rdf_sources.rdf_source import RDFSource
+
+TURTLE = '<http://example.org/id/a> <http://schema.org/name> "A" .'
+
+class StaticSource(RDFSource):
+    def get_rdf_for_uri(self, id_uri, page_uri=None):
+        return Graph().parse(data=TURTLE, format='turtle')
+
+    def get_inverse_relations_graph(self, id_uri):
+        return Graph()
+
+def test_totals_are_merged_over_processes(tmp_path):
+    # Two stores on one database stand in for two worker processes
+    path = str(tmp_path / 'metrics.sqlite')
+    first, second = MetricsStore(path), MetricsStore(path)
+    first.inc('ldview_requests_total', route='resource', status=200)
+    second.inc('ldview_requests_total', route='resource', status=200)
+    first.observe('ldview_stage_duration_seconds', 0.02, stage='fetch')
+    second.observe('ldview_stage_duration_seconds', 3.0, stage='fetch')
+    first.flush()
+
+    samples = {(name, labels): value for name, labels, value in second.samples()}
+    assert samples[('ldview_requests_total', 'route="resource",status="200"')] == 2
+    assert samples[('ldview_stage_duration_seconds_bucket', 'stage="fetch",le="0.025"')] == 1
+    assert samples[('ldview_stage_duration_seconds_bucket', 'stage="fetch",le="+Inf"')] == 2
+    assert samples[('ldview_stage_duration_seconds_count', 'stage="fetch"')] == 2
+
+    text = render_metrics(second.samples())
+    assert '# TYPE ldview_stage_duration_seconds histogram' in text
+    buckets = [line for line in text.splitlines() if line.startswith('ldview_stage_duration_seconds_bucket')]
+    assert buckets[0].startswith('ldview_stage_duration_seconds_bucket{stage="fetch",le="0.005"}')
+    assert buckets[-1] == 'ldview_stage_duration_seconds_bucket{stage="fetch",le="+Inf"} 2'
+
+def test_idle_workers_flush_in_the_background(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite')
+    worker, scraper = MetricsStore(path), MetricsStore(path)
+    worker.FLUSH_INTERVAL = 0.05
+    worker.inc('ldview_requests_total', route='resource', status=200)
+
+    # No further requests in the worker: its flusher adds the count to the totals
+    time.sleep(0.5)
+    assert scraper.samples() == [('ldview_requests_total', 'route="resource",status="200"', 1)]
+
+def test_server_timing_and_metrics_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'USE_SEMANTIC_REDIRECTS', False)
+    monkeypatch.setattr(config, 'BASE_URI', 'http://example.org/')
+    monkeypatch.setattr(app_module, 'rdf_source', StaticSource())
+    monkeypatch.setattr(app_module, 'metrics_store', MetricsStore(str(tmp_path / 'metrics.sqlite')))
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        response = client.get('/id/a', headers={'Accept': 'text/html'})
+        stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+        assert stages[0] == 'fetch' and 'render' in stages
+
+        metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'ldview_requests_total{route="resource",status="200"} 1' in metrics
+    assert 'ldview_graph_triples_count 1' in metrics
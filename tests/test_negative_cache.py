@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import time
+import pytest
+from rdflib import Graph, URIRef, Literal
+
+from rdf_sources.rdf_source import RDFSource, ResourceNotFound
+from rdf_sources.cache_store import CacheStore
+from rdf_sources.cached_source import CachedRDFSource
+from rdf_sources.negative_cache import NegativeCachedRDFSource
+
+
+class CountingSource(RDFSource):
+    """RDF source knowing only URIs ending in 'found', counting the lookups"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_rdf_for_uri(self, id_uri, page_uri=None):
+        self.calls += 1
+        if not id_uri.endswith('found'):
+            raise ResourceNotFound(id_uri)
+        graph = Graph()
+        graph.add((URIRef(id_uri), URIRef('http://schema.org/name'), Literal('Found')))
+        return graph
+
+    def get_inverse_relations_graph(self, id_uri):
+        return Graph()
+
+
+def lookup_missing(source, uri):
+    with pytest.raises(ResourceNotFound) as error:
+        source.get_rdf_for_uri(uri)
+    return str(error.value)
+
+
+def test_repeated_misses_skip_the_source():
+    source = CountingSource()
+    negative = NegativeCachedRDFSource(source, size=10, ttl=60)
+
+    assert not negative.is_missing('http://example.org/id/x')
+    for _ in range(3):
+        assert lookup_missing(negative, 'http://example.org/id/x') == 'http://example.org/id/x'
+    assert source.calls == 1
+    assert negative.is_missing('http://example.org/id/x')
+
+
+def test_found_resources_are_not_remembered():
+    source = CountingSource()
+    negative = NegativeCachedRDFSource(source, size=10, ttl=60)
+
+    for _ in range(2):
+        negative.get_rdf_for_uri('http://example.org/id/found')
+    assert source.calls == 2
+    assert not negative.is_missing('http://example.org/id/found')
+
+
+def test_misses_expire_and_are_bounded():
+    source = CountingSource()
+    negative = NegativeCachedRDFSource(source, size=2, ttl=0.1)
+
+    lookup_missing(negative, 'http://example.org/id/x')
+    time.sleep(0.15)
+    assert not negative.is_missing('http://example.org/id/x')
+    lookup_missing(negative, 'http://example.org/id/x')
+    assert source.calls == 2
+
+    negative.ttl = 60
+    for uri in ['http://example.org/id/y', 'http://example.org/id/z', 'http://example.org/id/w']:
+        lookup_missing(negative, uri)
+    # The least recently used miss made room
+    assert not negative.is_missing('http://example.org/id/y')
+    assert negative.is_missing('http://example.org/id/w')
+
+
+def test_misses_are_shared_through_the_graph_cache(tmp_path):
+    """
+    Test that a miss found by one worker is answered from the graph cache in another.
+    """
+    path = str(tmp_path / 'cache.sqlite')
+    first, second = CountingSource(), CountingSource()
+    workers = [CachedRDFSource(source, CacheStore(path, 1024 * 1024), ttl=60, stale_ttl=60, missing_ttl=60)
+               for source in (first, second)]
+
+    assert lookup_missing(workers[0], 'http://example.org/id/x') == 'http://example.org/id/x'
+    assert lookup_missing(workers[1], 'http://example.org/id/x') == 'http://example.org/id/x'
+    assert (first.calls, second.calls) == (1, 0)
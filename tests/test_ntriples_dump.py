@@ -0,0 +1,104 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import time
+import pytest
+from rdflib import URIRef, BNode, Literal
+
+import config
+from rdf_sources.ntriples_dump import NTriplesDump
+from rdf_sources.rdf_source import ResourceNotFound
+
+EX = 'https://example.org/id/'
+NAME = URIRef('http://schema.org/name')
+ADDRESS = URIRef('http://schema.org/address')
+
+DUMP = f"""<{EX}a> <{NAME}> "A" .
+<{EX}a> <{ADDRESS}> _:addr .
+<{EX}b> <{NAME}> "B" .
+_:addr <http://schema.org/geo> <{EX}.well-known/genid/g1> .
+_:addr <http://schema.org/streetAddress> "Main street 1" .
+<{EX}.well-known/genid/g1> <http://schema.org/latitude> "52.1" .
+<{EX}a> <http://schema.org/sameAs> <{EX}b> .
+"""
+
+def test_lookup_with_blank_node_expansion(tmp_path):
+    dump = tmp_path / 'dump.nt'
+    dump.write_text(DUMP)
+    source = NTriplesDump(str(dump))
+
+    graph = source.get_rdf_for_uri(EX + 'a')
+    assert len(graph) == 6
+    address = graph.value(URIRef(EX + 'a'), ADDRESS)
+    assert isinstance(address, BNode)
+    assert graph.value(address, URIRef('http://schema.org/streetAddress')) == Literal('Main street 1')
+    assert (URIRef(EX + 'b'), NAME, Literal('B')) not in graph
+
+    with pytest.raises(ResourceNotFound):
+        source.get_rdf_for_uri(EX + 'c')
+
+    assert source.get_labels([EX + 'a', EX + 'b', EX + 'c']) == {EX + 'a': 'A', EX + 'b': 'B'}
+
+def test_index_is_rebuilt_when_the_dump_changes(tmp_path):
+    dump = tmp_path / 'dump.nq'
+    dump.write_text(f'<{EX}a> <{NAME}> "A" <{EX}graph> .\n')
+    source = NTriplesDump(str(dump))
+    assert source.get_rdf_for_uri(EX + 'a').value(URIRef(EX + 'a'), NAME) == Literal('A')
+
+    dump.write_text(f'<{EX}c> <{NAME}> "C" <{EX}graph> .\n<{EX}a> <{NAME}> "A2" <{EX}graph> .\n')
+    source = NTriplesDump(str(dump))
+    assert source.get_rdf_for_uri(EX + 'a').value(URIRef(EX + 'a'), NAME) == Literal('A2')
+
+def test_home_page_lists_resources_of_the_home_page_type(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'BASE_URI', EX)
+    dump = tmp_path / 'dump.nt'
+    dump.write_text(DUMP + f'<{EX}b> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://schema.org/Dataset> .\n')
+    source = NTriplesDump(str(dump), home_page_type='http://schema.org/Dataset', home_page_predicates=[str(NAME)])
+
+    assert set(source.get_rdf_for_uri(EX)) == {(URIRef(EX + 'b'), NAME, Literal('B'))}
+
+    without_home_page = NTriplesDump(str(dump), str(tmp_path / 'other.sqlite'))
+    with pytest.raises(ResourceNotFound):
+        without_home_page.get_rdf_for_uri(EX)
+
+def test_replaced_dump_is_reindexed_in_the_background(tmp_path):
+    dump = tmp_path / 'dump.nt'
+    dump.write_text(f'<{EX}a> <{NAME}> "A" .\n')
+    source = NTriplesDump(str(dump))
+    assert source.get_labels([EX + 'a']) == {EX + 'a': 'A'}
+
+    replacement = tmp_path / 'dump.nt.new'
+    replacement.write_text(f'<{EX}c> <{NAME}> "C" .\n<{EX}a> <{NAME}> "A2" .\n')
+    os.replace(replacement, dump)
+
+    # The lookup that notices the change is answered from the old dump, while the new one is indexed
+    assert source.get_rdf_for_uri(EX + 'a').value(URIRef(EX + 'a'), NAME) in (Literal('A'), Literal('A2'))
+    for _ in range(100):
+        if source.get_labels([EX + 'a', EX + 'c']) == {EX + 'a': 'A2', EX + 'c': 'C'}:
+            break
+        time.sleep(0.05)
+    assert source.get_rdf_for_uri(EX + 'a').value(URIRef(EX + 'a'), NAME) == Literal('A2')
+    assert source.get_labels([EX + 'a', EX + 'c']) == {EX + 'a': 'A2', EX + 'c': 'C'}
+
+def test_lookups_switch_over_when_another_worker_replaced_the_index(tmp_path):
+    dump = tmp_path / 'dump.nt'
+    dump.write_text(f'<{EX}a> <{NAME}> "A" .\n')
+    source = NTriplesDump(str(dump))
+
+    replacement = tmp_path / 'dump.nt.new'
+    replacement.write_text(f'<{EX}c> <{NAME}> "C" .\n<{EX}a> <{NAME}> "A2" .\n')
+    os.replace(replacement, dump)
+    # Another worker indexes the new dump first; this one hasn't looked at the dump since
+    NTriplesDump(str(dump))
+    source._reopen_lock.acquire()
+
+    # A thread without a connection must not read the old mapping with the new index
+    assert source.get_labels([EX + 'a', EX + 'c']) == {EX + 'a': 'A2', EX + 'c': 'C'}
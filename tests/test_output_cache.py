@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import gzip
+import pytest
+from rdflib import Graph
+from rdflib.compare import isomorphic
+from werkzeug.datastructures import Accept
+
+from content_negotiation import ContentNegotiator
+from output_cache import OutputCache
+from rdf_sources.cache_store import CacheStore
+
+TURTLE = """
+<https://example.org/id/a> <http://schema.org/name> "A" ;
+    <http://schema.org/knows> <https://example.org/id/b> .
+"""
+PARENT = 'graph https://example.org/id/a https://example.org/id/a'
+GZIP = Accept([('gzip', 1), ('deflate', 1)])
+IDENTITY = Accept([])
+
+@pytest.fixture
+def store(tmp_path):
+    store = CacheStore(str(tmp_path / 'cache.sqlite'), 1024 * 1024)
+    store.set(PARENT, b'graph', 60, 60)
+    return store
+
+def turtle_response(cache, graph, accept_encodings):
+    return cache.response(graph, ContentNegotiator.FORMATS['turtle'], 'digest', accept_encodings, PARENT)
+
+def test_serialization_is_stored_with_compressed_variant(store):
+    graph = Graph().parse(data=TURTLE, format='turtle')
+    cache = OutputCache(store, 60, 1024 * 1024, ['gzip'])
+
+    first = turtle_response(cache, graph, GZIP)
+    assert first.is_streamed and 'Content-Encoding' not in first.headers
+    body = first.get_data()
+
+    second = turtle_response(cache, Graph(), GZIP)
+    assert second.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in second.vary
+    assert gzip.decompress(second.get_data()) == body
+    assert turtle_response(cache, Graph(), IDENTITY).get_data() == body
+    assert isomorphic(Graph().parse(data=body, format='turtle'), graph)
+
+def test_serializer_configuration_is_part_of_the_key(store):
+    graph = Graph().parse(data=TURTLE, format='turtle')
+    turtle_response(OutputCache(store, 60, 1024 * 1024, ['gzip'], 'prefixes-1'), graph, GZIP).get_data()
+
+    # After a prefix change the graph is serialized again instead of served from the cache
+    response = turtle_response(OutputCache(store, 60, 1024 * 1024, ['gzip'], 'prefixes-2'), graph, GZIP)
+    assert response.is_streamed and 'Content-Encoding' not in response.headers
+
+def test_variants_are_removed_with_graph(store):
+    cache = OutputCache(store, 60, 1024 * 1024, ['gzip'])
+    turtle_response(cache, Graph().parse(data=TURTLE, format='turtle'), GZIP).get_data()
+    assert store.stats()['entries'] == 3
+
+    store.delete(PARENT)
+    assert store.stats()['entries'] == 0
+
+def test_large_serialization_is_not_stored(store):
+    cache = OutputCache(store, 60, 10, ['gzip'])
+    turtle_response(cache, Graph().parse(data=TURTLE, format='turtle'), GZIP).get_data()
+    assert store.stats()['entries'] == 1
+
+def test_unavailable_encodings_are_skipped(store):
+    cache = OutputCache(store, 60, 1024 * 1024, ['compress', 'gzip'])
+    assert cache.encodings == ['gzip']
+    assert cache.select_encoding(Accept([('compress', 1)])) is None
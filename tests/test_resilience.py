@@ -0,0 +1,252 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from rdflib import Graph, URIRef, Literal
+
+import app as app_module
+import config
+import deadline
+from rdf_sources.rdf_source import RDFSource
+from rdf_sources.cache_store import CacheStore
+from rdf_sources.cached_source import CachedRDFSource
+from rdf_sources.circuit_breaker import CircuitBreaker, CircuitOpen
+from rdf_sources.sparql_endpoint import SPARQLEndpoint
+
+
+class FlakySource(RDFSource):
+    """RDF source that fails while its 'down' flag is set"""
+
+    def __init__(self):
+        self.down = False
+
+    def get_rdf_for_uri(self, id_uri, page_uri=None):
+        if self.down:
+            raise CircuitOpen("Circuit open after repeated failures", 30)
+        graph = Graph()
+        graph.add((URIRef(id_uri), URIRef('http://schema.org/name'), Literal('A')))
+        return graph
+
+    def get_inverse_relations_graph(self, id_uri):
+        if self.down:
+            raise CircuitOpen("Circuit open after repeated failures", 30)
+        return Graph()
+
+
+class SlowEndpoint(BaseHTTPRequestHandler):
+    """SPARQL endpoint that answers after a second"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(1)
+        body = b'{"head": {"vars": []}, "results": {"bindings": []}}'
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/sparql-results+json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fail(breaker):
+    with pytest.raises(ValueError):
+        with breaker.call():
+            raise ValueError("down")
+
+
+def test_breaker_opens_after_consecutive_failures_and_recovers():
+    breaker = CircuitBreaker(failures=3, slow_call=10, reset_timeout=0.2)
+    fail(breaker)
+    fail(breaker)
+    with breaker.call():
+        pass
+    for _ in range(3):
+        fail(breaker)
+
+    with pytest.raises(CircuitOpen) as error:
+        with breaker.call():
+            pytest.fail("called while open")
+    assert error.value.retry_after >= 1
+
+    # One failed trial call reopens the circuit, a successful one closes it
+    time.sleep(0.25)
+    fail(breaker)
+    assert breaker.is_open
+    time.sleep(0.25)
+    with breaker.call():
+        pass
+    assert not breaker.is_open
+
+
+def test_breaker_counts_slow_calls_and_ignores_other_errors():
+    breaker = CircuitBreaker(failures=2, slow_call=0.05, reset_timeout=30)
+    with pytest.raises(KeyError):
+        with breaker.call(lambda e: not isinstance(e, KeyError)):
+            raise KeyError("not a failure of the service")
+    for _ in range(2):
+        with breaker.call():
+            time.sleep(0.06)
+    assert breaker.is_open
+
+
+def neutral(breaker):
+    with pytest.raises(KeyError):
+        with breaker.call(lambda e: not isinstance(e, KeyError)):
+            raise KeyError("cut short by the caller")
+
+
+def test_errors_that_are_no_failures_dont_reset_the_count():
+    breaker = CircuitBreaker(failures=2, slow_call=10, reset_timeout=30)
+    fail(breaker)
+    neutral(breaker)
+    fail(breaker)
+    assert breaker.is_open
+
+
+def test_only_the_trial_call_settles_a_half_open_circuit():
+    breaker = CircuitBreaker(failures=1, slow_call=10, reset_timeout=0.1)
+    earlier = breaker.call(lambda e: False)
+    earlier.__enter__()
+    fail(breaker)
+    time.sleep(0.15)
+    trial = breaker.call(lambda e: False)
+    trial.__enter__()
+
+    # A call started before the circuit opened ends: the trial is still running
+    assert earlier.__exit__(KeyError, KeyError("cut short"), None) is False
+    with pytest.raises(CircuitOpen):
+        with breaker.call():
+            pytest.fail("called during the trial")
+
+    # A trial cut short leaves the circuit open for the next trial call
+    assert trial.__exit__(KeyError, KeyError("cut short"), None) is False
+    assert breaker.is_open
+    with breaker.call():
+        pass
+    assert not breaker.is_open
+
+
+def test_queries_end_at_the_request_deadline(monkeypatch):
+    monkeypatch.setattr(config, 'SPARQL_BREAKER_FAILURES', 0)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowEndpoint)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        endpoint = SPARQLEndpoint(f"http://127.0.0.1:{server.server_port}/sparql", 'http://example.org/')
+        token = deadline.start(0.3)
+        try:
+            start = time.monotonic()
+            with pytest.raises(Exception):
+                endpoint.query('SELECT * WHERE { ?s ?p ?o }')
+            assert time.monotonic() - start < 0.9
+            time.sleep(0.3)
+            # No time left: the query isn't sent at all
+            with pytest.raises(deadline.DeadlineExceeded):
+                endpoint.query('SELECT * WHERE { ?s ?p ?o }')
+        finally:
+            deadline.end(token)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_optional_calls_are_refused_but_not_counted():
+    breaker = CircuitBreaker(failures=1, slow_call=10, reset_timeout=0.1)
+    breaker.check()
+    fail(breaker)
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    # Half open: an optional call is still refused and leaves the trial to a real call
+    time.sleep(0.15)
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    with breaker.call():
+        pass
+    breaker.check()
+
+
+def test_short_query_timeouts_dont_open_the_breaker(monkeypatch):
+    monkeypatch.setattr(config, 'SPARQL_BREAKER_FAILURES', 1)
+    monkeypatch.setattr(config, 'SPARQL_BREAKER_SLOW_CALL', 5.0)
+    monkeypatch.setattr(config, 'LABEL_LOOKUP_TIMEOUT', 0.2)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowEndpoint)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        endpoint = SPARQLEndpoint(f"http://127.0.0.1:{server.server_port}/sparql", 'http://example.org/')
+        # A read timeout shorter than the slow call threshold, e.g. at the end of the request deadline
+        with pytest.raises(Exception):
+            endpoint.query('SELECT * WHERE { ?s ?p ?o }', read_timeout=0.2)
+        # A timed out optional query
+        with pytest.raises(Exception):
+            endpoint.get_labels(['http://example.org/id/a'])
+        assert not endpoint.breaker.is_open
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_expired_graphs_are_kept_for_the_fallback(tmp_path):
+    source = FlakySource()
+    cached = CachedRDFSource(source, CacheStore(str(tmp_path / 'cache.sqlite'), 1024 * 1024), ttl=0.05, stale_ttl=0,
+                             missing_ttl=60)
+    cached.get_rdf_for_uri('http://example.org/id/a')
+    time.sleep(0.1)
+    source.down = True
+
+    with pytest.raises(CircuitOpen):
+        cached.get_rdf_for_uri('http://example.org/id/a')
+    assert len(cached.get_stale_rdf_for_uri('http://example.org/id/a')) == 1
+    assert cached.get_stale_rdf_for_uri('http://example.org/id/b') is None
+
+
+@pytest.fixture
+def flaky_client(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'USE_SEMANTIC_REDIRECTS', False)
+    monkeypatch.setattr(config, 'BASE_URI', 'http://example.org/')
+    source = FlakySource()
+    cached = CachedRDFSource(source, CacheStore(str(tmp_path / 'cache.sqlite'), 1024 * 1024), ttl=0, stale_ttl=0)
+    monkeypatch.setattr(app_module, 'rdf_source', cached)
+    monkeypatch.setattr(app_module, 'label_service', None)
+    app_module.app.config['TESTING'] = True
+    with app_module.app.test_client() as client:
+        yield client, source
+
+
+def test_failing_source_serves_last_cached_graph(flaky_client):
+    client, source = flaky_client
+    assert client.get('/id/a').status_code == 200
+    source.down = True
+
+    response = client.get('/id/a')
+    assert response.status_code == 200
+    assert b'stale-notice' in response.data
+    assert response.headers['Cache-Control'] == config.CACHE_CONTROL['stale']
+
+    response = client.get('/id/a?format=nt')
+    assert response.status_code == 200
+    assert b'<http://example.org/id/a>' in response.data
+    assert response.headers['Cache-Control'] == config.CACHE_CONTROL['stale']
+
+
+def test_failing_source_without_cached_graph_gives_503(flaky_client):
+    client, source = flaky_client
+    source.down = True
+    response = client.get('/id/b')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
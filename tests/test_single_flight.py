@@ -0,0 +1,142 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from rdflib import Graph, URIRef, Literal
+
+from rdf_sources.rdf_source import RDFSource, ResourceNotFound
+from rdf_sources.single_flight import SingleFlightRDFSource
+from rdf_sources.cache_store import CacheStore
+from rdf_sources.cached_source import CachedRDFSource
+import deadline
+
+
+class SlowSource(RDFSource):
+    """RDF source that takes a while to answer and counts the lookups"""
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get_rdf_for_uri(self, id_uri, page_uri=None):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.2)
+        if id_uri.endswith('missing'):
+            raise ResourceNotFound(id_uri)
+        graph = Graph()
+        graph.add((URIRef(id_uri), URIRef('http://schema.org/name'), Literal('A')))
+        return graph
+
+    def get_inverse_relations_graph(self, id_uri):
+        return Graph()
+
+
+def test_concurrent_lookups_share_one_fetch():
+    source = SlowSource()
+    coalesced = SingleFlightRDFSource(source)
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        graphs = list(executor.map(lambda _: coalesced.get_rdf_for_uri('http://example.org/id/a'), range(10)))
+
+    assert source.calls == 1
+    assert all(graph is graphs[0] for graph in graphs)
+
+
+def test_concurrent_lookups_share_not_found():
+    source = SlowSource()
+    coalesced = SingleFlightRDFSource(source)
+
+    def lookup(_):
+        with pytest.raises(ResourceNotFound):
+            coalesced.get_rdf_for_uri('http://example.org/id/missing')
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        list(executor.map(lookup, range(5)))
+    assert source.calls == 1
+
+
+def test_workers_wait_for_each_other_through_the_cache(tmp_path):
+    """
+    Test that caches in separate workers (simulated by separate stores on the same file)
+    fetch a missing graph only once.
+    """
+    source = SlowSource()
+    path = str(tmp_path / 'cache.sqlite')
+    workers = [CachedRDFSource(source, CacheStore(path, 1024 * 1024), ttl=60, stale_ttl=60, fill_timeout=5) for _ in range(4)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda worker: worker.get_rdf_for_uri('http://example.org/id/a'), workers))
+
+    assert source.calls == 1
+
+
+def test_workers_waiting_for_a_missing_graph_share_not_found(tmp_path):
+    """
+    Test that workers waiting for another worker are answered with its ResourceNotFound,
+    without remembering the miss for later lookups (missing_ttl is 0).
+    """
+    source = SlowSource()
+    path = str(tmp_path / 'cache.sqlite')
+    workers = [CachedRDFSource(source, CacheStore(path, 1024 * 1024), ttl=60, stale_ttl=60, fill_timeout=5) for _ in range(4)]
+
+    def lookup(worker):
+        with pytest.raises(ResourceNotFound):
+            worker.get_rdf_for_uri('http://example.org/id/missing')
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lookup, workers))
+    assert source.calls == 1
+
+    lookup(workers[0])
+    assert source.calls == 2
+
+
+def test_waiting_for_another_lookup_ends_at_the_request_deadline():
+    source = SlowSource()
+    coalesced = SingleFlightRDFSource(source)
+
+    def lookup_with_deadline(seconds):
+        token = deadline.start(seconds)
+        try:
+            return coalesced.get_rdf_for_uri('http://example.org/id/a')
+        finally:
+            deadline.end(token)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(lookup_with_deadline, 0)
+        time.sleep(0.05)
+        start = time.monotonic()
+        with pytest.raises(deadline.DeadlineExceeded):
+            lookup_with_deadline(0.05)
+        assert time.monotonic() - start < 0.15
+        assert len(leader.result()) == 1
+
+
+def test_waiting_for_another_worker_ends_at_the_request_deadline(tmp_path):
+    source = SlowSource()
+    store = CacheStore(str(tmp_path / 'cache.sqlite'), 1024 * 1024)
+    worker = CachedRDFSource(source, store, ttl=60, stale_ttl=60, fill_timeout=15)
+
+    # Another worker holds the fill lock far longer than the request may take
+    with store.fill_lock('graph http://example.org/id/a http://example.org/id/a', 1):
+        token = deadline.start(0.1)
+        try:
+            start = time.monotonic()
+            graph = worker.get_rdf_for_uri('http://example.org/id/a')
+        finally:
+            deadline.end(token)
+    # The wait ends at the deadline, then the graph is fetched directly
+    assert time.monotonic() - start < 1
+    assert len(graph) == 1 and source.calls == 1
@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import json
+import threading
+from urllib.parse import parse_qs
+from http.server import HTTPServer, BaseHTTPRequestHandler
+import pytest
+from rdflib import URIRef, Literal
+
+import config
+from rdf_sources.compact_graph import CompactGraph
+from rdf_sources.sparql_endpoint import SPARQLEndpoint, SPARQLEndpointError
+
+EX = 'https://example.org/id/'
+NAME = URIRef('http://schema.org/name')
+
+class FakeEndpoint(BaseHTTPRequestHandler):
+    """Answers every query with the body and content type set on the server"""
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        self.server.query = form['query'][0]
+        self.server.accept = self.headers['Accept']
+        body = self.server.body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', self.server.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = HTTPServer(('127.0.0.1', 0), FakeEndpoint)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def endpoint(server):
+    return SPARQLEndpoint(f"http://127.0.0.1:{server.server_port}/sparql", EX)
+
+def test_ntriples_result_is_streamed_into_compact_graph(server):
+    server.content_type = 'application/n-triples; charset=utf-8'
+    server.body = f'<{EX}a> <{NAME}> "Ä" .\n<{EX}a> <{NAME}> "Ä" .\n<{EX}a> <{NAME}> "B" .\n'
+    graph = endpoint(server).get_rdf_for_uri(EX + 'a')
+    assert server.accept.startswith('application/n-triples')
+    assert isinstance(graph, CompactGraph)
+    assert set(graph.objects(URIRef(EX + 'a'), NAME)) == {Literal('Ä'), Literal('B')}
+
+def test_turtle_result_still_parsed(server):
+    server.content_type = 'text/turtle'
+    server.body = f'<{EX}a> <{NAME}> "A" .'
+    graph = endpoint(server).get_rdf_for_uri(EX + 'a')
+    assert graph.value(URIRef(EX + 'a'), NAME) == Literal('A')
+
+def test_result_over_limit_is_aborted(server, monkeypatch):
+    monkeypatch.setattr(config, 'SPARQL_MAX_TRIPLES', 10)
+    server.content_type = 'application/n-triples'
+    server.body = ''.join(f'<{EX}a> <{NAME}> "{i}" .\n' for i in range(100))
+    source = endpoint(server)
+    with pytest.raises(SPARQLEndpointError):
+        source.get_rdf_for_uri(EX + 'a')
+
+    # The dropped connection is replaced for the next query
+    server.body = f'<{EX}a> <{NAME}> "A" .\n'
+    assert len(source.get_rdf_for_uri(EX + 'a')) == 1
+
+def test_labels_in_one_values_query(server, monkeypatch):
+    monkeypatch.setattr(config, 'LABEL_PREDICATES', ['http://www.w3.org/2004/02/skos/core#prefLabel', str(NAME)])
+    server.content_type = 'application/sparql-results+json'
+    server.body = json.dumps({'results': {'bindings': [
+        {'s': {'value': EX + 'a'}, 'label_pred': {'value': str(NAME)}, 'label': {'value': 'Name'}},
+        {'s': {'value': EX + 'a'}, 'label_pred': {'value': 'http://www.w3.org/2004/02/skos/core#prefLabel'},
+         'label': {'value': 'Preferred'}},
+        {'s': {'value': EX + 'b'}, 'label_pred': {'value': str(NAME)}, 'label': {'value': 'B'}},
+    ]}})
+    labels = endpoint(server).get_labels([EX + 'a', EX + 'b', 'not an <iri>'])
+    assert labels == {EX + 'a': 'Preferred', EX + 'b': 'B'}
+    assert f"<{EX}a> <{EX}b>" in server.query and 'not an' not in server.query
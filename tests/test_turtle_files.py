@@ -0,0 +1,129 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import pytest
+from rdflib import Graph, URIRef, Literal
+
+from rdf_sources.turtle_files import TurtleFiles
+from rdf_sources.rdf_source import ResourceNotFound
+
+BASE_URI = 'https://example.org/id/'
+NAME = URIRef('http://schema.org/name')
+
+def write_resource(directory, name):
+    path = directory / 'person' / 'a.ttl'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f'<{BASE_URI}person/a> <{NAME}> "{name}" .\n')
+    return path
+
+def test_parsed_graph_is_kept_until_the_file_changes(tmp_path):
+    write_resource(tmp_path, 'First')
+    source = TurtleFiles(str(tmp_path), BASE_URI, cache_size=10)
+
+    graph = source.get_rdf_for_uri(BASE_URI + 'person/a')
+    assert source.get_rdf_for_uri(BASE_URI + 'person/a') is graph
+
+    write_resource(tmp_path, 'Second name')
+    graph = source.get_rdf_for_uri(BASE_URI + 'person/a')
+    assert (URIRef(BASE_URI + 'person/a'), NAME, Literal('Second name')) in graph
+
+    with pytest.raises(ResourceNotFound):
+        source.get_rdf_for_uri(BASE_URI + 'person/b')
+
+def test_sidecar_is_loaded_without_parsing(tmp_path, monkeypatch):
+    data = tmp_path / 'data'
+    sidecars = tmp_path / 'sidecars'
+    write_resource(data, 'First')
+    TurtleFiles(str(data), BASE_URI, sidecar_directory=str(sidecars)).get_rdf_for_uri(BASE_URI + 'person/a')
+    assert (sidecars / 'person' / 'a.ttl.graph').exists()
+
+    def no_parsing(*args, **kwargs):
+        raise AssertionError("Turtle parsed despite a current sidecar")
+    with monkeypatch.context() as m:
+        m.setattr(Graph, 'parse', no_parsing)
+        graph = TurtleFiles(str(data), BASE_URI, sidecar_directory=str(sidecars)).get_rdf_for_uri(BASE_URI + 'person/a')
+    assert (URIRef(BASE_URI + 'person/a'), NAME, Literal('First')) in graph
+
+    # An outdated sidecar is replaced
+    write_resource(data, 'Changed')
+    graph = TurtleFiles(str(data), BASE_URI, sidecar_directory=str(sidecars)).get_rdf_for_uri(BASE_URI + 'person/a')
+    assert (URIRef(BASE_URI + 'person/a'), NAME, Literal('Changed')) in graph
+
+class Planted:
+    def __reduce__(self):
+        return (pytest.fail, ("sidecar data was executed",))
+
+def test_planted_sidecar_is_ignored(tmp_path):
+    import pickle
+    data = tmp_path / 'data'
+    sidecars = tmp_path / 'sidecars'
+    path = write_resource(data, 'First')
+    stat = os.stat(path)
+    (sidecars / 'person').mkdir(parents=True)
+    (sidecars / 'person' / 'a.ttl.graph').write_bytes(
+        b'%s %d %d\n' % (TurtleFiles.SIDECAR_MAGIC, stat.st_mtime_ns, stat.st_size) + pickle.dumps(Planted()))
+
+    graph = TurtleFiles(str(data), BASE_URI, sidecar_directory=str(sidecars)).get_rdf_for_uri(BASE_URI + 'person/a')
+    assert (URIRef(BASE_URI + 'person/a'), NAME, Literal('First')) in graph
+
+def test_paths_outside_the_base_directory_are_refused(tmp_path):
+    data = tmp_path / 'data'
+    sidecars = tmp_path / 'sidecars'
+    write_resource(data, 'First')
+    (tmp_path / 'outside.ttl').write_text(f'<{BASE_URI}x> <{NAME}> "Outside" .')
+    source = TurtleFiles(str(data), BASE_URI, sidecar_directory=str(sidecars))
+
+    # As in a request for /id/..%2Foutside
+    with pytest.raises(ResourceNotFound):
+        source.get_rdf_for_uri(BASE_URI + '../outside')
+    assert sorted(os.listdir(tmp_path)) == ['data', 'outside.ttl', 'sidecars']
+    assert os.listdir(sidecars) == []
+
+def test_sidecar_directory_must_be_private(tmp_path):
+    sidecars = tmp_path / 'sidecars'
+    sidecars.mkdir()
+    os.chmod(sidecars, 0o777)
+    with pytest.raises(PermissionError):
+        TurtleFiles(str(tmp_path), BASE_URI, sidecar_directory=str(sidecars))
+
+def test_inverse_relations_from_the_index(tmp_path, monkeypatch):
+    import config
+    from rdf_sources.inverse_index import InverseIndex
+    monkeypatch.setattr(config, 'MAX_INVERSE_SUBJECTS', 1)
+    data = tmp_path / 'data'
+    write_resource(data, 'Person A')
+    (data / 'book').mkdir()
+    for name in ('x', 'y'):
+        (data / 'book' / f'{name}.ttl').write_text(
+            f'<{BASE_URI}book/{name}> <http://schema.org/author> <{BASE_URI}person/a> ;\n'
+            f'    <{NAME}> "Book {name}" .\n'
+        )
+    index = InverseIndex(str(tmp_path / 'inverse.sqlite'), str(data), interval=0)
+    source = TurtleFiles(str(data), BASE_URI, inverse_index=index)
+    assert index.update()
+
+    relations = source.get_inverse_relations(BASE_URI + 'person/a')
+    author = relations['http://schema.org/author']
+    assert author['total_count'] == 2
+    assert author['subjects'] == [{'uri': BASE_URI + 'book/x', 'label': 'Book x'}]
+    assert len(source.get_inverse_relations_graph(BASE_URI + 'person/a')) == 4
+    assert source.get_inverse_subjects(BASE_URI + 'person/a', 'http://schema.org/author', 1, 10) == [
+        {'uri': BASE_URI + 'book/y', 'label': 'Book y'}
+    ]
+    assert source.get_labels([BASE_URI + 'book/x', BASE_URI + 'book/z']) == {BASE_URI + 'book/x': 'Book x'}
+
+    # Removed and changed files are picked up by the next update
+    (data / 'book' / 'x.ttl').unlink()
+    (data / 'book' / 'y.ttl').write_text(f'<{BASE_URI}book/y> <{NAME}> "Book y" .\n')
+    (data / 'person' / 'b.ttl').write_text(f'<{BASE_URI}person/b> <http://schema.org/knows> <{BASE_URI}person/a> .\n')
+    assert index.update()
+    relations = source.get_inverse_relations(BASE_URI + 'person/a')
+    assert list(relations) == ['http://schema.org/knows']
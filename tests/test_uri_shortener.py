@@ -0,0 +1,56 @@
+import sys
+import os
+import json
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import pytest
+from rdflib import URIRef, BNode
+
+import config
+from uri_utils import shorten_uri, PrefixIndex
+
+def test_longest_namespace_wins(monkeypatch):
+    monkeypatch.setattr(config, 'NAMESPACES', {
+        'ex': 'http://example.org/',
+        'exv': 'http://example.org/vocab#',
+    })
+    assert shorten_uri('http://example.org/vocab#name') == {'prefix': 'exv:', 'local': 'name'}
+    assert shorten_uri('http://example.org/thing') == {'prefix': 'ex:', 'local': 'thing'}
+    assert shorten_uri('http://other.org/thing') == {'prefix': '', 'local': 'http://other.org/thing'}
+
+def test_results_are_shared_and_read_only():
+    first = shorten_uri('http://schema.org/name')
+    assert shorten_uri(URIRef('http://schema.org/name')) is first
+    assert first['prefix'] == 'schema:'
+    with pytest.raises(TypeError):
+        first['local'] = 'changed'
+
+def test_blank_nodes_and_non_strings():
+    assert shorten_uri('_:b0') == {'prefix': '', 'local': '_:b0'}
+    node = BNode('x1')
+    assert shorten_uri(node) == {'prefix': '', 'local': 'x1'}
+    assert shorten_uri(42) == {'prefix': '', 'local': '42'}
+
+def test_namespaces_file(monkeypatch, tmp_path):
+    path = tmp_path / 'namespaces.json'
+    path.write_text(json.dumps({
+        'foaf': 'http://xmlns.com/foaf/0.1/',
+        'sdo': 'http://schema.org/',
+    }))
+    monkeypatch.setattr(config, 'NAMESPACES_FILE', str(path))
+    assert shorten_uri('http://xmlns.com/foaf/0.1/name') == {'prefix': 'foaf:', 'local': 'name'}
+    # The configured prefix is kept for a namespace that is also in the file
+    assert shorten_uri('http://schema.org/name') == {'prefix': 'schema:', 'local': 'name'}
+
+def test_prefix_index_scales_to_many_namespaces():
+    namespaces = {f'p{i}': f'http://example.org/ns{i}/' for i in range(5000)}
+    index = PrefixIndex(namespaces)
+    assert index.longest_prefix('http://example.org/ns4321/term') == ('p4321', len('http://example.org/ns4321/'))
+    assert index.longest_prefix('http://example.org/nsx/term') is None
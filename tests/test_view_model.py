@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+venv_lib = os.path.join(os.path.dirname(__file__), '..', 'venv', 'lib')
+for folder in os.listdir(venv_lib):
+    site_packages_path = os.path.join(venv_lib, folder, 'site-packages')
+    if os.path.isdir(site_packages_path):
+         sys.path.insert(0, site_packages_path)
+         break
+
+import pytest
+from rdflib import Graph
+
+from view_model import build_view_model, GraphIndex
+
+ID_URI = 'https://example.org/id/a'
+
+TURTLE = """
+@prefix schema: <http://schema.org/> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+
+<https://example.org/id/a> a schema:Person ;
+    schema:name "A name" ;
+    skos:prefLabel "A preferred" ;
+    rdfs:comment "A comment" ;
+    schema:description "A description" ;
+    schema:image <https://example.org/a.png> ;
+    schema:latitude "52.1" ;
+    schema:longitude "4.3" ;
+    schema:address [ schema:name "Address" ; schema:latitude "51.0" ; schema:longitude "5.0" ] ;
+    schema:knows <https://example.org/id/b> ;
+    schema:alias "nickname" .
+
+<https://example.org/id/b> schema:name "B" .
+"""
+
+
+@pytest.fixture
+def view_model():
+    graph = Graph()
+    graph.parse(data=TURTLE, format='turtle')
+    return build_view_model(graph, ID_URI)
+
+
+def test_subject_order(view_model):
+    subjects, blank_nodes = view_model
+    assert [subject['subject'] for subject in subjects[:2]] == [ID_URI, 'https://example.org/id/b']
+    assert len(blank_nodes) == 1 and subjects[2] is blank_nodes[0]
+    assert blank_nodes[0]['is_blank']
+
+
+def test_main_subject(view_model):
+    main_subject = view_model[0][0]
+    assert main_subject['main_label'] == 'A preferred'
+    assert main_subject['main_description'] == 'A description'
+    assert main_subject['types'] == [{'prefix': 'schema:', 'local': 'Person'}]
+    assert [image['url'] for image in main_subject['images']] == ['https://example.org/a.png']
+    assert sorted(main_subject['coordinates_list'], key=lambda c: c['latitude']) == [
+        {'latitude': 51.0, 'longitude': 5.0, 'label': 'Address'},
+        {'latitude': 52.1, 'longitude': 4.3, 'label': 'A preferred'},
+    ]
+
+
+def test_blank_objects_are_detected_by_term_type(view_model):
+    """
+    Test that only blank node objects are marked as such, not literals that happen to start with 'n'.
+    """
+    triples = [triple for group in view_model[0][0]['predicate_groups'] for triple in group['predicates']]
+    blank_flags = {triple['predicate']: triple['is_blank_object'] for triple in triples}
+    assert blank_flags['http://schema.org/address'] is True
+    assert blank_flags['http://schema.org/alias'] is False
+
+
+def test_relations_to_main_subject(view_model):
+    subjects, blank_nodes = view_model
+    assert subjects[1]['relation_uri'] == 'http://schema.org/knows'
+    assert blank_nodes[0]['relation_uri'] == 'http://schema.org/address'
+    assert blank_nodes[0]['relation_to_main'] == {'prefix': 'schema:', 'local': 'address'}
+
+
+def test_object_labels():
+    graph = Graph()
+    graph.parse(data=TURTLE, format='turtle')
+    index = GraphIndex(graph)
+    # b is labelled in the graph itself, so it isn't looked up
+    assert 'https://example.org/id/b' not in index.linked_uris()
+    assert 'http://schema.org/Person' in index.linked_uris()
+
+    subjects, _ = build_view_model(graph, ID_URI, {'http://schema.org/Person': 'Person'}, index)
+    labels = {triple['object']: triple['object_label']
+              for group in subjects[0]['predicate_groups'] for triple in group['predicates']}
+    assert labels['https://example.org/id/b'] == 'B'
+    assert labels['http://schema.org/Person'] == 'Person'
+    assert labels['nickname'] is None
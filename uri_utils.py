@@ -1,3 +1,6 @@
+import json
+from functools import lru_cache
+from types import MappingProxyType
 import config
 
 def transform_uri(uri, from_pattern, to_pattern):
@@ -21,6 +24,18 @@ def is_yasgui_uri(uri):
     """
     return uri == f"{config.BASE_URI}{config.YASGUI_PAGE}"
 
+def is_inverse_relations_api_uri(uri):
+    """
+    Check if the URI is a request to the inverse relations JSON endpoint
+    """
+    return uri == f"{config.BASE_URI}{config.INVERSE_RELATIONS_API_PAGE}"
+
+def is_metrics_uri(uri):
+    """
+    Check if the URI is a request for the Prometheus metrics
+    """
+    return uri == f"{config.BASE_URI}{config.METRICS_PAGE}"
+
 
 def get_sparql_uri(uri):
     """
@@ -30,23 +45,142 @@ def get_sparql_uri(uri):
         return transform_uri(uri, config.SEMANTIC_REDIRECT_URI_SEGMENTS['documentation'], config.SEMANTIC_REDIRECT_URI_SEGMENTS['identification'])
     return uri
 
+class PrefixIndex:
+    """
+    Longest-prefix index over namespace URIs
+
+    A character trie, so finding the namespace of a URI takes time linear in
+    the length of the URI, however many namespaces are indexed.
+    """
+    __slots__ = ('_root',)
+
+    # Key marking the end of a namespace in a trie node (never a single character)
+    _END = ''
+
+    def __init__(self, namespaces: dict):
+        """
+        Initialize PrefixIndex
+
+        Args:
+            namespaces: Dictionary mapping prefixes to namespace URIs; when two
+                        prefixes share a namespace the last one wins
+        """
+        self._root = {}
+        for prefix, namespace in namespaces.items():
+            if not namespace:
+                continue
+            node = self._root
+            for char in namespace:
+                node = node.setdefault(char, {})
+            node[self._END] = (prefix, len(namespace))
+
+    def longest_prefix(self, uri: str):
+        """
+        Find the longest namespace that the URI starts with
+
+        Returns:
+            tuple: (prefix, length of the namespace), or None when no namespace matches
+        """
+        end = self._END
+        node = self._root
+        match = None
+        for char in uri:
+            node = node.get(char)
+            if node is None:
+                break
+            match = node.get(end, match)
+        return match
+
+class URIShortener:
+    """
+    Memoizing URI shortener over a PrefixIndex
+
+    Results are read-only mappings with 'prefix' and 'local', shared between
+    all callers asking for the same URI.
+    """
+
+    # Longer values (typically literals) are shortened without being memoized
+    MEMO_MAX_LENGTH = 1024
+
+    def __init__(self, namespaces: dict, memo_size: int):
+        """
+        Initialize URIShortener
+
+        Args:
+            namespaces: Dictionary mapping prefixes to namespace URIs
+            memo_size: Maximum number of memoized results
+        """
+        self.index = PrefixIndex(namespaces)
+        self._memoized = lru_cache(maxsize=memo_size)(self._shorten)
+
+    def shorten(self, uri: str):
+        if len(uri) > self.MEMO_MAX_LENGTH:
+            return self._shorten(uri)
+        return self._memoized(uri)
+
+    def _shorten(self, uri: str):
+        if uri.startswith('_:'):
+            return _short_uri('', uri)
+        match = self.index.longest_prefix(uri)
+        if match is None:
+            return _short_uri('', uri)
+        prefix, length = match
+        return _short_uri(prefix + ':', uri[length:])
+
+def _short_uri(prefix: str, local: str):
+    return MappingProxyType({'prefix': prefix, 'local': local})
+
+def load_namespaces_file(path: str) -> dict:
+    """
+    Load a prefix map from a JSON file
+
+    Accepts a plain JSON object mapping prefixes to namespace URIs, as served
+    by prefix.cc, or a JSON-LD document with such a mapping as its @context.
+
+    Args:
+        path: Path of the JSON file
+
+    Returns:
+        dict: Dictionary mapping prefixes to namespace URIs
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data.get('@context'), dict):
+        data = data['@context']
+    return {prefix: namespace for prefix, namespace in data.items()
+            if isinstance(namespace, str) and not prefix.startswith('@')}
+
+_shortener = None
+_shortener_source = (None, None, None)
+
+def get_uri_shortener() -> URIShortener:
+    """Get the URI shortener, rebuilding it only when the namespace configuration is replaced"""
+    global _shortener, _shortener_source
+    namespaces_config, namespaces_file, memo_size = _shortener_source
+    if (_shortener is None or namespaces_config is not config.NAMESPACES
+            or namespaces_file is not config.NAMESPACES_FILE or memo_size is not config.SHORTEN_URI_CACHE_SIZE):
+        namespaces = {}
+        if config.NAMESPACES_FILE:
+            # Configured namespaces take precedence over the ones from the file
+            configured = set(config.NAMESPACES.values())
+            namespaces = {prefix: namespace for prefix, namespace in load_namespaces_file(config.NAMESPACES_FILE).items()
+                          if namespace not in configured}
+        namespaces.update(config.NAMESPACES)
+        _shortener = URIShortener(namespaces, config.SHORTEN_URI_CACHE_SIZE)
+        _shortener_source = (config.NAMESPACES, config.NAMESPACES_FILE, config.SHORTEN_URI_CACHE_SIZE)
+    return _shortener
+
 def shorten_uri(uri):
     """
-    Shorten a URI by using common prefixes, returns dict with prefix and local
+    Shorten a URI by using the longest matching namespace prefix
+
+    Returns:
+        Read-only mapping with 'prefix' and 'local', shared between callers
     """
     if not isinstance(uri, str):
-        return {'prefix': '', 'local': str(uri)}
-    
-    if uri.startswith('_:'):
-        return {'prefix': '', 'local': uri}
-        
-    for prefix, namespace in config.NAMESPACES.items():
-        if uri.startswith(namespace):
-            return {
-                'prefix': prefix + ':',
-                'local': uri[len(namespace):]
-            }
-    return {'prefix': '', 'local': uri}
+        return _short_uri('', str(uri))
+    # Plain str as memo key: rdflib terms hash differently from equal strings
+    return get_uri_shortener().shorten(str(uri))
 
 def page_uri_to_identity_uri(uri):
     """
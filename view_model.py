@@ -0,0 +1,286 @@
+from operator import itemgetter
+from rdflib import Graph, URIRef, BNode, Literal, RDF
+import config
+from uri_utils import shorten_uri
+
+class PredicateTables:
+    """
+    Lookup tables compiled from the predicate lists in config
+
+    Turns the ordered lists into rank maps and the plain lists into sets, so
+    that every per-triple check is a single dictionary or set lookup.
+    """
+    __slots__ = ('group_ranks', 'group_count', 'label_ranks', 'description_ranks',
+                 'image_predicates', 'latitude_predicates', 'longitude_predicates')
+
+    def __init__(self):
+        # Predicate -> (group index, position in group); the first listing wins
+        self.group_ranks = {}
+        for group_index, group in enumerate(config.PREDICATE_GROUPS):
+            for position, pred_uri in enumerate(group):
+                self.group_ranks.setdefault(pred_uri, (group_index, position))
+        self.group_count = len(config.PREDICATE_GROUPS)
+        # Keyed by URIRef, since these are looked up with the terms from the graph
+        self.label_ranks = {}
+        for rank, label_pred in enumerate(config.LABEL_PREDICATES):
+            self.label_ranks.setdefault(URIRef(label_pred), rank)
+        self.description_ranks = {}
+        for rank, description_pred in enumerate(config.DESCRIPTION_PREDICATES):
+            self.description_ranks.setdefault(description_pred, rank)
+        self.image_predicates = frozenset(config.IMAGE_PREDICATES)
+        self.latitude_predicates = frozenset(config.COORDINATE_PREDICATES['latitude'])
+        self.longitude_predicates = frozenset(config.COORDINATE_PREDICATES['longitude'])
+
+_predicate_tables = None
+_predicate_tables_source = ()
+
+def predicate_tables() -> PredicateTables:
+    """Get the compiled predicate tables, recompiling only when a config list is replaced"""
+    global _predicate_tables, _predicate_tables_source
+    source = (config.PREDICATE_GROUPS, config.LABEL_PREDICATES, config.DESCRIPTION_PREDICATES,
+              config.IMAGE_PREDICATES, config.COORDINATE_PREDICATES)
+    if _predicate_tables is None or any(a is not b for a, b in zip(source, _predicate_tables_source)):
+        _predicate_tables = PredicateTables()
+        _predicate_tables_source = source
+    return _predicate_tables
+
+def group_predicates(predicates):
+    """
+    Group predicates according to configuration
+
+    Predicates in config.PREDICATE_GROUPS come first, group by group and in
+    configured order (keeping graph order for equal predicates); the remaining
+    predicates follow in a last group, sorted by predicate URI.
+    """
+    tables = predicate_tables()
+    group_ranks = tables.group_ranks
+    other_group = tables.group_count
+
+    # A single stable sort on (group, position in group), or (last group, URI) for the rest
+    keyed = [(group_ranks.get(p['predicate']) or (other_group, p['predicate']), p) for p in predicates]
+    keyed.sort(key=itemgetter(0))
+
+    result = []
+    current_group = None
+    for key, p in keyed:
+        if key[0] != current_group:
+            current_group = key[0]
+            result.append({'predicates': []})
+        result[-1]['predicates'].append(p)
+    return result
+
+class GraphIndex:
+    """
+    Index of a fetched graph, built in one pass over its triples
+
+    Holds the outgoing (predicate, object) pairs of every subject, in graph
+    order, and the label of every subject chosen by config.LABEL_PREDICATES
+    order, so building the view never has to scan the graph again.
+    """
+    __slots__ = ('subjects', 'labels')
+
+    def __init__(self, graph: Graph):
+        label_ranks = predicate_tables().label_ranks
+        subjects = {}
+        label_candidates = {}
+        for s, p, o in graph:
+            pairs = subjects.get(s)
+            if pairs is None:
+                subjects[s] = [(p, o)]
+            else:
+                pairs.append((p, o))
+
+            rank = label_ranks.get(p)
+            if rank is not None:
+                current = label_candidates.get(s)
+                if current is None or rank < current[0]:
+                    label_candidates[s] = (rank, str(o))
+
+        self.subjects = subjects
+        self.labels = {s: label for s, (rank, label) in label_candidates.items()}
+
+    def linked_uris(self) -> list:
+        """Get the distinct URIs that are objects in the graph and not labelled in it, in graph order"""
+        uris = {}
+        for pairs in self.subjects.values():
+            for p, o in pairs:
+                if isinstance(o, URIRef) and o not in self.labels:
+                    uris[str(o)] = None
+        return list(uris)
+
+    def coordinates(self, node) -> dict:
+        """Get the latitude and longitude given directly on a node, or None if incomplete"""
+        tables = predicate_tables()
+        node_coordinates = {'latitude': None, 'longitude': None}
+        for p, o in self.subjects.get(node, ()):
+            predicate = str(p)
+            if predicate in tables.latitude_predicates:
+                try:
+                    node_coordinates['latitude'] = float(o)
+                except ValueError:
+                    pass
+            elif predicate in tables.longitude_predicates:
+                try:
+                    node_coordinates['longitude'] = float(o)
+                except ValueError:
+                    pass
+        if node_coordinates['latitude'] is None or node_coordinates['longitude'] is None:
+            return None
+        return node_coordinates
+
+def build_subject(index: GraphIndex, subject_node, is_main_subject: bool = False, relation=None,
+                  object_labels: dict = None) -> dict:
+    """
+    Build the view data of one subject from the graph index
+
+    Args:
+        index: Index of the fetched graph
+        subject_node: The subject (URIRef or BNode)
+        is_main_subject: Whether this is the resource being viewed
+        relation: Predicate linking the main subject to this subject, if any
+        object_labels: Labels of linked URIs that are not labelled in the graph itself
+
+    Returns:
+        dict: The subject data as used by view.html
+    """
+    tables = predicate_tables()
+    subject_uri = str(subject_node)
+    predicates = []
+    types = []
+    images = []  # List for image URLs
+    main_description_rank = None  # Rank in config.DESCRIPTION_PREDICATES of the description used
+    main_descriptions = []  # Collect all values for the first matching description predicate
+    coordinates_list = []  # Store list of coordinate pairs
+    current_coordinates = {'latitude': None, 'longitude': None}  # Store coordinates for current subject
+
+    main_label = index.labels.get(subject_node) if is_main_subject else None
+    if object_labels is None:
+        object_labels = {}
+
+    for p, o in index.subjects.get(subject_node, ()):
+        predicate = str(p)
+        obj = str(o)
+
+        if p == RDF.type:
+            types.append(shorten_uri(obj))
+
+        # Check if this is an image predicate
+        if predicate in tables.image_predicates:
+            images.append({
+                'url': obj,
+                'predicate': predicate,
+                'predicate_short': shorten_uri(predicate)
+            })
+            continue
+
+        # Check if this is a coordinate predicate
+        if predicate in tables.latitude_predicates:
+            try:
+                current_coordinates['latitude'] = float(obj)
+            except ValueError:
+                pass
+        elif predicate in tables.longitude_predicates:
+            try:
+                current_coordinates['longitude'] = float(obj)
+            except ValueError:
+                pass
+
+        # If we have a complete coordinate pair, add it to the list
+        if current_coordinates['latitude'] is not None and current_coordinates['longitude'] is not None:
+            if is_main_subject:
+                current_coordinates['label'] = main_label
+            coordinates_list.append(current_coordinates)
+            current_coordinates = {'latitude': None, 'longitude': None}  # Reset for next pair
+
+        is_blank_object = isinstance(o, BNode)
+
+        # For blank nodes, check if they contain coordinates
+        if is_blank_object:
+            blank_coordinates = index.coordinates(o)
+            if blank_coordinates is not None:
+                blank_coordinates['label'] = index.labels.get(o)
+                coordinates_list.append(blank_coordinates)
+
+        # For main subject, collect all values for the first matching description predicate
+        rank = tables.description_ranks.get(predicate) if is_main_subject else None
+        if rank is not None:
+            if main_description_rank is None or rank < main_description_rank:
+                main_description_rank = rank
+                main_descriptions = [obj]
+            elif rank == main_description_rank:
+                main_descriptions.append(obj)
+
+        # For all predicates, include in the table
+        predicates.append({
+            'predicate': predicate,
+            'predicate_short': shorten_uri(predicate),
+            'object': obj,
+            'object_short': shorten_uri(obj),
+            'object_label': None if isinstance(o, Literal) else index.labels.get(o) or object_labels.get(obj),
+            'is_blank_object': is_blank_object
+        })
+
+    # Combine all descriptions for the first matching predicate into a single string
+    main_description = ' '.join(main_descriptions) if main_descriptions else None
+
+    return {
+        'subject': subject_uri,
+        'subject_short': shorten_uri(subject_uri),
+        'types': types,
+        'main_label': main_label,
+        'main_description': main_description if is_main_subject else None,
+        'images': images if is_main_subject else [],  # Only include images for main subject
+        'predicate_groups': group_predicates(predicates),
+        'is_blank': isinstance(subject_node, BNode),
+        'relation_to_main': shorten_uri(str(relation)) if relation is not None else None,
+        'relation_uri': str(relation) if relation is not None else None,
+        'coordinates_list': coordinates_list if coordinates_list else None
+    }
+
+def build_view_model(graph: Graph, id_uri: str, object_labels: dict = None, index: GraphIndex = None):
+    """
+    Build the view data of all subjects in a fetched graph
+
+    The graph is indexed once, after which every subject, blank node relation
+    and coordinate pair is produced from the index in linear time.
+
+    Args:
+        graph: The fetched graph
+        id_uri: The URI of the resource being viewed
+        object_labels: Labels of linked URIs that are not labelled in the graph itself,
+                       e.g. looked up for GraphIndex.linked_uris()
+        index: The GraphIndex of the graph, when already built
+
+    Returns:
+        tuple: (subjects, blank_nodes) where subjects has the main subject first,
+               then the other URI subjects sorted by URI, then the blank nodes
+    """
+    if index is None:
+        index = GraphIndex(graph)
+    main_node = URIRef(id_uri)
+
+    # Predicates linking the main subject to other subjects in the graph
+    relations_to_main = {}
+    for p, o in index.subjects.get(main_node, ()):
+        relations_to_main.setdefault(o, p)
+
+    main_subject = None
+    other_subjects = []
+    blank_nodes = []
+    for subject_node in index.subjects:
+        if isinstance(subject_node, BNode):
+            blank_nodes.append(build_subject(index, subject_node, relation=relations_to_main.get(subject_node),
+                                             object_labels=object_labels))
+        elif subject_node == main_node:
+            main_subject = build_subject(index, subject_node, is_main_subject=True, object_labels=object_labels)
+        else:
+            other_subjects.append(build_subject(index, subject_node, relation=relations_to_main.get(subject_node),
+                                                object_labels=object_labels))
+
+    # Sort subjects
+    sorted_subjects = []
+    if main_subject:
+        sorted_subjects.append(main_subject)
+    sorted_subjects.extend(sorted(other_subjects, key=lambda x: x['subject']))
+    sorted_subjects.extend(blank_nodes)
+    return sorted_subjects, blank_nodes